@@ -0,0 +1,388 @@
+# backend/backtest.py
+# Backtest walk-forward (origen rodante) de los modelos de regresion.
+# Para cada semana de origen se entrena solo con las semanas anteriores
+# (ventana expansiva, sin mezclar el futuro) y se repite el pronostico
+# recursivo de produccion para todas las regiones; el error se agrega por
+# horizonte. La matriz de features se construye una vez y se comparte entre
+# los origenes, que se evaluan en paralelo (procesos loky).
+
+import json
+import math
+import numbers
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config import BACKTEST_DIR, ENTRENAMIENTO_N_JOBS, POBLACION_2025
+from features import FEATURE_COLS, features_desde_historia
+
+MODELOS_BACKTEST = ('lineal', 'polinomial', 'persistencia')
+
+
+def preparar_matriz(X, y, regiones, fechas, feature_cols):
+    """Matriz de features indexada por (semana, region) para todos los origenes.
+
+    Las regiones son las claves presentes en los datos (estados o municipios);
+    las filas sin region no pertenecen a ninguna serie y se descartan.
+
+    Args:
+        X: features (n, len(feature_cols)); y: casos de la semana de cada fila
+        regiones: id_region por fila; fechas: fecha_fin_semana por fila
+
+    Returns:
+        dict con X, y (float64), semana (indice de semana por fila), semanas
+        (fechas unicas), regiones (id_region de cada columna de fila), fila
+        (tabla (n_semanas, n_regiones) de indice de fila o -1), columnas
+        (posicion de cada FEATURE_COLS en X, -1 si falta) y poblacion
+    """
+    X = np.ascontiguousarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    regiones = np.asarray(regiones, dtype=float)
+    fechas = np.asarray(fechas, dtype='datetime64[D]')
+
+    validas = ~np.isnan(regiones)
+    if not validas.all():
+        print(f"[WARN] Backtest: {int((~validas).sum())} registros sin region descartados")
+        X, y, regiones, fechas = X[validas], y[validas], regiones[validas], fechas[validas]
+    if not len(X):
+        raise ValueError('No hay registros con region para el backtest')
+
+    semanas, semana = np.unique(fechas, return_inverse=True)
+    ids_region, region = np.unique(regiones.astype(np.int64), return_inverse=True)
+    fila = np.full((len(semanas), len(ids_region)), -1, dtype=np.int64)
+    fila[semana, region] = np.arange(len(X))
+
+    poblacion = np.array([POBLACION_2025.get(int(id_region), 100000.0) for id_region in ids_region],
+                         dtype=float)
+
+    return {
+        'X': X,
+        'y': y,
+        'semana': semana,
+        'semanas': semanas,
+        'regiones': ids_region,
+        'fila': fila,
+        'columnas': np.array([feature_cols.index(c) if c in feature_cols else -1
+                              for c in FEATURE_COLS], dtype=np.intp),
+        'poblacion': poblacion
+    }
+
+
+def _sumas_vacias(horizonte):
+    # n, suma |e|, suma e^2, suma y, suma y^2 por horizonte
+    return np.zeros((horizonte, 5))
+
+
+def _acumular(sumas, h, pred, real):
+    error = pred - real
+    sumas[h] += (len(real), np.abs(error).sum(), (error ** 2).sum(), real.sum(), (real ** 2).sum())
+
+
+def _evaluar_origen(origen, matriz, horizonte, grado):
+    """Entrena con las semanas <= origen y pronostica origen+1..origen+horizonte.
+
+    Replica pronosticar_recursivo: los lags de casos del paso h incluyen las
+    predicciones de los pasos previos y la tasa se deriva de la prediccion
+    (casos / poblacion * 100k); semana y mes son los de la semana objetivo.
+
+    Returns:
+        dict con origen, n_entrenamiento, n_regiones y sumas por modelo (horizonte, 5)
+    """
+    from polinomial_bloques import RegresionPolinomialBloques
+    from seleccion_grado import pipeline_lineal
+
+    X, y, fila, col = matriz['X'], matriz['y'], matriz['fila'], matriz['columnas']
+    entrenamiento = matriz['semana'] <= origen
+
+    modelos = {
+        'lineal': pipeline_lineal(),
+        'polinomial': RegresionPolinomialBloques(grado)
+    }
+    for pipe in modelos.values():
+        pipe.fit(X[entrenamiento], y[entrenamiento])
+
+    # Regiones con semana siguiente: su fila trae los lags observados hasta el origen
+    regiones = np.flatnonzero(fila[origen + 1] >= 0)
+    inicial = X[fila[origen + 1, regiones]]
+    poblacion = matriz['poblacion'][regiones]
+
+    def valor(c, defecto=0.0):
+        return inicial[:, col[c]] if col[c] >= 0 else np.full(len(regiones), defecto)
+
+    fechas = matriz['semanas']
+    sumas = {m: _sumas_vacias(horizonte) for m in MODELOS_BACKTEST}
+    for nombre in MODELOS_BACKTEST:
+        casos_lag = np.column_stack([valor(i) for i in range(4)])
+        tasas_lag = np.column_stack([valor(4), valor(5)])
+        V = np.empty((len(regiones), len(FEATURE_COLS)))
+        Xp = np.zeros((len(regiones), X.shape[1]))
+        presentes = col >= 0
+
+        for h in range(horizonte):
+            objetivo = origen + 1 + h
+            if nombre == 'persistencia':
+                pred = casos_lag[:, 0].copy()
+            else:
+                fecha = (fechas[objetivo] if objetivo < len(fechas)
+                         else fechas[origen] + np.timedelta64(7 * (h + 1), 'D'))
+                fecha = fecha.astype(datetime)
+                features_desde_historia(casos_lag, tasas_lag, out=V[:, 0:8])
+                V[:, 8] = fecha.isocalendar()[1]
+                V[:, 9] = fecha.month
+                V[:, 10] = valor(10)
+                Xp[:, col[presentes]] = V[:, presentes]
+                pred = np.rint(np.maximum(modelos[nombre].predict(Xp), 0))
+
+            if objetivo < len(fechas):
+                filas = fila[objetivo, regiones]
+                hay = filas >= 0
+                _acumular(sumas[nombre], h, pred[hay], y[filas[hay]])
+
+            casos_lag[:, 1:] = casos_lag[:, :-1]
+            casos_lag[:, 0] = pred
+            tasas_lag[:, 1] = tasas_lag[:, 0]
+            tasas_lag[:, 0] = pred / poblacion * 100000
+
+    return {
+        'origen': origen,
+        'n_entrenamiento': int(entrenamiento.sum()),
+        'n_regiones': len(regiones),
+        'sumas': sumas
+    }
+
+
+def _metricas(sumas):
+    n, abs_err, sq_err, s_y, s_y2 = sumas
+    if n == 0:
+        return {'n': 0, 'mae': None, 'rmse': None, 'r2': None}
+    sst = s_y2 - s_y * s_y / n
+    return {
+        'n': int(n),
+        'mae': round(float(abs_err / n), 2),
+        'rmse': round(float(np.sqrt(sq_err / n)), 2),
+        'r2': round(float(1 - sq_err / sst), 4) if sst > 0 else None
+    }
+
+
+def backtest_walk_forward(matriz, horizonte=4, grado=2, n_origenes=52, paso=1, min_semanas=104,
+                          n_jobs=None, progreso=None):
+    """Evalua los origenes en paralelo y agrega MAE/RMSE/R2 por horizonte.
+
+    Args:
+        matriz: resultado de preparar_matriz (se comparte con los workers)
+        horizonte: semanas pronosticadas desde cada origen
+        grado: grado del modelo polinomial
+        n_origenes: ultimos origenes a evaluar (0 o None = todos)
+        paso: semanas entre origenes consecutivos
+        min_semanas: semanas minimas de entrenamiento del primer origen
+        n_jobs: procesos (ENTRENAMIENTO_N_JOBS si None)
+        progreso: callable(origenes_terminados, total_origenes)
+
+    Returns:
+        dict con horizontes (tabla por modelo), por_origen (MAE por horizonte),
+        periodo, n_jobs y tiempo_s
+    """
+    from joblib import Parallel, delayed
+
+    n_jobs = ENTRENAMIENTO_N_JOBS if n_jobs is None else n_jobs
+    n_semanas = len(matriz['semanas'])
+
+    # El ultimo origen necesita al menos la semana siguiente para evaluar
+    origenes = list(range(n_semanas - 2, min_semanas - 2, -paso))[::-1]
+    if n_origenes:
+        origenes = origenes[-int(n_origenes):]
+    if not origenes:
+        raise ValueError(f'Historia insuficiente: {n_semanas} semanas para min_semanas={min_semanas}')
+
+    print(f"[ML] Backtest walk-forward: {len(origenes)} origenes, horizonte {horizonte}, "
+          f"grado {grado} (n_jobs={n_jobs})")
+    inicio = time.perf_counter()
+    salidas = Parallel(n_jobs=n_jobs, backend='loky', return_as='generator')(
+        delayed(_evaluar_origen)(origen, matriz, horizonte, grado) for origen in origenes
+    )
+
+    totales = {m: _sumas_vacias(horizonte) for m in MODELOS_BACKTEST}
+    por_origen = []
+    for terminados, salida in enumerate(salidas, start=1):
+        for nombre in MODELOS_BACKTEST:
+            totales[nombre] += salida['sumas'][nombre]
+        por_origen.append({
+            'origen': str(matriz['semanas'][salida['origen']]),
+            'n_entrenamiento': salida['n_entrenamiento'],
+            'n_regiones': salida['n_regiones'],
+            'mae': {nombre: [_metricas(s)['mae'] for s in salida['sumas'][nombre]]
+                    for nombre in MODELOS_BACKTEST}
+        })
+        if progreso:
+            progreso(terminados, len(origenes))
+
+    tiempo = round(time.perf_counter() - inicio, 2)
+    horizontes = {
+        nombre: [dict(_metricas(totales[nombre][h]), horizonte=h + 1) for h in range(horizonte)]
+        for nombre in MODELOS_BACKTEST
+    }
+    for nombre in MODELOS_BACKTEST:
+        print(f"   {nombre}: MAE por horizonte "
+              f"{[fila['mae'] for fila in horizontes[nombre]]}")
+    print(f"[OK] Backtest terminado en {tiempo}s")
+
+    return {
+        'horizontes': horizontes,
+        'por_origen': por_origen,
+        'periodo': {'primer_origen': por_origen[0]['origen'], 'ultimo_origen': por_origen[-1]['origen']},
+        'n_jobs': n_jobs,
+        'tiempo_s': tiempo
+    }
+
+
+def guardar_resultado(resultado, directorio=BACKTEST_DIR):
+    """Guarda el resultado como JSON para comparar versiones de modelo.
+
+    Returns:
+        nombre del archivo
+    """
+    os.makedirs(directorio, exist_ok=True)
+    checksum = ((resultado.get('configuracion') or {}).get('modelo_vigente') or {}).get('checksum')
+    nombre = f"backtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{(checksum or 'sin_bundle')[:12]}.json"
+    with open(os.path.join(directorio, nombre), 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=1)
+    return nombre
+
+
+def listar_resultados(directorio=BACKTEST_DIR):
+    """Resumen (configuracion y MAE por horizonte) de los backtests guardados, recientes primero."""
+    if not os.path.isdir(directorio):
+        return []
+    resumenes = []
+    for nombre in sorted(os.listdir(directorio), reverse=True):
+        if not nombre.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as f:
+                resultado = json.load(f)
+        except (OSError, ValueError):
+            continue
+        resumenes.append({
+            'archivo': nombre,
+            'configuracion': resultado.get('configuracion'),
+            'periodo': resultado.get('periodo'),
+            'mae': {m: [fila['mae'] for fila in tabla]
+                    for m, tabla in (resultado.get('horizontes') or {}).items()}
+        })
+    return resumenes
+
+
+def leer_resultado(nombre, directorio=BACKTEST_DIR):
+    """Resultado completo de un backtest guardado, o None si no existe."""
+    ruta = os.path.join(directorio, os.path.basename(nombre))
+    if not os.path.exists(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _entero(data, campo, defecto, minimo):
+    """Entero >= minimo del payload (defecto si falta el campo)."""
+    from entrenador import ErrorEntrenamiento
+
+    valor = data.get(campo)
+    if valor is None:
+        return defecto
+    if isinstance(valor, str):
+        try:
+            valor = float(valor)
+        except ValueError:
+            raise ErrorEntrenamiento(f'{campo} debe ser un entero', 400)
+    if (isinstance(valor, bool) or not isinstance(valor, numbers.Real) or not math.isfinite(valor)
+            or valor != int(valor)):
+        raise ErrorEntrenamiento(f'{campo} debe ser un entero', 400)
+    if valor < minimo:
+        raise ErrorEntrenamiento(f'{campo} debe ser >= {minimo}', 400)
+    return int(valor)
+
+
+def validar_parametros_backtest(data):
+    """Valida horizonte, grado, n_origenes, paso, min_semanas y n_jobs del backtest.
+
+    Se llama desde la ruta antes de encolar el trabajo (un payload invalido
+    no lanza el proceso) y de nuevo en ejecutar_backtest().
+
+    Returns:
+        dict con los valores enteros (n_jobs None: ENTRENAMIENTO_N_JOBS)
+
+    Raises:
+        ErrorEntrenamiento: valores invalidos (400)
+    """
+    from entrenador import ErrorEntrenamiento
+    from ml import HORIZONTE_MAX
+
+    horizonte = _entero(data, 'horizonte', 4, 1)
+    if horizonte > HORIZONTE_MAX:
+        raise ErrorEntrenamiento(f'horizonte debe estar entre 1 y {HORIZONTE_MAX}', 400)
+    n_jobs = _entero(data, 'n_jobs', None, -1)
+    if n_jobs == 0:
+        raise ErrorEntrenamiento('n_jobs debe ser >= 1 (o -1 para todos los CPU)', 400)
+    return {
+        'horizonte': horizonte,
+        'grado': _entero(data, 'grado', 2, 1),
+        'n_origenes': _entero(data, 'n_origenes', 52, 0),
+        'paso': _entero(data, 'paso', 1, 1),
+        'min_semanas': _entero(data, 'min_semanas', 104, 1),
+        'n_jobs': n_jobs
+    }
+
+
+def ejecutar_backtest(data, label_encoder=None, modelo_vigente=None, progreso=None):
+    """Trabajo completo: carga datos (CSV o BD), corre el backtest y lo guarda.
+
+    Args:
+        data: payload de /api/modelos/backtest (fuente, archivo_csv,
+            id_enfermedad, horizonte, grado, n_origenes, paso, min_semanas, n_jobs)
+        label_encoder: LabelEncoder vigente
+        modelo_vigente: version/creado/checksum del bundle vigente (para comparar)
+        progreso: callable(etapa, porcentaje, mensaje)
+    """
+    from entrenador import ErrorEntrenamiento, cargar_datos
+
+    progreso = progreso or (lambda etapa, porcentaje, mensaje='': None)
+    parametros = validar_parametros_backtest(data)
+
+    datos = cargar_datos(data, label_encoder, progreso, por_region=True)
+    if datos.get('fechas') is None or datos.get('regiones') is None:
+        raise ErrorEntrenamiento('El backtest requiere fecha y region por registro', 400)
+
+    progreso('features', 10, f"{len(datos['X'])} registros")
+    try:
+        matriz = preparar_matriz(datos['X'].values, datos['y'].values, datos['regiones'].values,
+                                 datos['fechas'], datos['features'])
+    except ValueError as e:
+        raise ErrorEntrenamiento(str(e), 400)
+
+    configuracion = {
+        'horizonte': parametros['horizonte'],
+        'grado': parametros['grado'],
+        'n_origenes': parametros['n_origenes'],
+        'paso': parametros['paso'],
+        'min_semanas': parametros['min_semanas'],
+        'fuente': data.get('fuente', 'csv'),
+        'archivo_csv': data.get('archivo_csv'),
+        'features': datos['features'],
+        'modelo_vigente': modelo_vigente
+    }
+    try:
+        resultado = backtest_walk_forward(
+            matriz, horizonte=configuracion['horizonte'], grado=configuracion['grado'],
+            n_origenes=configuracion['n_origenes'], paso=configuracion['paso'],
+            min_semanas=configuracion['min_semanas'],
+            n_jobs=parametros['n_jobs'],
+            progreso=lambda hechos, total: progreso(
+                'origenes', 10 + 85 * hechos // total, f'{hechos}/{total} origenes')
+        )
+    except ValueError as e:
+        raise ErrorEntrenamiento(str(e), 400)
+
+    resultado = dict(resultado, success=True, configuracion=configuracion)
+    resultado['archivo'] = guardar_resultado(resultado)
+    return resultado
@@ -0,0 +1,119 @@
+# backend/bundle_modelos.py
+# Bundle de modelos: un solo archivo versionado con todos los artefactos
+# (pipelines, compilados, encoder, features, metricas, umbrales, estadisticas
+# incrementales) + manifiesto
+
+import os
+from datetime import datetime
+
+import joblib
+
+from config import BACKEND_DIR, MODEL_BUNDLE
+
+FORMATO_BUNDLE = 1
+
+ARTEFACTOS = (
+    'modelo_lineal', 'modelo_polinomial',
+    'compilado_lineal', 'compilado_polinomial',
+    'label_encoder', 'feature_cols', 'metricas', 'umbrales',
+    'modelos_region', 'estadisticas'
+)
+
+# Archivos sueltos usados antes del bundle (solo lectura / migracion)
+ARCHIVOS_LEGADO = {
+    'modelo_lineal': 'model_lineal.pkl',
+    'modelo_polinomial': 'model_polinomial.pkl',
+    'label_encoder': 'label_encoder.pkl',
+    'feature_cols': 'model_features.pkl',
+    'metricas': 'model_metricas.pkl',
+    'umbrales': 'model_umbrales.pkl'
+}
+
+
+def _checksum(artefactos):
+    # coerce_mmap: el mismo contenido da el mismo hash cargado en memoria o mapeado
+    return joblib.hash(artefactos, hash_name='sha1', coerce_mmap=True)
+
+
+def guardar_bundle(artefactos, ruta=MODEL_BUNDLE):
+    """Escribe el bundle de forma atomica (archivo temporal + os.replace).
+
+    Se guarda sin compresion para que los arreglos puedan mapearse en
+    memoria al cargar.
+
+    Returns:
+        dict manifiesto
+    """
+    faltantes = [a for a in ARTEFACTOS if a not in artefactos]
+    if faltantes:
+        raise ValueError(f'Artefactos faltantes en bundle: {", ".join(faltantes)}')
+
+    artefactos = {a: artefactos[a] for a in ARTEFACTOS}
+    manifiesto = {
+        'formato': FORMATO_BUNDLE,
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'artefactos': list(ARTEFACTOS),
+        'poly_degree': (artefactos['metricas'] or {}).get('poly_degree'),
+        'checksum': _checksum(artefactos)
+    }
+
+    tmp = f'{ruta}.tmp-{os.getpid()}'
+    try:
+        joblib.dump({'manifiesto': manifiesto, 'artefactos': artefactos}, tmp)
+        with open(tmp, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return manifiesto
+
+
+def cargar_bundle(ruta=MODEL_BUNDLE, mmap=True):
+    """Lee el bundle en una sola lectura y verifica formato y checksum.
+
+    Con mmap=True los arreglos NumPy quedan mapeados en memoria (solo
+    lectura), de modo que varios workers comparten las mismas paginas.
+
+    Returns:
+        (artefactos, manifiesto)
+    """
+    contenido = joblib.load(ruta, mmap_mode='r' if mmap else None)
+    manifiesto = contenido.get('manifiesto', {})
+    artefactos = contenido.get('artefactos', {})
+
+    if manifiesto.get('formato') != FORMATO_BUNDLE:
+        raise ValueError(f'Formato de bundle no soportado: {manifiesto.get("formato")}')
+    if _checksum(artefactos) != manifiesto.get('checksum'):
+        raise ValueError('Checksum del bundle no coincide (archivo corrupto o incompleto)')
+
+    return artefactos, manifiesto
+
+
+def migrar_legado(ruta=MODEL_BUNDLE):
+    """Construye un bundle a partir de los .pkl sueltos existentes."""
+    from ml import compilar_modelo
+
+    artefactos = {}
+    for artefacto, archivo in ARCHIVOS_LEGADO.items():
+        path = os.path.join(BACKEND_DIR, archivo)
+        artefactos[artefacto] = joblib.load(path) if os.path.exists(path) else None
+
+    for attr, destino, msg in [
+        ('modelo_lineal', 'compilado_lineal', 'Regresion Lineal'),
+        ('modelo_polinomial', 'compilado_polinomial', 'Regresion Polinomial'),
+    ]:
+        compilado = compilar_modelo(artefactos[attr], msg)
+        artefactos[destino] = compilado.exportar() if compilado else None
+
+    artefactos['metricas'] = artefactos['metricas'] or {}
+    artefactos['umbrales'] = artefactos['umbrales'] or {}
+    artefactos['modelos_region'] = {}
+    artefactos['estadisticas'] = None
+    return guardar_bundle(artefactos, ruta)
+
+
+if __name__ == '__main__':
+    m = migrar_legado()
+    print(f"[OK] Bundle creado: {MODEL_BUNDLE} (checksum {m['checksum']})")
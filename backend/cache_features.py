@@ -0,0 +1,170 @@
+# backend/cache_features.py
+# Cache en disco de la matriz de features de entrenamiento.
+# Cada entrada es un .npz (un arreglo por columna, sin pickle) cuyo nombre es
+# el hash del origen de los datos (contenido del CSV o version de
+# dato_epidemiologico) y de la definicion de las features: si nada cambio,
+# entrenamientos, busquedas de grado y backtests repetidos pasan directo al
+# ajuste sin releer el CSV ni recalcular los lags.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from config import FEATURES_CACHE_DIR, FEATURES_CACHE_MAX
+from features import FEATURE_COLS, VENTANA
+
+# Subir al cambiar como se construyen las features (invalida todas las entradas)
+VERSION_FEATURES = 1
+
+_ESCALARES = ('total_registros', 'fecha_max', 'bloques', 'tiempo_s')
+
+
+def hash_archivo(ruta, tam_bloque=1 << 20):
+    """SHA-256 del contenido de un archivo (lectura por bloques)."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def clave_cache(origen, **partes):
+    """Clave de una entrada: origen de los datos + especificacion de features."""
+    especificacion = {
+        'origen': origen,
+        'version': VERSION_FEATURES,
+        'features': FEATURE_COLS,
+        'ventana': VENTANA,
+        **partes
+    }
+    texto = json.dumps(especificacion, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+
+
+def _ruta(clave):
+    return os.path.join(FEATURES_CACHE_DIR, f'{clave}.npz')
+
+
+def _clases(label_encoder):
+    clases = getattr(label_encoder, 'classes_', None)
+    if clases is None:
+        return None
+    clases = np.asarray(clases)
+    return clases.astype(str) if clases.dtype == object else clases
+
+
+def leer_cache(clave, label_encoder=None):
+    """Datos de entrenamiento guardados con esta clave (None si no hay entrada).
+
+    Si la entrada se genero reutilizando el encoder recibido (CSV que ya
+    trae features), solo es valida con un encoder de las mismas clases.
+
+    Returns:
+        dict con la forma de entrenador.cargar_datos, o None
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    ruta = _ruta(clave)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with np.load(ruta, allow_pickle=False) as npz:
+            meta = json.loads(str(npz['meta']))
+            arreglos = {k: npz[k] for k in npz.files if k != 'meta'}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] Cache de features ilegible ({os.path.basename(ruta)}): {e}")
+        return None
+
+    clases = arreglos.get('clases')
+    if meta['encoder'] == 'entrada':
+        actuales = _clases(label_encoder)
+        if (clases is None) != (actuales is None) or (
+                clases is not None and not np.array_equal(clases, actuales)):
+            return None
+    else:
+        label_encoder = LabelEncoder()
+        label_encoder.classes_ = clases
+
+    indice = pd.Index(arreglos['indice'])
+    datos = {
+        'X': pd.DataFrame({c: arreglos[f'X{i}'] for i, c in enumerate(meta['features'])},
+                          index=indice),
+        'y': pd.Series(arreglos['y'], index=indice, name=meta['y_nombre'], copy=False),
+        'regiones': (pd.Series(arreglos['regiones'], index=indice,
+                               name=meta['regiones_nombre'], copy=False)
+                     if 'regiones' in arreglos else None),
+        'fechas': arreglos.get('fechas'),
+        'label_encoder': label_encoder,
+        'features': meta['features']
+    }
+    datos.update(meta['escalares'])
+    if meta.get('fecha_max_timestamp') and datos.get('fecha_max') is not None:
+        datos['fecha_max'] = pd.Timestamp(datos['fecha_max'])
+
+    os.utime(ruta)  # mas reciente para la poda
+    return datos
+
+
+def guardar_cache(clave, datos, encoder_de_entrada):
+    """Guarda los datos de entrenamiento (escritura atomica) y poda entradas viejas.
+
+    Args:
+        clave: ver clave_cache
+        datos: dict devuelto por la fuente (X, y, regiones, fechas, ...)
+        encoder_de_entrada: True si datos['label_encoder'] es el encoder recibido
+    """
+    meta = {
+        'features': list(datos['features']),
+        'y_nombre': datos['y'].name,
+        'regiones_nombre': getattr(datos.get('regiones'), 'name', None),
+        'encoder': 'entrada' if encoder_de_entrada else 'datos',
+        'escalares': {k: (str(datos[k]) if k == 'fecha_max' and datos[k] is not None else datos[k])
+                      for k in _ESCALARES if k in datos},
+        'fecha_max_timestamp': isinstance(datos.get('fecha_max'), pd.Timestamp)
+    }
+    arreglos = {
+        'meta': np.array(json.dumps(meta)),
+        'y': datos['y'].to_numpy(),
+        'indice': datos['X'].index.to_numpy()
+    }
+    # Una columna por feature (conserva el dtype de cada una)
+    for i, columna in enumerate(datos['features']):
+        arreglos[f'X{i}'] = datos['X'][columna].to_numpy()
+    if datos.get('regiones') is not None:
+        arreglos['regiones'] = datos['regiones'].to_numpy()
+    if datos.get('fechas') is not None:
+        arreglos['fechas'] = np.asarray(datos['fechas'], dtype='datetime64[D]')
+    clases = _clases(datos.get('label_encoder'))
+    if clases is not None:
+        arreglos['clases'] = clases
+
+    os.makedirs(FEATURES_CACHE_DIR, exist_ok=True)
+    ruta = _ruta(clave)
+    tmp = f'{ruta}.tmp-{os.getpid()}'
+    try:
+        # Con un archivo abierto np.savez no agrega la extension .npz
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arreglos)
+        os.replace(tmp, ruta)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    print(f"[OK] Features en cache: {os.path.basename(ruta)} "
+          f"({os.path.getsize(ruta) / 1e6:.1f} MB)")
+    _podar()
+
+
+def _podar():
+    """Conserva las FEATURES_CACHE_MAX entradas usadas mas recientemente."""
+    entradas = [os.path.join(FEATURES_CACHE_DIR, a) for a in os.listdir(FEATURES_CACHE_DIR)
+                if a.endswith('.npz')]
+    entradas.sort(key=os.path.getmtime, reverse=True)
+    for ruta in entradas[max(FEATURES_CACHE_MAX, 0):]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
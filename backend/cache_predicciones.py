@@ -0,0 +1,65 @@
+# backend/cache_predicciones.py
+# Cache LRU + TTL en memoria para resultados de prediccion
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import PREDICCION_CACHE_MAX, PREDICCION_CACHE_TTL
+
+
+class CachePredicciones:
+    """Cache LRU con expiracion por TTL, segura entre hilos.
+
+    Las claves deben incluir todo lo que determina el resultado (region,
+    ultima semana con datos, semana/mes objetivo y version de modelos), de
+    modo que los datos nuevos o un reentrenamiento produzcan claves nuevas;
+    invalidar() ademas libera las entradas viejas de inmediato.
+    """
+
+    def __init__(self, max_entradas=256, ttl=3600):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Retorna el valor guardado o None si no existe o expiro."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < ahora:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self):
+        """Elimina todas las entradas (carga de datos o cambio de modelos)."""
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+cache_predicciones = CachePredicciones(PREDICCION_CACHE_MAX, PREDICCION_CACHE_TTL)
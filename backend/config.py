@@ -43,9 +43,66 @@ POBLACION_2025 = {
     31: 2561900, 32: 1698200
 }
 
+# Bundle unico de modelos (ver bundle_modelos.py)
+MODEL_BUNDLE = os.getenv('MODEL_BUNDLE', os.path.join(BACKEND_DIR, 'model_bundle.joblib'))
+
+# Cache en memoria de /api/modelo/predecir-riesgo-automatico
+PREDICCION_CACHE_MAX = int(os.getenv('PREDICCION_CACHE_MAX', 256))
+PREDICCION_CACHE_TTL = int(os.getenv('PREDICCION_CACHE_TTL', 3600))
+
+# Entrenamiento: procesos para ajustes en paralelo (-1 = todos los nucleos)
+# y registros minimos para entrenar un modelo propio por region
+ENTRENAMIENTO_N_JOBS = int(os.getenv('ENTRENAMIENTO_N_JOBS', -1))
+MIN_REGISTROS_REGION = int(os.getenv('MIN_REGISTROS_REGION', 52))
+
+# Entrenamientos simultaneos (cada uno en su propio proceso)
+ENTRENAMIENTO_MAX_CONCURRENTES = int(os.getenv('ENTRENAMIENTO_MAX_CONCURRENTES', 1))
+
+# Cargas de CSV simultaneas (cada una en su propio proceso, ver ingesta_csv.py)
+INGESTA_MAX_CONCURRENTES = int(os.getenv('INGESTA_MAX_CONCURRENTES', 1))
+
+# Regresion polinomial: memoria maxima (MB) de la matriz expandida; si la
+# densa no cabe se expande y acumula por bloques (ver polinomial_bloques.py).
+# POLINOMIAL_FLOAT32 expande los bloques en float32 (mitad de memoria)
+POLINOMIAL_MEMORIA_MB = float(os.getenv('POLINOMIAL_MEMORIA_MB', 512))
+POLINOMIAL_FLOAT32 = os.getenv('POLINOMIAL_FLOAT32', '0').lower() in ('1', 'true', 'si')
+
+# Filas por bloque al entrenar desde dato_epidemiologico (ver fuente_bd.py)
+ENTRENAMIENTO_BLOQUE_BD = int(os.getenv('ENTRENAMIENTO_BLOQUE_BD', 50000))
+
+# Filas por bloque al leer CSV de casos SINAVE (ver ingesta_csv.py) y valor
+# de ESTATUS_CASO que cuenta como caso confirmado en todas las cargas
+CSV_BLOQUE_FILAS = int(os.getenv('CSV_BLOQUE_FILAS', 200000))
+ESTATUS_CASO_CONFIRMADO = int(os.getenv('ESTATUS_CASO_CONFIRMADO', 1))
+
+# Vista previa de /api/datos/procesar-csv: bytes del CSV que se leen (en
+# tramos repartidos por el archivo) para estimar el resumen sin leerlo todo
+CSV_PREVIEW_BYTES = int(os.getenv('CSV_PREVIEW_BYTES', 4 << 20))
+CSV_PREVIEW_TRAMOS = int(os.getenv('CSV_PREVIEW_TRAMOS', 64))
+
+# Escritura masiva en dato_epidemiologico (ver escritura_bd.py): filas por
+# INSERT multi-fila y filas entre commits
+ESCRITURA_LOTE_BD = int(os.getenv('ESCRITURA_LOTE_BD', 1000))
+ESCRITURA_COMMIT_BD = int(os.getenv('ESCRITURA_COMMIT_BD', 20000))
+
+# Terminos maximos de un modelo para guardar sus estadisticas incrementales
+# (grado 4 con 11 features = 1365 terminos; ver entrenamiento_incremental.py)
+INCREMENTAL_MAX_TERMINOS = int(os.getenv('INCREMENTAL_MAX_TERMINOS', 1400))
+
+# Cache en disco de features de entrenamiento (.npz por CSV/version de BD,
+# ver cache_features.py) y entradas que se conservan
+FEATURES_CACHE_DIR = os.getenv('FEATURES_CACHE_DIR', os.path.join(BACKEND_DIR, 'features_cache'))
+FEATURES_CACHE_MAX = int(os.getenv('FEATURES_CACHE_MAX', 8))
+
+# Resultados de backtests walk-forward (JSON, ver backtest.py)
+BACKTEST_DIR = os.getenv('BACKTEST_DIR', os.path.join(BACKEND_DIR, 'backtests'))
+
 UPLOAD_FOLDER = os.path.join(BACKEND_DIR, 'uploads', 'CSV')
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
 
+# Hash de contenido -> archivo y resultado de carga (ver manifiesto_uploads.py)
+UPLOADS_MANIFIESTO = os.path.join(UPLOAD_FOLDER, 'manifiesto.json')
+
 # Crear directorio de uploads si no existe
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
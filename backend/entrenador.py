@@ -0,0 +1,525 @@
+# backend/entrenador.py
+# Entrenamiento de Regresion Lineal vs Polinomial a partir de un CSV o de
+# dato_epidemiologico (lectura por bloques, ver fuente_bd.py).
+# Se ejecuta en un proceso aparte (ver trabajos.py): escribe el bundle y
+# devuelve la comparativa; el proceso de la API recarga el bundle al terminar.
+
+import math
+import numbers
+import os
+import numpy as np
+import pandas as pd
+
+from config import BACKEND_DIR, ESTADO_POR_ID, MODEL_BUNDLE, ENTRENAMIENTO_N_JOBS
+from ml import compilar_modelo
+from features import FEATURE_COLS, COLS_REZAGO, features_rezago
+from bundle_modelos import guardar_bundle
+from entrenamiento_regional import ids_region, entrenar_regiones
+from entrenamiento_incremental import estadisticas_entrenamiento
+from seleccion_grado import GRADOS_POLINOMIO, buscar_grado, pipeline_lineal
+from regularizacion import TIPOS_REGULARIZACION, buscar_grado_regularizado, r2_cv_regularizado
+
+
+class ErrorEntrenamiento(Exception):
+    """Error de validacion de los datos de entrenamiento (codigo HTTP 4xx)."""
+
+    def __init__(self, mensaje, codigo=400):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def _sin_progreso(etapa, porcentaje, mensaje=''):
+    pass
+
+
+def _ruta_csv(archivo_csv):
+    """Ubica el CSV de entrenamiento (data/, modelo/, backend/ o ruta dada)."""
+    if not archivo_csv:
+        raise ErrorEntrenamiento('archivo_csv es requerido', 400)
+
+    for ruta in [
+        os.path.join(BACKEND_DIR, '..', 'data', archivo_csv),
+        os.path.join(BACKEND_DIR, '..', 'modelo', archivo_csv),
+        os.path.join(BACKEND_DIR, archivo_csv),
+        archivo_csv
+    ]:
+        if os.path.exists(ruta):
+            return ruta
+
+    raise ErrorEntrenamiento(f'CSV no encontrado: {archivo_csv}', 404)
+
+
+def _datos_csv(csv_path, label_encoder, progreso):
+    """Lee el CSV de entrenamiento y crea las features si trae datos crudos.
+
+    Returns:
+        dict con X, y, regiones (None si el CSV no identifica la region),
+        label_encoder, total_registros, fecha_max, fechas por fila (None si
+        no hay fechas) y features
+    """
+    from sklearn.preprocessing import LabelEncoder
+
+    df = pd.read_csv(csv_path)
+    print(f"[INFO] Datos cargados: {len(df)} registros, {len(df.columns)} columnas")
+    progreso('carga', 5, f'{len(df)} registros, {len(df.columns)} columnas')
+
+    # -----------------------------------------------------------
+    # Preparar features: si el CSV tiene datos crudos, crearlas
+    # -----------------------------------------------------------
+    progreso('features', 10, 'Preparando features')
+    feature_cols = FEATURE_COLS
+
+    has_features = all(c in df.columns for c in feature_cols)
+
+    if not has_features:
+        # Crear features desde datos crudos
+        print("[INFO] Creando features desde datos crudos...")
+
+        # Detectar columnas
+        col_casos = next((c for c in ['casos_confirmados', 'CASOS_CONFIRMADOS'] if c in df.columns), None)
+        col_ti = next((c for c in ['tasa_incidencia', 'TASA_INCIDENCIA'] if c in df.columns), None)
+        col_estado = next((c for c in ['ENTIDAD_FED', 'NOMBRE_ESTADO', 'estado'] if c in df.columns), None)
+        col_fecha = next((c for c in ['fecha_fin_semana', 'FECHA', 'fecha'] if c in df.columns), None)
+
+        if not col_casos:
+            raise ErrorEntrenamiento('CSV debe tener columna casos_confirmados', 400)
+
+        if col_fecha:
+            df[col_fecha] = pd.to_datetime(df[col_fecha])
+            df = df.sort_values([col_estado, col_fecha] if col_estado else [col_fecha]).reset_index(drop=True)
+
+        # Label encode estado
+        if col_estado:
+            le = LabelEncoder()
+            df['estado_coded'] = le.fit_transform(df[col_estado])
+            label_encoder = le
+        elif 'ENTIDAD_CODED' in df.columns:
+            df['estado_coded'] = df['ENTIDAD_CODED']
+        else:
+            df['estado_coded'] = 0
+
+        # Crear lags, promedio y tendencia por estado (ver features.py)
+        codigos = pd.factorize(df[col_estado])[0] if col_estado else None
+        rezagos = features_rezago(
+            df[col_casos].to_numpy(dtype=float),
+            df[col_ti].to_numpy(dtype=float) if col_ti else None,
+            codigos
+        )
+        if codigos is not None:
+            rezagos[codigos < 0] = np.nan  # estado vacio: sin grupo, como groupby
+        for i, col in enumerate(COLS_REZAGO):
+            df[col] = rezagos[:, i]
+
+        if col_fecha:
+            df['semana_anio'] = df[col_fecha].dt.isocalendar().week.astype(int)
+            df['mes'] = df[col_fecha].dt.month
+        else:
+            if 'SEMANA_DEL_ANIO' in df.columns:
+                df['semana_anio'] = df['SEMANA_DEL_ANIO']
+            else:
+                df['semana_anio'] = 1
+            if 'MES' in df.columns:
+                df['mes'] = df['MES']
+            else:
+                df['mes'] = 1
+
+        df = df.dropna(subset=[c for c in feature_cols if c in df.columns])
+        print(f"[INFO] Registros despues de feature engineering: {len(df)}")
+    else:
+        col_casos = 'casos_confirmados' if 'casos_confirmados' in df.columns else 'CASOS_CONFIRMADOS'
+        col_fecha = None
+        # Asegurar label encoder si no existe
+        col_estado = next((c for c in ['ENTIDAD_FED', 'NOMBRE_ESTADO', 'estado'] if c in df.columns), None)
+        if col_estado and label_encoder is None:
+            le = LabelEncoder()
+            le.fit(df[col_estado].unique())
+            label_encoder = le
+
+    # Target
+    col_target = next((c for c in ['casos_confirmados', 'CASOS_CONFIRMADOS'] if c in df.columns), None)
+    if not col_target:
+        raise ErrorEntrenamiento('No se encontro columna target (casos_confirmados)', 400)
+
+    # Filtrar features existentes
+    available_features = [c for c in feature_cols if c in df.columns]
+    X = df[available_features].copy()
+    y = df[col_target].copy()
+
+    # Limpiar NaN
+    mask = X.notna().all(axis=1) & y.notna()
+    X = X[mask]
+    y = y[mask]
+
+    regiones = ids_region(df, col_estado, label_encoder)
+    if regiones is not None:
+        regiones = regiones[mask]
+
+    return {
+        'X': X, 'y': y, 'regiones': regiones,
+        'label_encoder': label_encoder,
+        'total_registros': len(df),
+        'fecha_max': df[col_fecha].max() if col_fecha else None,
+        'fechas': df.loc[mask, col_fecha].to_numpy(dtype='datetime64[D]') if col_fecha else None,
+        'features': available_features
+    }
+
+
+def _datos_bd(data, label_encoder, progreso):
+    """Lee dato_epidemiologico por bloques (ver fuente_bd.py)."""
+    from fuente_bd import leer_series_bd
+
+    try:
+        datos = leer_series_bd(
+            id_enfermedad=data.get('id_enfermedad'),
+            tam_bloque=data.get('tam_bloque'),
+            label_encoder=label_encoder,
+            progreso=lambda leidas, total: progreso(
+                'carga', 5, f'{leidas}/{total} registros de dato_epidemiologico')
+        )
+    except RuntimeError as e:
+        raise ErrorEntrenamiento(str(e), 503)
+
+    datos['features'] = list(datos['X'].columns)
+    return datos
+
+
+def _clave_fuente(data, fuente, label_encoder):
+    """Clave del cache de features para la fuente del payload (ver cache_features.py)."""
+    from cache_features import clave_cache, hash_archivo
+
+    if fuente == 'csv':
+        return clave_cache('csv', sha256=hash_archivo(_ruta_csv(data.get('archivo_csv'))))
+
+    from fuente_bd import version_datos_bd
+    try:
+        version = version_datos_bd(data.get('id_enfermedad'))
+    except RuntimeError as e:
+        raise ErrorEntrenamiento(str(e), 503)
+    return clave_cache('bd', version=version, id_enfermedad=data.get('id_enfermedad'),
+                       estados=list(getattr(label_encoder, 'classes_', [])))
+
+
+def cargar_datos(data, label_encoder=None, progreso=None, por_region=False):
+    """Features y objetivo desde la fuente del payload ('csv' o 'bd').
+
+    Las features se guardan en cache por hash del CSV o version de la BD
+    (ver cache_features.py); usar_cache=false en el payload lo omite.
+
+    Returns:
+        dict con X, y, regiones, fechas, label_encoder, total_registros,
+        fecha_max y features (ver _datos_csv / fuente_bd.leer_series_bd)
+    """
+    from cache_features import leer_cache, guardar_cache
+
+    progreso = progreso or _sin_progreso
+    fuente = data.get('fuente', 'csv')
+    if fuente not in ('csv', 'bd'):
+        raise ErrorEntrenamiento(f"fuente invalida: {fuente} (csv o bd)", 400)
+
+    if fuente == 'bd' and (label_encoder is None or
+                           len(getattr(label_encoder, 'classes_', [])) != len(ESTADO_POR_ID)):
+        # El encoder vigente solo se reutiliza si cubre los 32 estados
+        from fuente_bd import encoder_estados
+        label_encoder = encoder_estados()
+
+    clave = _clave_fuente(data, fuente, label_encoder) if data.get('usar_cache', True) else None
+    datos = leer_cache(clave, label_encoder) if clave else None
+    if datos is not None:
+        print(f"[INFO] Features desde cache {clave}: {len(datos['X'])} registros")
+        progreso('carga', 5, f"{len(datos['X'])} registros (cache de features)")
+    else:
+        if fuente == 'bd':
+            datos = _datos_bd(data, label_encoder, progreso)
+        else:
+            datos = _datos_csv(_ruta_csv(data.get('archivo_csv')), label_encoder, progreso)
+        if clave:
+            guardar_cache(clave, datos, datos['label_encoder'] is label_encoder)
+    datos['cache_features'] = clave
+
+    if por_region and datos['regiones'] is None:
+        raise ErrorEntrenamiento('por_region requiere columna id_region, de estado o estado_coded', 400)
+    return datos
+
+
+def _lista_numeros(data, campo):
+    """Lista no vacia de numeros finitos del payload (None si falta el campo)."""
+    valores = data.get(campo)
+    if valores is None:
+        return None
+    if (not isinstance(valores, (list, tuple)) or not valores
+            or any(isinstance(v, bool) or not isinstance(v, numbers.Real) or not math.isfinite(v)
+                   for v in valores)):
+        raise ErrorEntrenamiento(f'{campo} debe ser una lista de numeros', 400)
+    return [float(v) for v in valores]
+
+
+def _booleano(data, campo):
+    """Campo booleano del payload: true/false o cadena 1/true/si, 0/false/no (None si falta)."""
+    valor = data.get(campo)
+    if valor is None or isinstance(valor, bool):
+        return valor
+    if isinstance(valor, str) and valor.lower() in ('1', 'true', 'si', '0', 'false', 'no'):
+        return valor.lower() in ('1', 'true', 'si')
+    raise ErrorEntrenamiento(f'{campo} debe ser booleano', 400)
+
+
+def validar_parametros(data):
+    """Valida regularizacion, alphas, grados y poly_float32 del payload de entrenamiento.
+
+    Se llama desde la ruta antes de encolar el trabajo (un payload invalido
+    no lanza el proceso) y de nuevo en entrenar().
+
+    Returns:
+        dict con regularizacion (str o None), alphas (list de float o None),
+        grados (tuple de int ordenada) y poly_float32 (bool o None: default
+        POLINOMIAL_FLOAT32)
+
+    Raises:
+        ErrorEntrenamiento: valores invalidos (400)
+    """
+    regularizacion = data.get('regularizacion') or None
+    if regularizacion is not None and regularizacion not in TIPOS_REGULARIZACION:
+        raise ErrorEntrenamiento(f"regularizacion invalida: {regularizacion} (ridge o lasso)", 400)
+    alphas = _lista_numeros(data, 'alphas')
+    if alphas is not None and any(a <= 0 for a in alphas):
+        raise ErrorEntrenamiento('alphas debe ser una lista de valores positivos', 400)
+    grados = _lista_numeros(data, 'grados')
+    if grados is not None and any(g != int(g) or g < 1 for g in grados):
+        raise ErrorEntrenamiento('grados debe ser una lista de enteros >= 1', 400)
+    return {
+        'regularizacion': regularizacion,
+        'alphas': alphas,
+        'grados': tuple(sorted(set(int(g) for g in grados))) if grados else GRADOS_POLINOMIO,
+        'poly_float32': _booleano(data, 'poly_float32')
+    }
+
+
+def entrenar(data, label_encoder=None, progreso=None):
+    """Entrena Regresion Lineal y Polinomial y guarda el bundle.
+
+    Args:
+        data: payload de /api/modelos/entrenar (fuente, archivo_csv,
+            id_enfermedad, tam_bloque, por_region, n_jobs, usar_cache,
+            memoria_poly_mb, poly_float32, regularizacion, alphas, grados)
+        label_encoder: LabelEncoder vigente (se reutiliza si los datos no traen estado)
+        progreso: callable(etapa, porcentaje, mensaje) para reportar avance
+
+    Returns:
+        dict de respuesta (comparativa, metricas, umbrales, manifiesto del bundle)
+
+    Raises:
+        ErrorEntrenamiento: datos invalidos o insuficientes
+    """
+    from sklearn.model_selection import train_test_split, cross_val_score
+    from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+    from polinomial_bloques import RegresionPolinomialBloques
+
+    progreso = progreso or _sin_progreso
+
+    por_region = bool(data.get('por_region', False))
+    n_jobs = data.get('n_jobs')
+    n_jobs = int(n_jobs) if n_jobs is not None else ENTRENAMIENTO_N_JOBS
+    memoria_poly_mb = data.get('memoria_poly_mb')
+    parametros = validar_parametros(data)
+    poly_float32 = parametros['poly_float32']
+    regularizacion = parametros['regularizacion']
+    alphas = parametros['alphas']
+    grados = parametros['grados']
+
+    datos = cargar_datos(data, label_encoder, progreso, por_region)
+    X, y = datos['X'], datos['y']
+    regiones = datos['regiones'] if por_region else None
+    label_encoder = datos['label_encoder']
+    available_features = datos['features']
+
+    if len(X) < 20:
+        raise ErrorEntrenamiento(f'Datos insuficientes: {len(X)} registros', 400)
+
+    # Split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    print(f"[INFO] Train: {len(X_train)}, Test: {len(X_test)}, Features: {len(available_features)}")
+
+    # -----------------------------------------------------------
+    # 1) Regresion Lineal
+    # -----------------------------------------------------------
+    print("[ML] Entrenando Regresion Lineal...")
+    progreso('lineal', 20, f'Train: {len(X_train)}, Test: {len(X_test)}')
+    pipe_lineal = pipeline_lineal()
+    pipe_lineal.fit(X_train, y_train)
+
+    y_pred_lin = pipe_lineal.predict(X_test)
+    r2_lin = r2_score(y_test, y_pred_lin)
+    mae_lin = mean_absolute_error(y_test, y_pred_lin)
+    rmse_lin = float(np.sqrt(mean_squared_error(y_test, y_pred_lin)))
+
+    cv_lin = cross_val_score(pipe_lineal, X, y, cv=5, scoring='r2', n_jobs=n_jobs)
+    r2_cv_lin = float(cv_lin.mean())
+
+    metricas_lineal = {
+        'r2': round(float(r2_lin), 4),
+        'r2_cv': round(r2_cv_lin, 4),
+        'mae': round(float(mae_lin), 2),
+        'rmse': round(rmse_lin, 2)
+    }
+    print(f"[OK] Lineal: R2={r2_lin:.4f}, R2_CV={r2_cv_lin:.4f}, MAE={mae_lin:.2f}")
+
+    # -----------------------------------------------------------
+    # 2) Regresion Polinomial (grados 2-5 por defecto, elegir mejor)
+    # -----------------------------------------------------------
+    print(f"[ML] Entrenando Regresion Polinomial (grados {grados[0]}-{grados[-1]}"
+          f"{', ' + regularizacion + ' con camino de alphas' if regularizacion else ''})...")
+
+    progreso('busqueda_grado', 22, f"Grados {', '.join(map(str, grados))}")
+
+    def progreso_grado(grado, hechos, total, r2_cv):
+        progreso(f'grado_{grado}', 25 + 50 * hechos // total, f'Grado {grado}: R2_CV={r2_cv:.4f}')
+
+    if regularizacion:
+        busqueda = buscar_grado_regularizado(regularizacion, X_train, y_train, X_test, y_test,
+                                             grados=grados, n_jobs=n_jobs, progreso=progreso_grado, alphas=alphas,
+                                             memoria_mb=memoria_poly_mb, float32=poly_float32)
+    else:
+        busqueda = buscar_grado(X_train, y_train, X_test, y_test, grados=grados, n_jobs=n_jobs,
+                                progreso=progreso_grado,
+                                memoria_mb=memoria_poly_mb, float32=poly_float32)
+    resultados_grados = busqueda['resultados_grados']
+    mejor_grado = busqueda['mejor_grado']
+    mejor_r2_cv = busqueda['mejor_r2_cv']
+
+    print(f"[ML] Mejor grado polinomial: {mejor_grado} (R2_CV={mejor_r2_cv:.4f}, "
+          f"{busqueda['tiempo_s']}s, n_jobs={busqueda['n_jobs']})")
+
+    # El pipeline del mejor grado ya se ajusto sobre train en la busqueda
+    progreso('final', 80, f'Grado {mejor_grado}: metricas finales')
+    pipe_mejor_poly = busqueda['pipelines'].get(mejor_grado)
+    if pipe_mejor_poly is None and regularizacion:
+        raise ErrorEntrenamiento(f'Ningun grado pudo ajustarse con {regularizacion}', 500)
+    if pipe_mejor_poly is None:
+        pipe_mejor_poly = RegresionPolinomialBloques(
+            mejor_grado, memoria_poly_mb, poly_float32).fit(X_train, y_train).pipeline_
+
+    y_pred_poly_final = pipe_mejor_poly.predict(X_test)
+    r2_poly = float(r2_score(y_test, y_pred_poly_final))
+    mae_poly = float(mean_absolute_error(y_test, y_pred_poly_final))
+    rmse_poly = float(np.sqrt(mean_squared_error(y_test, y_pred_poly_final)))
+
+    alpha_poly = resultados_grados[mejor_grado].get('alpha')
+    if regularizacion:
+        cv_poly_final = r2_cv_regularizado(regularizacion, mejor_grado, alpha_poly, X, y, cv=5,
+                                           n_jobs=n_jobs, memoria_mb=memoria_poly_mb,
+                                           float32=poly_float32)
+    else:
+        cv_poly_final = cross_val_score(
+            RegresionPolinomialBloques(mejor_grado, memoria_poly_mb, poly_float32),
+            X, y, cv=5, scoring='r2', n_jobs=n_jobs)
+    r2_cv_poly = float(cv_poly_final.mean())
+
+    metricas_polinomial = {
+        'r2': round(r2_poly, 4),
+        'r2_cv': round(r2_cv_poly, 4),
+        'mae': round(mae_poly, 2),
+        'rmse': round(rmse_poly, 2),
+        'grado': mejor_grado
+    }
+    if regularizacion:
+        metricas_polinomial.update(regularizacion=regularizacion, alpha=alpha_poly)
+    print(f"[OK] Polinomial(grado {mejor_grado}): R2={r2_poly:.4f}, "
+          f"R2_CV={r2_cv_poly:.4f}, MAE={mae_poly:.2f}")
+
+    # -----------------------------------------------------------
+    # 2b) Modelos por region (pool de procesos)
+    # -----------------------------------------------------------
+    modelos_region = {}
+    resumen_regional = None
+    if por_region:
+        progreso('regional', 85, 'Entrenando modelos por region')
+        modelos_region, resumen_regional = entrenar_regiones(
+            X, y, regiones, mejor_grado, n_jobs=n_jobs
+        )
+
+    # -----------------------------------------------------------
+    # 3) Calcular umbrales de riesgo
+    # -----------------------------------------------------------
+    umbrales = {
+        'p25': float(np.percentile(y, 25)),
+        'p50': float(np.percentile(y, 50)),
+        'p75': float(np.percentile(y, 75)),
+        'p90': float(np.percentile(y, 90)),
+        'media': float(np.mean(y)),
+        'std': float(np.std(y)),
+        'max': float(np.max(y)),
+        'min': float(np.min(y))
+    }
+
+    # Estadisticas suficientes de train para actualizaciones incrementales
+    estadisticas = estadisticas_entrenamiento(pipe_lineal, pipe_mejor_poly, X_train, y_train,
+                                              hasta=datos.get('fecha_max'))
+
+    # -----------------------------------------------------------
+    # 4) Guardar modelos (bundle unico, escritura atomica)
+    # -----------------------------------------------------------
+    progreso('persistencia', 95, os.path.basename(MODEL_BUNDLE))
+    metricas_all = {
+        'lineal': metricas_lineal,
+        'polinomial': metricas_polinomial,
+        'poly_degree': mejor_grado
+    }
+    compilado_lineal = compilar_modelo(pipe_lineal, 'Regresion Lineal')
+    compilado_polinomial = compilar_modelo(pipe_mejor_poly, 'Regresion Polinomial')
+
+    manifiesto = guardar_bundle({
+        'modelo_lineal': pipe_lineal,
+        'modelo_polinomial': pipe_mejor_poly,
+        'compilado_lineal': compilado_lineal.exportar() if compilado_lineal else None,
+        'compilado_polinomial': compilado_polinomial.exportar() if compilado_polinomial else None,
+        'label_encoder': label_encoder,
+        'feature_cols': available_features,
+        'metricas': metricas_all,
+        'umbrales': umbrales,
+        'modelos_region': {id_region: shard.exportar() for id_region, shard in modelos_region.items()},
+        'estadisticas': estadisticas
+    }, MODEL_BUNDLE)
+
+    # -----------------------------------------------------------
+    # 5) Determinar mejor modelo
+    # -----------------------------------------------------------
+    mejor = 'polinomial' if r2_cv_poly >= r2_cv_lin else 'lineal'
+    mejor_r2 = max(r2_poly, r2_lin)
+    mejor_mae = metricas_polinomial['mae'] if mejor == 'polinomial' else metricas_lineal['mae']
+
+    print(f"[OK] Mejor modelo: {mejor} (R2={mejor_r2:.4f})")
+
+    return {
+        'success': True,
+        'tipo_modelo': 'regresor',
+        'mensaje': (f'Modelos entrenados - Mejor: '
+                    f'{"Polinomial grado " + str(mejor_grado) if mejor == "polinomial" else "Lineal"} '
+                    f'(R2={mejor_r2:.4f})'),
+        'metricas': {
+            'r2_score': round(mejor_r2, 4),
+            'mae': round(mejor_mae, 2)
+        },
+        'datos': {
+            'total_registros': datos['total_registros'],
+            'registros_entrenamiento': len(X_train),
+            'registros_prueba': len(X_test),
+            'features': available_features,
+            'cache_features': datos['cache_features']
+        },
+        'archivo_guardado': os.path.basename(MODEL_BUNDLE),
+        'bundle': manifiesto,
+        'busqueda_grado': {
+            'n_jobs': busqueda['n_jobs'],
+            'tiempo_s': busqueda['tiempo_s']
+        },
+        'comparativa': {
+            'lineal': metricas_lineal,
+            'polinomial': metricas_polinomial,
+            'grados_evaluados': resultados_grados,
+            'mejor_modelo': mejor,
+            'mejor_grado': mejor_grado
+        },
+        'modelos_regionales': resumen_regional,
+        'umbrales_riesgo': umbrales
+    }
@@ -0,0 +1,323 @@
+# backend/entrenamiento_incremental.py
+# Actualizacion incremental de los modelos globales por minimos cuadrados.
+# Los pipelines [PolynomialFeatures ->] StandardScaler -> LinearRegression
+# quedan determinados por los momentos de sus features (media, M2) y su
+# covarianza con y; se guardan en el bundle y cada carga semanal solo suma
+# las semanas nuevas y vuelve a resolver, sin reentrenar sobre el historico.
+
+import copy
+import threading
+import time
+
+import numpy as np
+
+from config import MODEL_BUNDLE, INCREMENTAL_MAX_TERMINOS
+
+# Filas por bloque al acumular (acota la memoria de la expansion polinomial)
+FILAS_BLOQUE = 4096
+
+# Una sola actualizacion a la vez: cada una parte del snapshot vigente
+_lock_actualizacion = threading.Lock()
+
+
+class EstadisticasMCO:
+    """Estadisticas suficientes de una regresion lineal con escalado.
+
+    Guarda n, medias de las features (media_z) y de y, la matriz de
+    desviaciones cruzadas M2 = sum (z - media)(z - media)^T, sum (z - media)(y - media_y)
+    y sum (y - media_y)^2. Se combinan con la formula de Chan et al., que es
+    estable numericamente (no resta sumas de cuadrados grandes). Inmutable:
+    acumular() devuelve una instancia nueva.
+    """
+    __slots__ = ('n', 'media_z', 'media_y', 'm2_zz', 'm2_zy', 'm2_yy')
+
+    def __init__(self, n, media_z, media_y, m2_zz, m2_zy, m2_yy):
+        self.n = int(n)
+        self.media_z = media_z
+        self.media_y = float(media_y)
+        self.m2_zz = m2_zz
+        self.m2_zy = m2_zy
+        self.m2_yy = float(m2_yy)
+
+    @classmethod
+    def de_bloque(cls, Z, y):
+        Z = np.asarray(Z, dtype=float)
+        y = np.asarray(y, dtype=float)
+        media_z = Z.mean(axis=0)
+        media_y = float(y.mean())
+        Zc = Z - media_z
+        yc = y - media_y
+        return cls(len(y), media_z, media_y, Zc.T @ Zc, Zc.T @ yc, float(yc @ yc))
+
+    def combinar(self, otra):
+        """Estadisticas de la union de ambos conjuntos de datos."""
+        if otra.n == 0:
+            return self
+        if self.n == 0:
+            return otra
+        n = self.n + otra.n
+        delta_z = otra.media_z - self.media_z
+        delta_y = otra.media_y - self.media_y
+        factor = self.n * otra.n / n
+        return EstadisticasMCO(
+            n,
+            self.media_z + delta_z * (otra.n / n),
+            self.media_y + delta_y * (otra.n / n),
+            self.m2_zz + otra.m2_zz + factor * np.outer(delta_z, delta_z),
+            self.m2_zy + otra.m2_zy + factor * delta_z * delta_y,
+            self.m2_yy + otra.m2_yy + factor * delta_y * delta_y
+        )
+
+    def acumular(self, Z, y):
+        """Suma filas nuevas (features ya expandidas) por bloques."""
+        resultado = self
+        for inicio in range(0, len(y), FILAS_BLOQUE):
+            fin = inicio + FILAS_BLOQUE
+            resultado = resultado.combinar(EstadisticasMCO.de_bloque(Z[inicio:fin], y[inicio:fin]))
+        return resultado
+
+    def resolver(self, alpha=0.0):
+        """Media, escala (como StandardScaler) y coeficientes en el espacio escalado.
+
+        Resuelve las ecuaciones normales de la correlacion con lstsq, que da
+        la solucion de norma minima, igual que LinearRegression sobre los
+        datos escalados; con alpha > 0 resuelve (Z^T Z + alpha I), igual que Ridge.
+
+        Returns:
+            (media, var, escala, coef_escalado, intercepto)
+        """
+        var, escala = self.escalado()
+        correlacion = self.m2_zz / np.outer(escala, escala)
+        if alpha:
+            correlacion[np.diag_indices_from(correlacion)] += alpha
+        coef = np.linalg.lstsq(correlacion, self.m2_zy / escala, rcond=None)[0]
+        return self.media_z, var, escala, coef, self.media_y
+
+    def escalado(self):
+        """(var, escala) como StandardScaler: escala 1 en terminos constantes."""
+        var = np.diag(self.m2_zz) / self.n
+        escala = np.sqrt(var)
+        escala[escala < 10 * np.finfo(float).eps * np.maximum(np.abs(self.media_z), 1)] = 1.0
+        return var, escala
+
+    def exportar(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    @classmethod
+    def desde_exportado(cls, datos):
+        return cls(**datos)
+
+
+def _expansion(pipeline):
+    """Pasos previos al StandardScaler (p.ej. PolynomialFeatures)."""
+    pasos = list(pipeline.named_steps.values())
+    return pasos[:pasos.index(pipeline.named_steps['scaler'])]
+
+
+def _expandir(pipeline, X):
+    Z = np.asarray(X, dtype=float)
+    for paso in _expansion(pipeline):
+        Z = paso.transform(Z)
+    return Z
+
+
+def _alpha_resoluble(pipeline):
+    """alpha del regresor si se resuelve en forma cerrada (LinearRegression = 0,
+    Ridge = su alpha); None si no (p.ej. Lasso)."""
+    from sklearn.linear_model import LinearRegression, Ridge
+
+    regresor = pipeline.named_steps['regressor']
+    if isinstance(regresor, Ridge):
+        return float(regresor.alpha)
+    if isinstance(regresor, LinearRegression):
+        return 0.0
+    return None
+
+
+def n_terminos(pipeline):
+    """Features que recibe el scaler (define el tamano de M2)."""
+    poly = pipeline.named_steps.get('poly')
+    return int(poly.n_output_features_) if poly is not None else int(pipeline.n_features_in_)
+
+
+def estadisticas_pipeline(pipeline, X, y):
+    """Estadisticas de las features expandidas de X, o None si son demasiadas.
+
+    Con mas de INCREMENTAL_MAX_TERMINOS terminos (p.ej. grado 5 con 11
+    features, 4367 terminos) M2 ocuparia cientos de MB y resolverla no
+    seria mas rapido que reentrenar; ese modelo solo se actualiza con un
+    entrenamiento completo. Lo mismo para regresores sin forma cerrada (Lasso).
+    """
+    if (pipeline is None or n_terminos(pipeline) > INCREMENTAL_MAX_TERMINOS
+            or _alpha_resoluble(pipeline) is None):
+        return None
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    vacia = EstadisticasMCO(0, None, 0.0, None, None, 0.0)
+    resultado = vacia
+    for inicio in range(0, len(y), FILAS_BLOQUE):
+        fin = inicio + FILAS_BLOQUE
+        resultado = resultado.combinar(
+            EstadisticasMCO.de_bloque(_expandir(pipeline, X[inicio:fin]), y[inicio:fin]))
+    return resultado
+
+
+def pipeline_desde_estadisticas(plantilla, estadisticas):
+    """Copia de plantilla con scaler y regresor resueltos desde las estadisticas."""
+    media, var, escala, coef, intercepto = estadisticas.resolver(_alpha_resoluble(plantilla) or 0.0)
+    return fijar_parametros(copy.deepcopy(plantilla), media, var, escala, estadisticas.n,
+                            coef, intercepto)
+
+
+def fijar_parametros(pipeline, media, var, escala, n, coef, intercepto):
+    """Asigna scaler y regresor de un pipeline (los pasos previos ya ajustados)."""
+    scaler = pipeline.named_steps['scaler']
+    scaler.mean_ = media.copy()
+    scaler.var_ = var
+    scaler.scale_ = escala
+    scaler.n_samples_seen_ = n
+
+    regresor = pipeline.named_steps['regressor']
+    regresor.coef_ = coef
+    regresor.intercept_ = float(intercepto)
+    return pipeline
+
+
+def estadisticas_entrenamiento(pipe_lineal, pipe_polinomial, X, y, hasta=None):
+    """Artefacto 'estadisticas' del bundle para los modelos recien ajustados.
+
+    Args:
+        X, y: datos con los que se ajustaron los pipelines (train)
+        hasta: ultima fecha_fin_semana incluida (marca para la proxima actualizacion)
+    """
+    modelos = {}
+    for nombre, pipeline in (('lineal', pipe_lineal), ('polinomial', pipe_polinomial)):
+        est = estadisticas_pipeline(pipeline, X, y)
+        modelos[nombre] = est.exportar() if est is not None else None
+    return {
+        'modelos': modelos,
+        'hasta': str(hasta)[:10] if hasta is not None else None,
+        'actualizaciones': 0
+    }
+
+
+def _metricas_nuevas(pipeline, X, y):
+    """Error del modelo anterior sobre las semanas nuevas (antes de sumarlas)."""
+    from sklearn.metrics import mean_absolute_error
+    if pipeline is None:
+        return None
+    return {'mae': round(float(mean_absolute_error(y, pipeline.predict(X))), 2)}
+
+
+def actualizar(data, snap, progreso=None):
+    """Suma las semanas nuevas de dato_epidemiologico y re-resuelve los modelos globales.
+
+    Los modelos regionales (ver entrenamiento_regional.py) no se tocan;
+    siguen vigentes hasta el proximo entrenamiento completo.
+
+    Args:
+        data: payload (desde opcional: fecha a partir de la cual leer;
+            id_enfermedad y tam_bloque como en el entrenamiento desde BD)
+        snap: snapshot vigente (modelos y estadisticas de partida)
+
+    Returns:
+        dict de respuesta; 'bundle' es None si no habia semanas nuevas
+
+    Raises:
+        ErrorEntrenamiento: sin estadisticas, sin fecha de partida o sin BD
+    """
+    from bundle_modelos import guardar_bundle
+    from entrenador import ErrorEntrenamiento
+    from fuente_bd import leer_series_bd
+    from ml import compilar_modelo
+
+    estadisticas = snap.estadisticas
+    if not estadisticas or not any((estadisticas.get('modelos') or {}).values()):
+        raise ErrorEntrenamiento('Los modelos vigentes no tienen estadisticas incrementales; '
+                                 'ejecute un entrenamiento completo', 409)
+
+    desde = data.get('desde') or estadisticas.get('hasta')
+    if not desde:
+        raise ErrorEntrenamiento('desde es requerido (el entrenamiento vigente no registro fechas)', 400)
+
+    with _lock_actualizacion:
+        inicio = time.perf_counter()
+        try:
+            nuevos = leer_series_bd(id_enfermedad=data.get('id_enfermedad'),
+                                    tam_bloque=data.get('tam_bloque'),
+                                    label_encoder=snap.label_encoder, desde=desde)
+        except RuntimeError as e:
+            raise ErrorEntrenamiento(str(e), 503)
+
+        X = nuevos['X'][snap.feature_cols or list(nuevos['X'].columns)]
+        y = nuevos['y']
+        if len(X) == 0:
+            return {
+                'success': True,
+                'mensaje': f'Sin semanas nuevas despues de {desde}',
+                'registros_nuevos': 0,
+                'bundle': None
+            }
+
+        modelos = {}
+        actualizados = []
+        error_previo = {}
+        for nombre in ('lineal', 'polinomial'):
+            pipeline = getattr(snap, f'modelo_{nombre}')
+            exportado = estadisticas['modelos'].get(nombre)
+            error_previo[nombre] = _metricas_nuevas(pipeline, X, y)
+            if pipeline is None or exportado is None:
+                modelos[nombre] = (pipeline, exportado)
+                continue
+            est = EstadisticasMCO.desde_exportado(exportado).acumular(_expandir(pipeline, X), y.values)
+            modelos[nombre] = (pipeline_desde_estadisticas(pipeline, est), est.exportar())
+            actualizados.append(nombre)
+
+        pipe_lineal, est_lineal = modelos['lineal']
+        pipe_polinomial, est_polinomial = modelos['polinomial']
+        compilado_lineal = compilar_modelo(pipe_lineal, 'Regresion Lineal', verbose=False)
+        compilado_polinomial = compilar_modelo(pipe_polinomial, 'Regresion Polinomial', verbose=False)
+
+        actualizacion = {
+            'registros_nuevos': len(X),
+            'desde': str(desde)[:10],
+            'hasta': nuevos['fecha_max'],
+            'modelos_actualizados': actualizados,
+            'mae_previo_semanas_nuevas': error_previo
+        }
+        metricas = {
+            'lineal': snap.metricas_lineal,
+            'polinomial': snap.metricas_polinomial,
+            'poly_degree': snap.poly_degree,
+            'actualizacion': actualizacion
+        }
+        manifiesto = guardar_bundle({
+            'modelo_lineal': pipe_lineal,
+            'modelo_polinomial': pipe_polinomial,
+            'compilado_lineal': compilado_lineal.exportar() if compilado_lineal else None,
+            'compilado_polinomial': compilado_polinomial.exportar() if compilado_polinomial else None,
+            'label_encoder': snap.label_encoder,
+            'feature_cols': snap.feature_cols,
+            'metricas': metricas,
+            'umbrales': snap.umbrales_riesgo,
+            'modelos_region': {id_region: shard.exportar()
+                               for id_region, shard in snap.modelos_region.items()},
+            'estadisticas': {
+                'modelos': {'lineal': est_lineal, 'polinomial': est_polinomial},
+                'hasta': nuevos['fecha_max'] or estadisticas.get('hasta'),
+                'actualizaciones': estadisticas.get('actualizaciones', 0) + 1
+            }
+        }, MODEL_BUNDLE)
+
+    tiempo = round(time.perf_counter() - inicio, 3)
+    print(f"[OK] Actualizacion incremental: {len(X)} registros nuevos, "
+          f"modelos {', '.join(actualizados) or 'ninguno'} ({tiempo}s)")
+
+    return {
+        'success': True,
+        'mensaje': f'{len(X)} registros nuevos incorporados ({", ".join(actualizados)})',
+        'registros_nuevos': len(X),
+        'actualizacion': actualizacion,
+        'tiempo_s': tiempo,
+        'bundle': manifiesto
+    }
@@ -0,0 +1,152 @@
+# backend/entrenamiento_regional.py
+# Entrenamiento de un modelo por region (shards) en un pool de procesos.
+# Cada region ajusta su propia Regresion Lineal y Polinomial con solo sus
+# registros; ModelStore enruta las predicciones a ese modelo y usa el
+# global para las regiones sin shard.
+
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from config import ESTADO_POR_ID, ENTRENAMIENTO_N_JOBS, MIN_REGISTROS_REGION
+
+
+def _normalizar(nombre):
+    """Nombre de estado sin acentos ni mayusculas para comparar."""
+    texto = unicodedata.normalize('NFKD', str(nombre).strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+_ID_POR_NOMBRE = {_normalizar(nombre): id_region for id_region, nombre in ESTADO_POR_ID.items()}
+
+
+def ids_region(df, col_estado=None, label_encoder=None):
+    """id_region (INEGI) de cada fila del DataFrame de entrenamiento.
+
+    Usa, en orden: columna id_region, columna de estado (codigo numerico o
+    nombre) o estado_coded + LabelEncoder. Filas no reconocidas quedan NaN.
+
+    Returns:
+        pd.Series alineada con df, o None si no hay forma de identificar la region.
+    """
+    if 'id_region' in df.columns:
+        return pd.to_numeric(df['id_region'], errors='coerce')
+
+    if col_estado and col_estado in df.columns:
+        columna = df[col_estado]
+        if pd.api.types.is_numeric_dtype(columna):
+            return columna.astype(float)
+        return columna.map(lambda v: _ID_POR_NOMBRE.get(_normalizar(v))).astype(float)
+
+    if 'estado_coded' in df.columns and label_encoder is not None:
+        clases = list(getattr(label_encoder, 'classes_', []))
+        por_codigo = {i: _ID_POR_NOMBRE.get(_normalizar(c)) for i, c in enumerate(clases)}
+        return df['estado_coded'].map(por_codigo).astype(float)
+
+    return None
+
+
+def _metricas(y_true, y_pred):
+    from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+    return {
+        'r2': round(float(r2_score(y_true, y_pred)), 4),
+        'mae': round(float(mean_absolute_error(y_true, y_pred)), 2),
+        'rmse': round(float(np.sqrt(mean_squared_error(y_true, y_pred))), 2)
+    }
+
+
+def entrenar_region(id_region, X, y, grado):
+    """Ajusta Lineal y Polinomial(grado) para una region (se ejecuta en un worker).
+
+    Misma particion 80/20 (random_state=42) y pipelines (seleccion_grado) que el modelo global.
+
+    Returns:
+        dict con los argumentos de ModeloRegional.
+    """
+    from sklearn.model_selection import train_test_split
+    from seleccion_grado import pipeline_lineal, pipeline_polinomial
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    pipe_lineal = pipeline_lineal()
+    pipe_lineal.fit(X_train, y_train)
+
+    pipe_poly = pipeline_polinomial(grado)
+    pipe_poly.fit(X_train, y_train)
+
+    return {
+        'id_region': int(id_region),
+        'modelo_lineal': pipe_lineal,
+        'modelo_polinomial': pipe_poly,
+        'poly_degree': grado,
+        'metricas_lineal': _metricas(y_test, pipe_lineal.predict(X_test)),
+        'metricas_polinomial': dict(_metricas(y_test, pipe_poly.predict(X_test)), grado=grado),
+        'n_registros': len(X)
+    }
+
+
+def entrenar_regiones(X, y, regiones, grado, n_jobs=None, min_registros=None):
+    """Entrena un ModeloRegional por region en paralelo (procesos loky).
+
+    Las regiones con menos de min_registros filas, o cuyo mejor modelo no
+    supera a la media (R2 <= 0 en prueba), no reciben shard y se siguen
+    prediciendo con el modelo global.
+
+    Args:
+        X: DataFrame de features (mismo orden que el modelo global)
+        y: Serie objetivo alineada con X
+        regiones: id_region por fila (alineado con X; NaN = sin region)
+        grado: grado polinomial (el elegido para el modelo global)
+        n_jobs: procesos (ENTRENAMIENTO_N_JOBS si None)
+
+    Returns:
+        (dict id_region -> ModeloRegional, dict resumen)
+    """
+    from joblib import Parallel, delayed
+    from ml import ModeloRegional
+
+    n_jobs = ENTRENAMIENTO_N_JOBS if n_jobs is None else n_jobs
+    min_registros = MIN_REGISTROS_REGION if min_registros is None else min_registros
+
+    regiones = np.asarray(regiones, dtype=float)
+    tareas = []
+    omitidas = {}
+    for id_region in np.unique(regiones[~np.isnan(regiones)]):
+        idx = np.flatnonzero(regiones == id_region)
+        if len(idx) < min_registros:
+            omitidas[int(id_region)] = f'{len(idx)} registros (< {min_registros})'
+            continue
+        tareas.append((int(id_region), idx))
+
+    print(f"[ML] Entrenando {len(tareas)} modelos regionales (n_jobs={n_jobs})...")
+    inicio = time.perf_counter()
+    resultados = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(entrenar_region)(id_region, X.iloc[idx], y.iloc[idx], grado)
+        for id_region, idx in tareas
+    )
+
+    shards = {}
+    for res in resultados:
+        mejor_r2 = max(res['metricas_lineal']['r2'], res['metricas_polinomial']['r2'])
+        if mejor_r2 <= 0:
+            omitidas[res['id_region']] = f'R2 de prueba {mejor_r2}'
+            continue
+        shards[res['id_region']] = ModeloRegional(**res)
+
+    print(f"[OK] Modelos regionales: {len(shards)} entrenados, {len(omitidas)} usan el global")
+    return shards, {
+        'entrenados': len(shards),
+        'n_jobs': n_jobs,
+        'tiempo_s': round(time.perf_counter() - inicio, 2),
+        'omitidas': omitidas,
+        'metricas': {
+            id_region: {
+                'n_registros': shard.n_registros,
+                'lineal': shard.metricas_lineal,
+                'polinomial': shard.metricas_polinomial
+            }
+            for id_region, shard in sorted(shards.items())
+        }
+    }
@@ -0,0 +1,136 @@
+# backend/escritura_bd.py
+# Escritura masiva en MySQL: las tuplas de parametros se arman directo de los
+# arreglos de columna (sin iterrows) y se envian en INSERT multi-fila
+# ... ON DUPLICATE KEY UPDATE de ESCRITURA_LOTE_BD filas, con commit cada
+# ESCRITURA_COMMIT_BD filas. Una carga semanal completa son unas pocas
+# sentencias en lugar de un round-trip por fila.
+
+from itertools import chain, repeat
+
+import numpy as np
+
+from config import ESCRITURA_LOTE_BD, ESCRITURA_COMMIT_BD, ESTADO_POR_ID, POBLACION_2025
+
+COLUMNAS_DATO = ('id_enfermedad', 'id_region', 'fecha_fin_semana', 'casos_confirmados',
+                 'defunciones', 'tasa_incidencia', 'riesgo_brote_target', 'fecha_carga')
+
+# Columnas que se reemplazan si la (enfermedad, region, semana) ya existe
+ACTUALIZAR_DATO = ('casos_confirmados', 'tasa_incidencia', 'riesgo_brote_target', 'fecha_carga')
+# defunciones solo se reemplaza si la fuente la trae (si no, se conserva la guardada)
+ACTUALIZAR_DATO_DEFUNCIONES = ACTUALIZAR_DATO + ('defunciones',)
+
+COLUMNAS_REGION = ('id_region', 'nombre', 'codigo_entidad_inegi', 'poblacion')
+
+
+def sql_upsert(tabla, columnas, actualizar, n_filas):
+    """INSERT de n_filas filas con ON DUPLICATE KEY UPDATE de las columnas actualizar."""
+    fila = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+    return (f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES "
+            + ', '.join([fila] * n_filas)
+            + ' ON DUPLICATE KEY UPDATE '
+            + ', '.join(f'{c} = VALUES({c})' for c in actualizar))
+
+
+def filas_dato(id_region, fechas, casos, tasas, riesgo, fecha_carga,
+               id_enfermedad=1, defunciones=0):
+    """Tuplas en orden COLUMNAS_DATO a partir de arreglos alineados.
+
+    Las columnas se convierten a tipos de Python de una vez (tolist) en
+    lugar de fila por fila; la tasa se redondea a 4 decimales como en la BD.
+
+    Args:
+        id_region, casos, riesgo: enteros por fila
+        fechas: fechas de fin de semana (cualquier arreglo convertible a datetime64)
+        tasas: tasa de incidencia por fila
+        fecha_carga: date de la carga (igual para todas las filas)
+        id_enfermedad: constante de todas las filas
+        defunciones: entero por fila, o constante de todas las filas
+
+    Returns:
+        list de tuplas
+    """
+    n = len(id_region)
+    if np.ndim(defunciones):
+        defunciones = np.asarray(defunciones, dtype=np.int64).tolist()
+    else:
+        defunciones = repeat(defunciones, n)
+    return list(zip(
+        repeat(id_enfermedad, n),
+        np.asarray(id_region, dtype=np.int64).tolist(),
+        np.asarray(fechas, dtype='datetime64[D]').tolist(),
+        np.asarray(casos, dtype=np.int64).tolist(),
+        defunciones,
+        np.round(np.asarray(tasas, dtype=float), 4).tolist(),
+        np.asarray(riesgo, dtype=np.int64).tolist(),
+        repeat(fecha_carga, n)
+    ))
+
+
+def upsert_masivo(conn, tabla, columnas, filas, actualizar, tam_lote=None, filas_commit=None,
+                  progreso=None):
+    """Inserta/actualiza filas en lotes multi-fila con commits parciales.
+
+    Cada commit deja escritas las filas previas; como el upsert es
+    idempotente, si la carga falla a la mitad basta con repetirla.
+
+    Args:
+        conn: conexion MySQL abierta (no se cierra aqui)
+        tabla, columnas: destino y orden de las tuplas
+        filas: secuencia de tuplas
+        actualizar: columnas del ON DUPLICATE KEY UPDATE
+        tam_lote: filas por sentencia (ESCRITURA_LOTE_BD si None)
+        filas_commit: filas entre commits (ESCRITURA_COMMIT_BD si None)
+        progreso: callable(escritas, total) tras cada lote
+
+    Returns:
+        int filas enviadas
+    """
+    tam_lote = max(1, int(tam_lote or ESCRITURA_LOTE_BD))
+    filas_commit = max(tam_lote, int(filas_commit or ESCRITURA_COMMIT_BD))
+    total = len(filas)
+    sql_lote = sql_upsert(tabla, columnas, actualizar, tam_lote)
+
+    cursor = conn.cursor()
+    try:
+        escritas = sin_commit = 0
+        for inicio in range(0, total, tam_lote):
+            lote = filas[inicio:inicio + tam_lote]
+            sql = sql_lote if len(lote) == tam_lote else sql_upsert(tabla, columnas, actualizar, len(lote))
+            cursor.execute(sql, list(chain.from_iterable(lote)))
+            escritas += len(lote)
+            sin_commit += len(lote)
+            if sin_commit >= filas_commit:
+                conn.commit()
+                sin_commit = 0
+            if progreso:
+                progreso(escritas, total)
+        if sin_commit:
+            conn.commit()
+    finally:
+        cursor.close()
+    return escritas
+
+
+def upsert_datos_epidemiologicos(conn, filas, con_defunciones=False, **kwargs):
+    """upsert_masivo sobre dato_epidemiologico (filas de filas_dato).
+
+    Con con_defunciones=False las filas nuevas se insertan con su valor de
+    defunciones pero las existentes conservan el guardado.
+    """
+    actualizar = ACTUALIZAR_DATO_DEFUNCIONES if con_defunciones else ACTUALIZAR_DATO
+    return upsert_masivo(conn, 'dato_epidemiologico', COLUMNAS_DATO, filas, actualizar, **kwargs)
+
+
+def upsert_regiones(conn, ids_region=None):
+    """Catalogo region (ESTADO_POR_ID / POBLACION_2025); si ya existe solo se actualiza la poblacion.
+
+    Args:
+        conn: conexion MySQL abierta
+        ids_region: regiones a asegurar (todas si None)
+
+    Returns:
+        int filas enviadas
+    """
+    ids_region = sorted(ESTADO_POR_ID) if ids_region is None else sorted(int(i) for i in ids_region)
+    filas = [(i, ESTADO_POR_ID[i], i, POBLACION_2025[i]) for i in ids_region]
+    return upsert_masivo(conn, 'region', COLUMNAS_REGION, filas, ('poblacion',))
@@ -0,0 +1,160 @@
+# backend/features.py
+# Features de rezago compartidas por entrenamiento e inferencia.
+# Las series se procesan como arreglos: los rezagos por region se obtienen
+# desplazando el arreglo completo y anulando las posiciones que cruzan el
+# inicio de una region (sin groupby().transform(lambda) por grupo).
+
+import numpy as np
+
+FEATURE_COLS = [
+    'casos_lag_1w', 'casos_lag_2w', 'casos_lag_3w', 'casos_lag_4w',
+    'ti_lag_1w', 'ti_lag_2w',
+    'casos_promedio_4w', 'tendencia_4w',
+    'semana_anio', 'mes', 'estado_coded'
+]
+
+# Las primeras 8 columnas dependen solo de la historia de la serie
+COLS_REZAGO = FEATURE_COLS[:8]
+
+# Semanas de historia que usan las features
+VENTANA = 4
+
+
+def posicion_en_grupo(grupos):
+    """Indice de cada fila dentro de su bloque contiguo de grupo (0, 1, 2, ...)."""
+    grupos = np.asarray(grupos)
+    n = len(grupos)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    largos = np.diff(np.r_[inicios, n])
+    return np.arange(n) - np.repeat(inicios, largos)
+
+
+def _orden_estable(grupos):
+    """Permutacion estable que agrupa las filas por clave.
+
+    Claves enteras con rango < 2**16 se ordenan como uint16 (radix sort, O(n)).
+    """
+    if np.issubdtype(grupos.dtype, np.integer):
+        minimo = grupos.min()
+        if int(grupos.max()) - int(minimo) < 2 ** 16:
+            return np.argsort((grupos - minimo).astype(np.uint16), kind='stable')
+    else:
+        grupos = np.unique(grupos, return_inverse=True)[1]
+    return np.argsort(grupos, kind='stable')
+
+
+def features_rezago(casos, tasas=None, grupos=None):
+    """Rezagos, promedio y tendencia de 4 semanas por grupo (orden COLS_REZAGO).
+
+    Equivale a groupby(grupo).shift(k) para los rezagos y a
+    groupby(grupo).transform(lambda x: x.rolling(4, min_periods=1).mean().shift(1))
+    para el promedio. Dentro de cada grupo las filas deben venir en orden
+    cronologico; los grupos pueden estar intercalados (se reordenan de forma
+    estable y el resultado vuelve al orden de entrada). O(n) para claves
+    enteras.
+
+    Args:
+        casos: casos confirmados por fila
+        tasas: tasa de incidencia por fila (None = columnas ti en 0)
+        grupos: clave de region por fila (None = una sola serie)
+
+    Returns:
+        ndarray (n, 8) con NaN donde falta historia
+    """
+    casos = np.asarray(casos, dtype=float)
+    tasas = None if tasas is None else np.asarray(tasas, dtype=float)
+    n = len(casos)
+    orden = None
+    if grupos is None:
+        posicion = np.arange(n)
+    else:
+        grupos = np.asarray(grupos)
+        if n > 1 and np.any(grupos[1:] < grupos[:-1]):
+            orden = _orden_estable(grupos)
+            grupos = grupos[orden]
+            casos = casos[orden]
+            tasas = None if tasas is None else tasas[orden]
+        posicion = posicion_en_grupo(grupos)
+
+    # Columnas contiguas: cada rezago es una copia desplazada del arreglo
+    salida = np.empty((n, len(COLS_REZAGO)), order='F')
+    for k in range(1, VENTANA + 1):
+        salida[:k, k - 1] = np.nan
+        salida[k:, k - 1] = casos[:max(n - k, 0)]
+    if tasas is None:
+        salida[:, 4:6] = 0.0
+    else:
+        for k in (1, 2):
+            salida[:k, 3 + k] = np.nan
+            salida[k:, 3 + k] = tasas[:max(n - k, 0)]
+
+    # Solo las primeras semanas de cada grupo leen filas de otro grupo
+    cortas = np.flatnonzero(posicion < VENTANA)
+    for k in range(1, VENTANA + 1):
+        filas = cortas[posicion[cortas] < k]
+        salida[filas, k - 1] = np.nan
+        if tasas is not None and k <= 2:
+            salida[filas, 3 + k] = np.nan
+
+    # Promedio de las semanas previas disponibles (hasta 4; ignora NaN como rolling)
+    promedio = salida[:, 6]
+    np.add(salida[:, 0], salida[:, 1], out=promedio)
+    promedio += salida[:, 2]
+    promedio += salida[:, 3]
+    promedio *= 1.0 / VENTANA
+    incompletas = np.flatnonzero(np.isnan(promedio))
+    if len(incompletas):
+        rezagos = salida[incompletas, 0:4]
+        disponibles = np.count_nonzero(~np.isnan(rezagos), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            promedio[incompletas] = np.where(disponibles > 0,
+                                             np.nansum(rezagos, axis=1) / disponibles, np.nan)
+    np.subtract(salida[:, 0], salida[:, 3], out=salida[:, 7])
+
+    if orden is not None:
+        # Leer con la permutacion inversa columna por columna (escrituras
+        # secuenciales) es varias veces mas rapido que dispersar salida[orden]
+        inversa = np.empty(n, dtype=np.intp)
+        inversa[orden] = np.arange(n)
+        desordenada = np.empty_like(salida)
+        for j in range(salida.shape[1]):
+            np.take(salida[:, j], inversa, out=desordenada[:, j])
+        salida = desordenada
+    return salida
+
+
+def features_desde_historia(casos_lag, tasas_lag, n_validos=None, out=None):
+    """Las 8 features de rezago para inferencia a partir de la historia reciente.
+
+    Misma definicion que features_rezago cuando hay 4 semanas; con menos,
+    los rezagos faltantes toman la semana mas reciente y el promedio usa las
+    disponibles (como al predecir con pocas semanas en BD).
+
+    Args:
+        casos_lag: (R, 4) casos, columna 0 = semana mas reciente
+        tasas_lag: (R, 2) tasas, columna 0 = semana mas reciente
+        n_validos: (R,) semanas reales en casos_lag (None = 4)
+        out: arreglo (R, 8) preasignado (opcional)
+
+    Returns:
+        ndarray (R, 8) en orden COLS_REZAGO
+    """
+    casos_lag = np.asarray(casos_lag, dtype=float)
+    tasas_lag = np.asarray(tasas_lag, dtype=float)
+    out = np.empty((len(casos_lag), len(COLS_REZAGO))) if out is None else out
+
+    if n_validos is None:
+        out[:, 0:4] = casos_lag
+        out[:, 4:6] = tasas_lag
+        out[:, 6] = casos_lag.mean(axis=1)
+    else:
+        n_validos = np.asarray(n_validos)
+        validos = np.arange(VENTANA) < n_validos[:, None]
+        out[:, 0:4] = np.where(validos, casos_lag, casos_lag[:, :1])
+        out[:, 4] = tasas_lag[:, 0]
+        out[:, 5] = np.where(n_validos > 1, tasas_lag[:, 1], tasas_lag[:, 0])
+        out[:, 6] = np.where(validos, casos_lag, 0).sum(axis=1) / np.maximum(n_validos, 1)
+    out[:, 7] = out[:, 0] - out[:, 3]
+    return out
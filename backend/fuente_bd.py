@@ -0,0 +1,206 @@
+# backend/fuente_bd.py
+# Fuente de entrenamiento desde MySQL: recorre dato_epidemiologico en
+# bloques (cursor sin buffer, ordenado por region y semana) y calcula los
+# lags de cada bloque al vuelo, de modo que la tabla nunca se exporta ni se
+# materializa completa; solo se conserva la matriz de features final.
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import ESTADO_POR_ID, ENTRENAMIENTO_BLOQUE_BD
+from database import get_db_connection
+from features import FEATURE_COLS, VENTANA, features_rezago
+
+
+def encoder_estados():
+    """LabelEncoder sobre los 32 estados (codigos estables entre entrenamientos)."""
+    from sklearn.preprocessing import LabelEncoder
+    return LabelEncoder().fit(list(ESTADO_POR_ID.values()))
+
+
+def _features_bloque(regiones, casos, ti, fechas, n_previas, codigos, desde=None):
+    """Features de las filas nuevas de un bloque.
+
+    Los arreglos incluyen al inicio las n_previas filas arrastradas del
+    bloque anterior, de modo que los rezagos (features.features_rezago) de
+    las primeras filas del bloque se calculan con ellas. Solo se emiten filas
+    nuevas con las 4 semanas previas (equivale al dropna del CSV). Con desde
+    solo se emiten las filas posteriores a esa fecha (las previas son contexto).
+
+    Returns:
+        (matriz (m, 11) en orden FEATURE_COLS, objetivo (m,), id_region (m,),
+         fecha_fin_semana (m,))
+    """
+    rezagos = features_rezago(casos, ti, regiones)
+    completas = ~np.isnan(rezagos[:, VENTANA - 1])
+    completas[:n_previas] = False
+    if desde is not None:
+        completas &= fechas > desde
+    idx = np.flatnonzero(completas)
+    fechas_idx = pd.DatetimeIndex(fechas[idx])
+
+    matriz = np.empty((len(idx), len(FEATURE_COLS)), dtype=float)
+    matriz[:, 0:8] = rezagos[idx]
+    matriz[:, 8] = fechas_idx.isocalendar().week.to_numpy(dtype=float)
+    matriz[:, 9] = fechas_idx.month
+    matriz[:, 10] = codigos[regiones[idx]]
+    return matriz, casos[idx], regiones[idx], fechas[idx]
+
+
+def version_datos_bd(id_enfermedad=None):
+    """Version de los datos de dato_epidemiologico (clave del cache de features).
+
+    Cambia al insertar, borrar o corregir semanas: combina conteo, ultimo
+    id, ultima semana y las sumas de las columnas que usan las features.
+
+    Raises:
+        RuntimeError: sin conexion a la base de datos
+    """
+    filtro, params = '', ()
+    if id_enfermedad is not None:
+        filtro, params = 'WHERE id_enfermedad = %s', (int(id_enfermedad),)
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Sin conexion a la base de datos')
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*), MAX(id_dato), MAX(fecha_fin_semana),
+                   SUM(casos_confirmados), SUM(tasa_incidencia), SUM(id_region)
+            FROM dato_epidemiologico {filtro}
+        ''', params)
+        version = [str(v) for v in cursor.fetchone()]
+        cursor.close()
+    finally:
+        conn.close()
+    return version
+
+
+def leer_series_bd(id_enfermedad=None, tam_bloque=None, label_encoder=None, progreso=None,
+                   desde=None):
+    """Lee dato_epidemiologico por bloques y devuelve las features de entrenamiento.
+
+    Las features son las mismas que se crean desde un CSV crudo (lags de
+    casos y tasa por region, promedio y tendencia de 4 semanas, semana ISO,
+    mes y estado_coded). La matriz se reserva una sola vez con el COUNT(*)
+    de la consulta y cada bloque escribe directamente en ella.
+
+    Args:
+        id_enfermedad: filtrar por enfermedad (None = todas)
+        tam_bloque: filas por fetchmany (ENTRENAMIENTO_BLOQUE_BD si None)
+        label_encoder: encoder de estados (encoder_estados() si None)
+        progreso: callable(filas_leidas, total_filas)
+        desde: solo semanas posteriores a esta fecha (se leen ademas las
+            semanas previas necesarias para sus lags)
+
+    Returns:
+        dict con X (DataFrame FEATURE_COLS), y (Series), regiones (Series
+        id_region), fechas (fecha_fin_semana por fila), label_encoder,
+        total_registros, fecha_max, bloques y tiempo_s
+
+    Raises:
+        RuntimeError: sin conexion a la base de datos
+    """
+    tam_bloque = int(tam_bloque or ENTRENAMIENTO_BLOQUE_BD)
+    label_encoder = label_encoder or encoder_estados()
+
+    # estado_coded por id_region (indexable con el arreglo de regiones)
+    clases = {c: i for i, c in enumerate(getattr(label_encoder, 'classes_', []))}
+    codigos = np.array([
+        clases.get(ESTADO_POR_ID.get(i, ''), i - 1) for i in range(max(ESTADO_POR_ID) + 1)
+    ], dtype=float)
+
+    condiciones, params = [], []
+    if id_enfermedad is not None:
+        condiciones.append('id_enfermedad = %s')
+        params.append(int(id_enfermedad))
+    if desde is not None:
+        desde = np.datetime64(pd.Timestamp(desde).date(), 'D')
+        # Semanas de contexto para los lags (con holgura de una semana)
+        condiciones.append('fecha_fin_semana > %s')
+        params.append(str(desde - np.timedelta64(7 * (VENTANA + 1), 'D')))
+    filtro = ('WHERE ' + ' AND '.join(condiciones)) if condiciones else ''
+    params = tuple(params)
+
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Sin conexion a la base de datos')
+
+    inicio = time.perf_counter()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT COUNT(*) FROM dato_epidemiologico {filtro}', params)
+        total = int(cursor.fetchone()[0])
+        cursor.close()
+
+        X = np.empty((total, len(FEATURE_COLS)), dtype=float)
+        y = np.empty(total, dtype=float)
+        regiones_fila = np.empty(total, dtype=np.int64)
+        fechas_fila = np.empty(total, dtype='datetime64[D]')
+        n = 0
+        leidas = 0
+        bloques = 0
+        fecha_max = None
+
+        # Cursor sin buffer: el servidor envia las filas a medida que se piden
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(f'''
+            SELECT id_region, fecha_fin_semana, casos_confirmados, tasa_incidencia
+            FROM dato_epidemiologico {filtro}
+            ORDER BY id_region, fecha_fin_semana
+        ''', params)
+
+        previas = ([], [], [], [])
+        while True:
+            filas = cursor.fetchmany(tam_bloque)
+            if not filas:
+                break
+            bloques += 1
+            leidas += len(filas)
+
+            columnas = list(zip(*filas))
+            regiones = np.array(previas[0] + list(columnas[0]), dtype=np.int64)
+            fechas = np.array(previas[1] + list(columnas[1]), dtype='datetime64[D]')
+            casos = np.array(previas[2] + list(columnas[2]), dtype=float)
+            ti = np.array(previas[3] + list(columnas[3]), dtype=float)
+
+            matriz, objetivo, ids, semanas = _features_bloque(
+                regiones, casos, ti, fechas, len(previas[0]), codigos, desde)
+            X[n:n + len(matriz)] = matriz
+            y[n:n + len(matriz)] = objetivo
+            regiones_fila[n:n + len(matriz)] = ids
+            fechas_fila[n:n + len(matriz)] = semanas
+            n += len(matriz)
+            fecha_max = max(fecha_max, fechas.max()) if fecha_max is not None else fechas.max()
+
+            # Arrastrar las ultimas semanas para los lags del siguiente bloque
+            previas = (
+                regiones[-VENTANA:].tolist(), list(fechas[-VENTANA:]),
+                casos[-VENTANA:].tolist(), ti[-VENTANA:].tolist()
+            )
+            if progreso:
+                progreso(leidas, total)
+
+        cursor.close()
+    finally:
+        conn.close()
+
+    tiempo = round(time.perf_counter() - inicio, 2)
+    print(f"[INFO] dato_epidemiologico: {leidas} registros en {bloques} bloques "
+          f"({n} con lags completos, {tiempo}s)")
+
+    # Vistas sobre los arreglos reservados (sin copiar)
+    return {
+        'X': pd.DataFrame(X[:n], columns=FEATURE_COLS, copy=False),
+        'y': pd.Series(y[:n], name='casos_confirmados', copy=False),
+        'regiones': pd.Series(regiones_fila[:n], dtype=float, copy=False),
+        'fechas': fechas_fila[:n],
+        'label_encoder': label_encoder,
+        'total_registros': leidas,
+        'fecha_max': str(fecha_max) if fecha_max is not None else None,
+        'bloques': bloques,
+        'tiempo_s': tiempo
+    }
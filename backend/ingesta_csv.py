@@ -0,0 +1,501 @@
+# backend/ingesta_csv.py
+# Ingesta en streaming de CSV de casos SINAVE (un registro por caso). Es el
+# unico camino CSV -> serie semanal -> dato_epidemiologico: lo usan
+# routes/datos.py, ETL_LOADER.py y scripts/cargar_datos_epidemiologicos.py.
+# Solo se leen FECHA_SIGN_SINTOMAS, ENTIDAD_RES, ESTATUS_CASO (y DEFUNCION si
+# existe), en bloques de CSV_BLOQUE_FILAS filas con tipos compactos (fecha
+# como categoria, codigos en float32), y cada bloque se acumula en conteos
+# por region-semana: la memoria pico depende del tamano del bloque y del
+# numero de semanas, no del tamano del archivo. cargar_csv_sinave ademas
+# escribe la serie en dato_epidemiologico y se ejecuta como trabajo en
+# segundo plano (trabajos.py).
+# vista_previa_csv_sinave estima el mismo resultado leyendo solo una muestra
+# acotada del archivo.
+
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import (CSV_BLOQUE_FILAS, CSV_PREVIEW_BYTES, CSV_PREVIEW_TRAMOS, ESTADO_POR_ID,
+                    ESTATUS_CASO_CONFIRMADO, POBLACION_2025)
+from escritura_bd import filas_dato, upsert_datos_epidemiologicos
+
+COLUMNAS_SINAVE = ['FECHA_SIGN_SINTOMAS', 'ENTIDAD_RES', 'ESTATUS_CASO']
+
+# Columna opcional: DEFUNCION == 1 suma a defunciones de la semana
+COLUMNA_DEFUNCION = 'DEFUNCION'
+
+ESTATUS_CONFIRMADO = ESTATUS_CASO_CONFIRMADO
+
+# Formatos de FECHA_SIGN_SINTOMAS en orden; las fechas que no entran en uno
+# se reintentan con el siguiente (algunos anios usan DD/MM/YYYY)
+FORMATOS_FECHA = ('ISO8601', '%d/%m/%Y')
+
+# Dia 0 de datetime64[D] (1970-01-01) es jueves: el domingo 1970-01-04 es el dia 3
+_DOMINGO_BASE = 3
+
+# Clave de conteo: region << 32 | (semana + _SEMANA_CERO), semana >= 0 siempre
+_SEMANA_CERO = 1 << 31
+
+
+class ErrorIngesta(Exception):
+    """CSV que no se puede ingerir (codigo HTTP 4xx y datos extra para la respuesta)."""
+
+    def __init__(self, mensaje, codigo=400, **extra):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.extra = extra
+
+
+def columnas_csv(archivo):
+    """Encabezado del CSV (deja el archivo al inicio para volver a leerlo)."""
+    columnas = list(pd.read_csv(archivo, nrows=0, encoding_errors='replace').columns)
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+    return columnas
+
+
+def _sin_progreso(etapa, porcentaje, mensaje='', **contadores):
+    pass
+
+
+def _tamano(archivo):
+    """Bytes del archivo abierto (None si no se puede determinar)."""
+    try:
+        posicion = archivo.tell()
+        archivo.seek(0, os.SEEK_END)
+        tamano = archivo.tell()
+        archivo.seek(posicion)
+        return tamano or None
+    except (AttributeError, OSError):
+        return None
+
+
+def _semanas(fechas):
+    """Indice de la semana (domingo de cierre, como resample('W')) de cada fecha."""
+    dias = fechas.astype('datetime64[D]').astype(np.int64)
+    return (dias - _DOMINGO_BASE + 6) // 7
+
+
+def _claves(region, semana):
+    return (region.astype(np.int64) << 32) | (semana + _SEMANA_CERO)
+
+
+def _parsear_fechas(valores):
+    """Fechas de valores de texto probando FORMATOS_FECHA (NaT si ninguno aplica)."""
+    valores = pd.Series(valores, dtype=object)
+    fechas = pd.to_datetime(valores, format=FORMATOS_FECHA[0], errors='coerce')
+    for formato in FORMATOS_FECHA[1:]:
+        faltan = fechas.isna().to_numpy() & valores.notna().to_numpy()
+        if not faltan.any():
+            break
+        fechas[faltan] = pd.to_datetime(valores[faltan], format=formato, errors='coerce')
+    return fechas.to_numpy(dtype='datetime64[ns]')
+
+
+def _sumar_conteos(claves, conteos, nuevas, nuevos):
+    """Une dos conteos por clave (claves ordenadas y unicas).
+
+    conteos y nuevos son tuplas de arreglos alineados con sus claves
+    (casos, defunciones); se suman por separado.
+    """
+    todas = np.concatenate([claves, nuevas])
+    unicas, inversa = np.unique(todas, return_inverse=True)
+    return unicas, tuple(
+        np.bincount(inversa, weights=np.concatenate([a, b]), minlength=len(unicas)).astype(np.int64)
+        for a, b in zip(conteos, nuevos)
+    )
+
+
+def conteos_region_semana(archivo, tam_bloque=None, estatus_confirmado=ESTATUS_CONFIRMADO,
+                          progreso=None):
+    """Recorre el CSV en bloques y cuenta casos confirmados por (region, semana).
+
+    Equivale a filtrar ESTATUS_CASO, descartar fechas invalidas y regiones
+    sin poblacion, y contar con groupby('ENTIDAD_RES').resample('W'). Las
+    fechas se interpretan con FORMATOS_FECHA; si el CSV trae DEFUNCION se
+    cuentan tambien los casos confirmados con DEFUNCION == 1.
+
+    Args:
+        archivo: ruta o archivo abierto (p. ej. el upload de Flask)
+        tam_bloque: filas por bloque (CSV_BLOQUE_FILAS si None)
+        estatus_confirmado: valor de ESTATUS_CASO que cuenta como caso
+        progreso: callable(filas_leidas, casos_confirmados, fraccion) tras cada
+            bloque; fraccion es la parte del archivo leida (None si no se conoce)
+
+    Returns:
+        dict con claves (region-semana, ordenadas), conteos y defunciones
+        (alineados con claves), con_defunciones (el CSV trae DEFUNCION),
+        registros_originales y casos_confirmados
+
+    Raises:
+        ErrorIngesta: faltan columnas requeridas
+    """
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            return conteos_region_semana(f, tam_bloque, estatus_confirmado, progreso)
+
+    columnas = columnas_csv(archivo)
+    faltantes = [c for c in COLUMNAS_SINAVE if c not in columnas]
+    if faltantes:
+        raise ErrorIngesta(f'Columnas faltantes: {", ".join(faltantes)}', 400,
+                           columnas_encontradas=columnas)
+    con_defuncion = COLUMNA_DEFUNCION in columnas
+    tamano = _tamano(archivo) if progreso else None
+
+    tipos = {'FECHA_SIGN_SINTOMAS': 'category', 'ENTIDAD_RES': 'float32', 'ESTATUS_CASO': 'float32'}
+    if con_defuncion:
+        tipos[COLUMNA_DEFUNCION] = 'float32'
+
+    regiones_validas = np.array(sorted(POBLACION_2025), dtype=np.int64)
+    claves = np.zeros(0, dtype=np.int64)
+    conteos = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    registros = confirmados = 0
+
+    bloques = pd.read_csv(archivo, usecols=list(tipos), chunksize=tam_bloque or CSV_BLOQUE_FILAS,
+                          dtype=tipos, encoding_errors='replace')
+    for bloque in bloques:
+        registros += len(bloque)
+        bloque = bloque[bloque['ESTATUS_CASO'].to_numpy() == estatus_confirmado]
+
+        # Solo se convierten las fechas distintas del bloque (categorias)
+        fechas_cat = bloque['FECHA_SIGN_SINTOMAS'].cat
+        fechas = _parsear_fechas(fechas_cat.categories)
+        # Codigo -1 (vacio) toma el NaT agregado al final
+        fecha = np.append(fechas, np.datetime64('NaT'))[fechas_cat.codes.to_numpy()]
+
+        region = bloque['ENTIDAD_RES'].to_numpy()
+        region = np.where(np.isnan(region), -1, region).astype(np.int64)
+        validas = ~np.isnat(fecha) & np.isin(region, regiones_validas)
+        if validas.any():
+            confirmados += int(validas.sum())
+            unicas, inversa = np.unique(_claves(region[validas], _semanas(fecha[validas])),
+                                        return_inverse=True)
+            cuenta = np.bincount(inversa, minlength=len(unicas))
+            if con_defuncion:
+                muertes = np.bincount(inversa, weights=bloque[COLUMNA_DEFUNCION].to_numpy()[validas] == 1,
+                                      minlength=len(unicas))
+            else:
+                muertes = np.zeros(len(unicas), dtype=np.int64)
+            claves, conteos = _sumar_conteos(claves, conteos, unicas, (cuenta, muertes))
+
+        if progreso:
+            progreso(registros, confirmados, min(archivo.tell() / tamano, 1.0) if tamano else None)
+
+    return {
+        'claves': claves,
+        'conteos': conteos[0],
+        'defunciones': conteos[1],
+        'con_defunciones': con_defuncion,
+        'registros_originales': registros,
+        'casos_confirmados': confirmados
+    }
+
+
+def _avance_archivo(progreso, indice, n_archivos, filas_previas, confirmados_previos):
+    """Callback de conteos_region_semana para el archivo indice de n_archivos.
+
+    Suma lo leido en archivos anteriores y escala la fraccion al total.
+    """
+    def avance(filas, confirmados, fraccion):
+        progreso(filas_previas + filas, confirmados_previos + confirmados,
+                 (indice + (fraccion or 0)) / n_archivos)
+    return avance
+
+
+def conteos_archivos(archivos, tam_bloque=None, estatus_confirmado=ESTATUS_CONFIRMADO, progreso=None):
+    """conteos_region_semana de uno o varios archivos, sumados por region-semana.
+
+    Varios archivos (p. ej. un CSV por anio) dan la misma serie que su
+    concatenacion; progreso recibe filas y casos acumulados y la fraccion
+    del total de archivos. con_defunciones exige DEFUNCION en todos.
+    """
+    if not isinstance(archivos, (list, tuple)):
+        return conteos_region_semana(archivos, tam_bloque, estatus_confirmado, progreso)
+
+    total = {
+        'claves': np.zeros(0, dtype=np.int64),
+        'conteos': np.zeros(0, dtype=np.int64),
+        'defunciones': np.zeros(0, dtype=np.int64),
+        'con_defunciones': True,
+        'registros_originales': 0,
+        'casos_confirmados': 0
+    }
+    for i, archivo in enumerate(archivos):
+        avance = _avance_archivo(progreso, i, len(archivos), total['registros_originales'],
+                                 total['casos_confirmados']) if progreso else None
+        conteo = conteos_region_semana(archivo, tam_bloque, estatus_confirmado, avance)
+        claves, (casos, defunciones) = _sumar_conteos(
+            total['claves'], (total['conteos'], total['defunciones']),
+            conteo['claves'], (conteo['conteos'], conteo['defunciones']))
+        total.update(
+            claves=claves, conteos=casos, defunciones=defunciones,
+            con_defunciones=total['con_defunciones'] and conteo['con_defunciones'],
+            registros_originales=total['registros_originales'] + conteo['registros_originales'],
+            casos_confirmados=total['casos_confirmados'] + conteo['casos_confirmados']
+        )
+    return total
+
+
+def serie_semanal(claves, conteos, defunciones=None):
+    """DataFrame region-semana desde los conteos, con semanas sin casos en 0.
+
+    Como resample('W'), cada region cubre de su primera a su ultima semana
+    con casos; se agregan NOMBRE_ESTADO, POBLACION, tasa_incidencia y
+    riesgo_brote_target (tasa sobre el percentil 75 de todas las filas).
+    La columna defunciones solo existe si se pasan (la fuente las trae).
+
+    Returns:
+        (DataFrame con columnas ENTIDAD_RES, NOMBRE_ESTADO, POBLACION,
+         fecha_fin_semana, casos_confirmados, [defunciones,] tasa_incidencia,
+         riesgo_brote_target; umbral de riesgo)
+    """
+    region = claves >> 32
+    semana = (claves & 0xFFFFFFFF) - _SEMANA_CERO
+
+    # Rango completo de semanas de cada region (claves ordenadas por region, semana)
+    inicios = np.flatnonzero(np.r_[True, region[1:] != region[:-1]])
+    fines = np.r_[inicios[1:], len(region)] - 1
+    largos = semana[fines] - semana[inicios] + 1
+    desplazamiento = np.arange(largos.sum()) - np.repeat(np.cumsum(largos) - largos, largos)
+    region_total = np.repeat(region[inicios], largos)
+    semana_total = np.repeat(semana[inicios], largos) + desplazamiento
+
+    posiciones = np.searchsorted(_claves(region_total, semana_total), claves)
+    casos = np.zeros(len(semana_total), dtype=np.int64)
+    casos[posiciones] = conteos
+
+    poblacion = pd.Series(region_total).map(POBLACION_2025).to_numpy(dtype=float)
+    df_ts = pd.DataFrame({
+        'ENTIDAD_RES': region_total,
+        'NOMBRE_ESTADO': pd.Series(region_total).map(ESTADO_POR_ID).to_numpy(),
+        'POBLACION': poblacion,
+        'fecha_fin_semana': pd.to_datetime((semana_total * 7 + _DOMINGO_BASE).astype('datetime64[D]')),
+        'casos_confirmados': casos
+    })
+    if defunciones is not None:
+        muertes = np.zeros(len(semana_total), dtype=np.int64)
+        muertes[posiciones] = defunciones
+        df_ts['defunciones'] = muertes
+    df_ts['tasa_incidencia'] = (df_ts['casos_confirmados'] / df_ts['POBLACION']) * 100000
+
+    umbral_riesgo = df_ts['tasa_incidencia'].quantile(0.75)
+    df_ts['riesgo_brote_target'] = np.where(df_ts['tasa_incidencia'] > umbral_riesgo, 1, 0).astype(int)
+    return df_ts, umbral_riesgo
+
+
+def procesar_csv_sinave(archivos, tam_bloque=None, progreso=None, estatus_confirmado=ESTATUS_CONFIRMADO):
+    """Serie semanal por estado de uno o varios CSV SINAVE (lectura en streaming).
+
+    Args:
+        archivos: ruta, archivo abierto o lista de rutas (ver conteos_archivos)
+        tam_bloque, progreso, estatus_confirmado: ver conteos_region_semana
+
+    Returns:
+        dict con df_ts, umbral_riesgo, registros_originales, casos_confirmados
+        y defunciones
+
+    Raises:
+        ErrorIngesta: faltan columnas o no hay casos confirmados
+    """
+    conteo = conteos_archivos(archivos, tam_bloque, estatus_confirmado, progreso)
+    if conteo['casos_confirmados'] == 0:
+        raise ErrorIngesta(f'No hay casos confirmados (ESTATUS_CASO={estatus_confirmado}) en el archivo',
+                           400, registros_totales=conteo['registros_originales'])
+
+    df_ts, umbral_riesgo = serie_semanal(conteo['claves'], conteo['conteos'],
+                                         conteo['defunciones'] if conteo['con_defunciones'] else None)
+    return {
+        'df_ts': df_ts,
+        'umbral_riesgo': umbral_riesgo,
+        'registros_originales': conteo['registros_originales'],
+        'casos_confirmados': conteo['casos_confirmados'],
+        'defunciones': int(conteo['defunciones'].sum())
+    }
+
+
+def _muestra_tramos(archivo, presupuesto, n_tramos):
+    """Encabezado + n_tramos tramos de lineas completas repartidos por el archivo.
+
+    Los tramos son equiespaciados (no solo el inicio) para que un archivo
+    ordenado por fecha o por estado quede representado completo.
+
+    Returns:
+        (BytesIO con el CSV de muestra, bytes de datos muestreados, bytes de
+        datos del archivo), o None si los datos caben en el presupuesto o el
+        archivo no admite seek
+    """
+    tamano = _tamano(archivo)
+    if tamano is None:
+        return None
+    archivo.seek(0)
+    encabezado = archivo.readline()
+    inicio_datos = len(encabezado)
+    bytes_datos = tamano - inicio_datos
+    if bytes_datos <= presupuesto:
+        archivo.seek(0)
+        return None
+
+    tam_tramo = max(presupuesto // n_tramos, 1)
+    muestra = io.BytesIO()
+    muestra.write(encabezado.rstrip(b'\r\n') + b'\n')
+    bytes_muestra = 0
+    fin_anterior = inicio_datos
+    for i in range(n_tramos):
+        posicion = max(inicio_datos + bytes_datos * i // n_tramos, fin_anterior)
+        if posicion >= tamano:
+            break
+        if posicion > fin_anterior:
+            archivo.seek(posicion - 1)
+            archivo.readline()  # descarta la linea partida
+        else:
+            archivo.seek(posicion)
+        tramo = archivo.read(tam_tramo) + archivo.readline()  # completa la ultima linea
+        fin_anterior = archivo.tell()
+        if tramo and not tramo.endswith(b'\n'):
+            tramo += b'\n'
+        muestra.write(tramo)
+        bytes_muestra += len(tramo)
+
+    archivo.seek(0)
+    muestra.seek(0)
+    return muestra, bytes_muestra, bytes_datos
+
+
+def vista_previa_csv_sinave(archivo, presupuesto_bytes=None, n_tramos=None):
+    """Serie semanal estimada a partir de una muestra acotada del CSV.
+
+    Lee presupuesto_bytes (CSV_PREVIEW_BYTES si None) en n_tramos tramos
+    (CSV_PREVIEW_TRAMOS) y escala los conteos por bytes totales / bytes
+    muestreados. Si el archivo cabe en el presupuesto, o la muestra no tiene
+    casos confirmados, hace la pasada exacta de procesar_csv_sinave.
+
+    Returns:
+        dict de procesar_csv_sinave mas estimado (bool), fraccion_muestreada
+        y registros_muestra; con estimado=True registros_originales,
+        casos_confirmados, defunciones y los casos de df_ts son estimaciones
+        escaladas
+
+    Raises:
+        ErrorIngesta: faltan columnas o no hay casos confirmados
+    """
+    muestra = _muestra_tramos(archivo, presupuesto_bytes or CSV_PREVIEW_BYTES,
+                              n_tramos or CSV_PREVIEW_TRAMOS)
+    if muestra is not None:
+        csv_muestra, bytes_muestra, bytes_datos = muestra
+        conteo = conteos_region_semana(csv_muestra)
+        if conteo['casos_confirmados']:
+            factor = bytes_datos / bytes_muestra
+            defunciones = np.rint(conteo['defunciones'] * factor).astype(np.int64)
+            df_ts, umbral_riesgo = serie_semanal(
+                conteo['claves'], np.rint(conteo['conteos'] * factor).astype(np.int64),
+                defunciones if conteo['con_defunciones'] else None)
+            return {
+                'df_ts': df_ts,
+                'umbral_riesgo': umbral_riesgo,
+                'registros_originales': int(round(conteo['registros_originales'] * factor)),
+                'casos_confirmados': int(round(conteo['casos_confirmados'] * factor)),
+                'defunciones': int(defunciones.sum()),
+                'estimado': True,
+                'fraccion_muestreada': bytes_muestra / bytes_datos,
+                'registros_muestra': conteo['registros_originales']
+            }
+        print("[INFO] Muestra sin casos confirmados, se lee el archivo completo")
+
+    ingesta = procesar_csv_sinave(archivo)
+    return dict(ingesta, estimado=False, fraccion_muestreada=1.0,
+                registros_muestra=ingesta['registros_originales'])
+
+
+def escribir_serie(conn, df_ts, id_enfermedad=1, fecha_carga=None, progreso=None):
+    """Upsert de una serie de serie_semanal en dato_epidemiologico (ver escritura_bd.py).
+
+    Args:
+        conn: conexion MySQL abierta (no se cierra aqui)
+        df_ts: DataFrame de procesar_csv_sinave; sin columna defunciones las
+            filas nuevas se insertan con 0 y las existentes conservan la suya
+        id_enfermedad: enfermedad de las filas escritas
+        fecha_carga: date de la carga (hoy si None)
+        progreso: callable(escritas, total) tras cada lote
+
+    Returns:
+        int filas enviadas
+    """
+    con_defunciones = 'defunciones' in df_ts
+    filas = filas_dato(
+        df_ts['ENTIDAD_RES'].to_numpy(),
+        df_ts['fecha_fin_semana'].to_numpy(),
+        df_ts['casos_confirmados'].to_numpy(),
+        df_ts['tasa_incidencia'].to_numpy(),
+        df_ts['riesgo_brote_target'].to_numpy(),
+        fecha_carga or datetime.now().date(),
+        id_enfermedad=id_enfermedad,
+        defunciones=df_ts['defunciones'].to_numpy() if con_defunciones else 0
+    )
+    return upsert_datos_epidemiologicos(conn, filas, con_defunciones, progreso=progreso)
+
+
+def cargar_csv_sinave(rutas, progreso=None, id_enfermedad=1):
+    """Lee CSV SINAVE del disco y hace upsert de su serie en dato_epidemiologico.
+
+    Pensada para correr como trabajo (GestorTrabajos): reporta las etapas
+    lectura, escritura con los contadores filas_leidas, casos_confirmados,
+    semanas_agregadas y filas_escritas.
+
+    Args:
+        rutas: CSV ya guardado en disco, o lista de ellos (una sola serie)
+        progreso: callable(etapa, porcentaje, mensaje, **contadores)
+        id_enfermedad: enfermedad de las filas escritas
+
+    Returns:
+        dict de respuesta de /api/datos/procesar-csv-completo
+
+    Raises:
+        ErrorIngesta: CSV invalido (400) o sin conexion a la BD (503)
+    """
+    from database import get_db_connection
+
+    progreso = progreso or _sin_progreso
+
+    def avance_lectura(filas, confirmados, fraccion):
+        progreso('lectura', 5 + int(60 * (fraccion or 0)), f'{filas} registros leidos',
+                 filas_leidas=filas, casos_confirmados=confirmados)
+
+    nombres = [rutas] if isinstance(rutas, (str, os.PathLike)) else rutas
+    progreso('lectura', 0, ', '.join(os.path.basename(r) for r in nombres))
+    ingesta = procesar_csv_sinave(rutas, progreso=avance_lectura)
+    df_ts = ingesta['df_ts']
+
+    conn = get_db_connection()
+    if not conn:
+        raise ErrorIngesta('Error de conexión a base de datos', 503)
+
+    total = len(df_ts)
+    progreso('escritura', 70, f'{total} semanas-region', semanas_agregadas=total, filas_escritas=0)
+    fecha_carga = datetime.now().date()
+    try:
+        registros_insertados = escribir_serie(
+            conn, df_ts, id_enfermedad, fecha_carga,
+            progreso=lambda escritas, n: progreso(
+                'escritura', 70 + 30 * escritas // max(n, 1), f'{escritas}/{n} filas',
+                filas_escritas=escritas)
+        )
+    finally:
+        conn.close()
+
+    return {
+        'success': True,
+        'mensaje': 'Datos cargados exitosamente',
+        'estadisticas': {
+            'registros_originales': ingesta['registros_originales'],
+            'casos_confirmados': ingesta['casos_confirmados'],
+            'defunciones': ingesta['defunciones'],
+            'registros_insertados': registros_insertados,
+            'anios_procesados': sorted(df_ts['fecha_fin_semana'].dt.year.unique().tolist()),
+            'estados_procesados': len(df_ts['NOMBRE_ESTADO'].unique()),
+            'fecha_carga': fecha_carga.isoformat()
+        }
+    }
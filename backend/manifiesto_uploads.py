@@ -0,0 +1,117 @@
+# backend/manifiesto_uploads.py
+# Manifiesto de los archivos subidos, indexado por SHA-256 del contenido.
+# El hash se calcula mientras el upload se copia a disco: si el contenido ya
+# estaba, la copia temporal se descarta (en uploads/CSV nunca queda un
+# duplicado) y se reutilizan el archivo existente y, si ya se cargo en BD,
+# el resultado de esa carga.
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from config import UPLOAD_FOLDER, UPLOADS_MANIFIESTO
+
+_TAM_BLOQUE = 1 << 20
+
+# Lectura-modificacion-escritura del manifiesto dentro del proceso de la API
+_lock = threading.Lock()
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _leer():
+    try:
+        with open(UPLOADS_MANIFIESTO, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Manifiesto de uploads ilegible, se reinicia: {e}")
+        return {}
+
+
+def _escribir(manifiesto):
+    """Escritura atomica (tmp + os.replace)."""
+    tmp = f'{UPLOADS_MANIFIESTO}.tmp-{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1, default=str)
+        os.replace(tmp, UPLOADS_MANIFIESTO)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _con_ruta(sha256, entrada, duplicado):
+    return dict(entrada, sha256=sha256, ruta=os.path.join(UPLOAD_FOLDER, entrada['archivo']),
+                duplicado=duplicado)
+
+
+def guardar_upload(archivo, nombre_archivo):
+    """Copia el upload a UPLOAD_FOLDER calculando su SHA-256 en la misma pasada.
+
+    Args:
+        archivo: objeto con read() (FileStorage de Flask o archivo abierto en binario)
+        nombre_archivo: nombre con que se guarda si el contenido es nuevo
+
+    Returns:
+        dict con archivo, ruta, sha256, tamano, subido, resultado (de la
+        carga previa o None) y duplicado (True si el contenido ya estaba y
+        no se escribio copia)
+    """
+    ruta = os.path.join(UPLOAD_FOLDER, nombre_archivo)
+    tmp = f'{ruta}.parcial'
+    h = hashlib.sha256()
+    tamano = 0
+    try:
+        with open(tmp, 'wb') as destino:
+            for bloque in iter(lambda: archivo.read(_TAM_BLOQUE), b''):
+                h.update(bloque)
+                destino.write(bloque)
+                tamano += len(bloque)
+        sha256 = h.hexdigest()
+
+        with _lock:
+            manifiesto = _leer()
+            entrada = manifiesto.get(sha256)
+            # Si el archivo registrado se borro a mano, el nuevo lo reemplaza
+            if entrada and os.path.exists(os.path.join(UPLOAD_FOLDER, entrada['archivo'])):
+                print(f"[INFO] Upload duplicado de {entrada['archivo']} ({sha256[:12]})")
+                return _con_ruta(sha256, entrada, True)
+
+            os.replace(tmp, ruta)
+            entrada = {'archivo': nombre_archivo, 'tamano': tamano, 'subido': _ahora(),
+                       'resultado': None}
+            manifiesto[sha256] = entrada
+            _escribir(manifiesto)
+            return _con_ruta(sha256, entrada, False)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def registrar_resultado(sha256, resultado):
+    """Guarda el resultado de cargar en BD el archivo con este hash."""
+    with _lock:
+        manifiesto = _leer()
+        if sha256 in manifiesto:
+            manifiesto[sha256].update(resultado=resultado, procesado=_ahora())
+            _escribir(manifiesto)
+
+
+def olvidar_resultados():
+    """Descarta los resultados guardados (p. ej. tras borrar datos de la BD).
+
+    Los archivos siguen deduplicandose, pero la siguiente carga de cada uno
+    vuelve a escribir en la BD.
+    """
+    with _lock:
+        manifiesto = _leer()
+        if any(e.get('resultado') is not None for e in manifiesto.values()):
+            for entrada in manifiesto.values():
+                entrada['resultado'] = None
+            _escribir(manifiesto)
@@ -3,32 +3,235 @@
 # Modelos: Regresion Lineal y Regresion Polinomial (comparativa)
 
 import os
+import threading
+import warnings
 import numpy as np
 import pandas as pd
 import joblib
-from config import BACKEND_DIR, ESTADO_POR_ID
+from config import BACKEND_DIR, ESTADO_POR_ID, MODEL_BUNDLE
+from modelo_compilado import ModeloCompilado, compilar_pipeline, verificar_paridad
+# Orden canonico de las 11 features (compartido con el entrenamiento)
+from features import FEATURE_COLS, VENTANA, features_desde_historia
+
+# Los pipelines se entrenan con DataFrame pero en produccion se alimentan con
+# arreglos NumPy en el orden de feature_cols (ver construir_vector_features)
+warnings.filterwarnings('ignore', message='X does not have valid feature names',
+                        category=UserWarning)
+
+
+class ModelSnapshot:
+    """Conjunto inmutable y versionado de modelos y sus artefactos.
+
+    Cada peticion captura un snapshot (models.snapshot()) y lo usa de
+    principio a fin, de modo que nunca mezcla features, modelos, metricas o
+    umbrales de entrenamientos distintos. Los dicts no deben mutarse.
+    """
+    CAMPOS = (
+        'version',
+        'modelo_lineal', 'modelo_polinomial',
+        'compilado_lineal', 'compilado_polinomial',
+        'poly_degree', 'label_encoder', 'feature_cols',
+        'metricas_lineal', 'metricas_polinomial', 'umbrales_riesgo',
+        'modelos_region', 'estadisticas', 'manifiesto'
+    )
+    __slots__ = CAMPOS
+
+    def __init__(self, **campos):
+        defaults = {'version': 0, 'metricas_lineal': {}, 'metricas_polinomial': {},
+                    'umbrales_riesgo': {}, 'modelos_region': {}}
+        for campo in self.CAMPOS:
+            object.__setattr__(self, campo, campos.get(campo, defaults.get(campo)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelSnapshot es inmutable; use models.publicar()')
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+
+class ModeloRegional:
+    """Modelos de una sola region (shard), entrenados solo con sus datos.
+
+    Expone los mismos atributos que ModelSnapshot usa para predecir
+    (modelo_*, compilado_*, metricas_*, poly_degree), asi predecir_casos_lote
+    y mejor_modelo lo tratan igual que al modelo global. Inmutable.
+    """
+    __slots__ = (
+        'id_region', 'modelo_lineal', 'modelo_polinomial',
+        'compilado_lineal', 'compilado_polinomial', 'poly_degree',
+        'metricas_lineal', 'metricas_polinomial', 'n_registros'
+    )
+
+    def __init__(self, id_region, modelo_lineal=None, modelo_polinomial=None, poly_degree=2,
+                 metricas_lineal=None, metricas_polinomial=None, n_registros=0):
+        campos = {
+            'id_region': int(id_region),
+            'modelo_lineal': modelo_lineal,
+            'modelo_polinomial': modelo_polinomial,
+            'compilado_lineal': compilar_modelo(modelo_lineal, 'Regresion Lineal', verbose=False),
+            'compilado_polinomial': compilar_modelo(modelo_polinomial, 'Regresion Polinomial',
+                                                    verbose=False),
+            'poly_degree': poly_degree,
+            'metricas_lineal': metricas_lineal or {},
+            'metricas_polinomial': metricas_polinomial or {},
+            'n_registros': n_registros
+        }
+        for campo, valor in campos.items():
+            object.__setattr__(self, campo, valor)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModeloRegional es inmutable')
+
+    def exportar(self):
+        """Artefactos para el bundle (los compilados se rehacen al cargar)."""
+        return {
+            'modelo_lineal': self.modelo_lineal,
+            'modelo_polinomial': self.modelo_polinomial,
+            'poly_degree': self.poly_degree,
+            'metricas_lineal': self.metricas_lineal,
+            'metricas_polinomial': self.metricas_polinomial,
+            'n_registros': self.n_registros
+        }
 
 
 class ModelStore:
     """Almacen centralizado de modelos ML.
     Almacena Regresion Lineal y Regresion Polinomial para comparativa.
+
+    Publica snapshots inmutables: publicar() construye uno nuevo (copy-on-write)
+    y lo intercambia con una sola asignacion, por lo que la lectura no
+    necesita locks. Los atributos (models.modelo_lineal, ...) se leen del
+    snapshot vigente.
     """
     def __init__(self):
-        self.modelo_lineal = None
-        self.modelo_polinomial = None
-        self.poly_degree = None
-        self.label_encoder = None
-        self.feature_cols = None
-        self.metricas_lineal = {}
-        self.metricas_polinomial = {}
-        self.umbrales_riesgo = {}
+        object.__setattr__(self, '_actual', ModelSnapshot())
+        object.__setattr__(self, '_lock_publicar', threading.Lock())
+
+    def snapshot(self):
+        """Snapshot vigente; capturarlo una vez por peticion."""
+        return self._actual
+
+    def publicar(self, **cambios):
+        """Publica un nuevo snapshot con los campos indicados reemplazados.
+
+        Los pipelines nuevos se compilan antes del intercambio, asi el
+        compilado siempre corresponde a su pipeline.
+        """
+        with self._lock_publicar:
+            campos = self._actual.como_dict()
+            campos.update(cambios)
+            for attr, destino, msg in [
+                ('modelo_lineal', 'compilado_lineal', 'Regresion Lineal'),
+                ('modelo_polinomial', 'compilado_polinomial', 'Regresion Polinomial'),
+            ]:
+                if attr in cambios and destino not in cambios:
+                    campos[destino] = compilar_modelo(campos[attr], msg)
+            campos['version'] = self._actual.version + 1
+            nuevo = ModelSnapshot(**campos)
+            object.__setattr__(self, '_actual', nuevo)
+            return nuevo
+
+    def __getattr__(self, name):
+        if name in ModelSnapshot.CAMPOS:
+            return getattr(self._actual, name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelStore no se modifica por atributo; use models.publicar()')
 
 
 models = ModelStore()
 
 
 def load_models():
-    """Carga los modelos ML desde disco."""
+    """Carga los modelos ML desde disco y los publica como un solo snapshot.
+
+    Usa el bundle unico (model_bundle.joblib) si existe; si no, o si esta
+    danado, recurre a los archivos .pkl sueltos.
+    """
+    cargados = None
+    if os.path.exists(MODEL_BUNDLE):
+        try:
+            cargados = _cargar_bundle()
+        except Exception as e:
+            print(f"[ERROR] Error cargando bundle de modelos: {e}")
+
+    if cargados is None:
+        cargados = _cargar_legado()
+
+    snap = models.publicar(**cargados)
+
+    if snap.modelo_lineal and snap.modelo_polinomial:
+        print(f"[OK] Ambos modelos disponibles - Mejor: {mejor_modelo(snap)}")
+    elif snap.modelo_lineal or snap.modelo_polinomial:
+        print("[WARN] Solo un modelo disponible")
+    else:
+        print("[WARN] No hay modelos ML - entrene via /api/modelos/entrenar")
+
+
+def publicar_bundle():
+    """Publica el bundle recien escrito (p.ej. por un entrenamiento en otro
+    proceso) como snapshot vigente. Lanza excepcion si el bundle no es valido.
+    """
+    return models.publicar(**_cargar_bundle())
+
+
+def _campos_metricas(metricas):
+    return {
+        'metricas_lineal': metricas.get('lineal', {}),
+        'metricas_polinomial': metricas.get('polinomial', {}),
+        'poly_degree': metricas.get('poly_degree', 3)
+    }
+
+
+def _cargar_bundle():
+    """Lee model_bundle.joblib (una lectura, arreglos mapeados en memoria)."""
+    from bundle_modelos import cargar_bundle
+
+    artefactos, manifiesto = cargar_bundle(MODEL_BUNDLE)
+    cargados = {
+        'modelo_lineal': artefactos['modelo_lineal'],
+        'modelo_polinomial': artefactos['modelo_polinomial'],
+        'label_encoder': artefactos['label_encoder'],
+        'feature_cols': artefactos['feature_cols'],
+        'umbrales_riesgo': artefactos['umbrales'] or {},
+        'modelos_region': {
+            int(id_region): ModeloRegional(id_region, **datos)
+            for id_region, datos in (artefactos.get('modelos_region') or {}).items()
+        },
+        'estadisticas': artefactos.get('estadisticas'),
+        'manifiesto': manifiesto
+    }
+    cargados.update(_campos_metricas(artefactos['metricas'] or {}))
+
+    # Compilados del bundle, verificados contra su pipeline
+    for attr, destino, msg in [
+        ('modelo_lineal', 'compilado_lineal', 'Regresion Lineal'),
+        ('modelo_polinomial', 'compilado_polinomial', 'Regresion Polinomial'),
+    ]:
+        exportado = artefactos.get(destino)
+        if exportado is None:
+            cargados[destino] = compilar_modelo(cargados[attr], msg)
+            continue
+        compilado = ModeloCompilado.desde_exportado(exportado)
+        ok, diff = verificar_paridad(cargados[attr], compilado)
+        if not ok:
+            print(f"[WARN] {msg} compilado del bundle difiere ({diff:.2e}), se recompila")
+            compilado = compilar_modelo(cargados[attr], msg)
+        cargados[destino] = compilado
+
+    print(f"[OK] Bundle de modelos cargado (creado {manifiesto.get('creado')}, "
+          f"checksum {manifiesto.get('checksum', '')[:12]})")
+    if cargados['modelos_region']:
+        print(f"[OK] Modelos regionales cargados ({len(cargados['modelos_region'])} regiones)")
+    return cargados
+
+
+def _cargar_legado():
+    """Carga los seis .pkl sueltos (formato anterior al bundle)."""
+    cargados = {'modelo_lineal': None, 'modelo_polinomial': None, 'modelos_region': {},
+                'estadisticas': None, 'manifiesto': None}
+
     for name, attr, msg in [
         ('model_lineal.pkl', 'modelo_lineal', 'Regresion Lineal'),
         ('model_polinomial.pkl', 'modelo_polinomial', 'Regresion Polinomial'),
@@ -36,7 +239,7 @@ def load_models():
         try:
             path = os.path.join(BACKEND_DIR, name)
             if os.path.exists(path):
-                setattr(models, attr, joblib.load(path))
+                cargados[attr] = joblib.load(path)
                 print(f"[OK] Modelo {msg} cargado")
         except Exception as e:
             print(f"[ERROR] Error cargando {msg}: {e}")
@@ -44,227 +247,538 @@ def load_models():
     try:
         path = os.path.join(BACKEND_DIR, 'label_encoder.pkl')
         if os.path.exists(path):
-            models.label_encoder = joblib.load(path)
-            print(f"[OK] LabelEncoder cargado ({len(models.label_encoder.classes_)} estados)")
+            cargados['label_encoder'] = joblib.load(path)
+            print(f"[OK] LabelEncoder cargado ({len(cargados['label_encoder'].classes_)} estados)")
     except Exception as e:
         print(f"[ERROR] Error cargando label encoder: {e}")
 
     try:
         path = os.path.join(BACKEND_DIR, 'model_features.pkl')
         if os.path.exists(path):
-            models.feature_cols = joblib.load(path)
+            cargados['feature_cols'] = joblib.load(path)
     except Exception as e:
         print(f"[ERROR] Error cargando features: {e}")
 
     try:
         path = os.path.join(BACKEND_DIR, 'model_metricas.pkl')
         if os.path.exists(path):
-            metricas = joblib.load(path)
-            models.metricas_lineal = metricas.get('lineal', {})
-            models.metricas_polinomial = metricas.get('polinomial', {})
-            models.poly_degree = metricas.get('poly_degree', 3)
-            r2l = models.metricas_lineal.get('r2', 0)
-            r2p = models.metricas_polinomial.get('r2', 0)
+            cargados.update(_campos_metricas(joblib.load(path)))
+            r2l = cargados['metricas_lineal'].get('r2', 0)
+            r2p = cargados['metricas_polinomial'].get('r2', 0)
             print(f"[OK] Metricas: Lineal R2={r2l:.4f}, "
-                  f"Polinomial(grado {models.poly_degree}) R2={r2p:.4f}")
+                  f"Polinomial(grado {cargados['poly_degree']}) R2={r2p:.4f}")
     except Exception as e:
         print(f"[ERROR] Error cargando metricas: {e}")
 
     try:
         path = os.path.join(BACKEND_DIR, 'model_umbrales.pkl')
         if os.path.exists(path):
-            models.umbrales_riesgo = joblib.load(path)
+            cargados['umbrales_riesgo'] = joblib.load(path)
             print("[OK] Umbrales de riesgo cargados")
     except Exception as e:
         print(f"[ERROR] Error cargando umbrales: {e}")
 
-    if models.modelo_lineal and models.modelo_polinomial:
-        print(f"[OK] Ambos modelos disponibles - Mejor: {mejor_modelo()}")
-    elif models.modelo_lineal or models.modelo_polinomial:
-        print("[WARN] Solo un modelo disponible")
-    else:
-        print("[WARN] No hay modelos ML - entrene via /api/modelos/entrenar")
+    return cargados
+
+
+def compilar_modelo(pipeline, msg, verbose=True):
+    """Compila un pipeline y verifica paridad contra sklearn.
 
+    Retorna None si la compilacion falla o las predicciones difieren; en ese
+    caso se conserva el pipeline original como ruta de prediccion.
+    verbose=False omite el mensaje de exito (p.ej. para modelos regionales).
+    """
+    if pipeline is None:
+        return None
+    try:
+        compilado = compilar_pipeline(pipeline)
+        ok, diff = verificar_paridad(pipeline, compilado)
+        if ok:
+            if verbose:
+                print(f"[OK] {msg} compilado ({len(compilado.pesos)} terminos)")
+            return compilado
+        print(f"[WARN] {msg} compilado difiere del pipeline ({diff:.2e}), se usa sklearn")
+    except Exception as e:
+        print(f"[WARN] No se pudo compilar {msg}: {e}")
+    return None
 
-def mejor_modelo():
+
+def mejor_modelo(snap=None):
     """Retorna cual modelo tiene mejor R2."""
-    r2l = models.metricas_lineal.get('r2', 0)
-    r2p = models.metricas_polinomial.get('r2', 0)
+    snap = snap or models.snapshot()
+    r2l = snap.metricas_lineal.get('r2', 0)
+    r2p = snap.metricas_polinomial.get('r2', 0)
     return 'polinomial' if r2p >= r2l else 'lineal'
 
 
-def hay_modelos():
+def hay_modelos(snap=None):
     """Retorna True si al menos un modelo esta disponible."""
-    return models.modelo_lineal is not None or models.modelo_polinomial is not None
+    snap = snap or models.snapshot()
+    return snap.modelo_lineal is not None or snap.modelo_polinomial is not None
 
 
-def predecir_casos(X_df):
+def predecir_casos(X_df, snap=None, id_region=None):
     """Predice casos con ambos modelos.
 
     Args:
         X_df: DataFrame con las 11 features.
+        snap: ModelSnapshot a usar (vigente si None).
+        id_region: si se indica y hay modelo regional, se usa ese modelo.
 
     Returns:
         dict con predicciones de ambos modelos y el mejor.
     """
-    resultados = {}
+    return predecir_casos_lote(X_df, snap, None if id_region is None else [id_region])[0]
+
+
+def _fuentes_por_fila(snap, id_regiones, n):
+    """Agrupa filas por modelo: [(fuente, indices)], indices None = todas.
+
+    La fuente es el ModeloRegional de la region si existe; las demas filas
+    usan el modelo global (el propio snapshot).
+    """
+    if not snap.modelos_region or id_regiones is None:
+        return [(snap, None)]
+
+    ids = np.asarray(id_regiones)
+    grupos = []
+    regionales = np.zeros(n, dtype=bool)
+    for id_region in np.unique(ids):
+        shard = snap.modelos_region.get(int(id_region))
+        if shard is not None:
+            idx = np.flatnonzero(ids == id_region)
+            grupos.append((shard, idx))
+            regionales[idx] = True
+
+    if not regionales.any():
+        return [(snap, None)]
+    resto = np.flatnonzero(~regionales)
+    if len(resto):
+        grupos.append((snap, resto))
+    return grupos
 
-    if models.modelo_lineal is not None:
-        try:
-            pred = float(models.modelo_lineal.predict(X_df)[0])
-            resultados['lineal'] = {
-                'casos_predichos': int(round(max(0, pred))),
-                'valor_crudo': round(pred, 2),
-                'modelo': 'Regresion Lineal',
-                'r2': round(models.metricas_lineal.get('r2', 0), 4),
-                'mae': round(models.metricas_lineal.get('mae', 0), 2)
-            }
-        except Exception as e:
-            resultados['lineal'] = {'error': str(e), 'casos_predichos': 0}
 
-    if models.modelo_polinomial is not None:
+def _filas(X, idx):
+    if idx is None:
+        return X
+    return X.iloc[idx] if hasattr(X, 'iloc') else X[idx]
+
+
+def predecir_casos_lote(X, snap=None, id_regiones=None):
+    """Predice casos para N filas con una sola invocacion por modelo.
+
+    Args:
+        X: DataFrame (o matriz) con N filas de features en el orden del modelo.
+        snap: ModelSnapshot a usar (vigente si None).
+        id_regiones: N ids de region; las filas de regiones con modelo
+            regional se predicen con el, el resto con el modelo global.
+
+    Returns:
+        lista de N dicts con la misma forma que predecir_casos.
+    """
+    snap = snap or models.snapshot()
+    n = len(X)
+    resultados = [{} for _ in range(n)]
+
+    for fuente, idx in _fuentes_por_fila(snap, id_regiones, n):
+        filas = resultados if idx is None else [resultados[i] for i in idx]
+        _predecir_fuente(fuente, _filas(X, idx), filas)
+
+    return resultados
+
+
+def _predecir_fuente(fuente, X, resultados):
+    """Llena resultados (un dict por fila de X) con las predicciones de fuente."""
+    ambito = 'regional' if isinstance(fuente, ModeloRegional) else 'global'
+
+    for clave, modelo, nombre, metricas in [
+        ('lineal', fuente.compilado_lineal or fuente.modelo_lineal,
+         'Regresion Lineal', fuente.metricas_lineal),
+        ('polinomial', fuente.compilado_polinomial or fuente.modelo_polinomial,
+         f'Regresion Polinomial (grado {fuente.poly_degree})', fuente.metricas_polinomial),
+    ]:
+        if modelo is None:
+            continue
         try:
-            pred = float(models.modelo_polinomial.predict(X_df)[0])
-            resultados['polinomial'] = {
+            preds = np.asarray(modelo.predict(X), dtype=float).ravel()
+        except Exception as e:
+            for r in resultados:
+                r[clave] = {'error': str(e), 'casos_predichos': 0}
+            continue
+
+        r2 = round(metricas.get('r2', 0), 4)
+        mae = round(metricas.get('mae', 0), 2)
+        for r, pred in zip(resultados, preds.tolist()):
+            r[clave] = {
                 'casos_predichos': int(round(max(0, pred))),
                 'valor_crudo': round(pred, 2),
-                'modelo': f'Regresion Polinomial (grado {models.poly_degree})',
-                'r2': round(models.metricas_polinomial.get('r2', 0), 4),
-                'mae': round(models.metricas_polinomial.get('mae', 0), 2)
+                'modelo': nombre,
+                'r2': r2,
+                'mae': mae
             }
-        except Exception as e:
-            resultados['polinomial'] = {'error': str(e), 'casos_predichos': 0}
-
-    best = mejor_modelo()
-    if best in resultados and 'error' not in resultados[best]:
-        resultados['mejor'] = best
-        resultados['casos_mejor_modelo'] = resultados[best]['casos_predichos']
-    elif 'lineal' in resultados and 'error' not in resultados.get('lineal', {}):
-        resultados['mejor'] = 'lineal'
-        resultados['casos_mejor_modelo'] = resultados['lineal']['casos_predichos']
-    elif 'polinomial' in resultados and 'error' not in resultados.get('polinomial', {}):
-        resultados['mejor'] = 'polinomial'
-        resultados['casos_mejor_modelo'] = resultados['polinomial']['casos_predichos']
-    else:
-        resultados['mejor'] = None
-        resultados['casos_mejor_modelo'] = 0
 
-    return resultados
+    best = mejor_modelo(fuente)
+    for r in resultados:
+        r['ambito'] = ambito
+        for candidato in (best, 'lineal', 'polinomial'):
+            if candidato in r and 'error' not in r[candidato]:
+                r['mejor'] = candidato
+                r['casos_mejor_modelo'] = r[candidato]['casos_predichos']
+                break
+        else:
+            r['mejor'] = None
+            r['casos_mejor_modelo'] = 0
 
 
-def derivar_riesgo(casos_predichos, poblacion=100000):
-    """Deriva nivel de riesgo y probabilidad a partir de casos predichos."""
-    umbrales = models.umbrales_riesgo
+# Niveles de riesgo en orden creciente (indice = nivel_idx)
+NIVELES_RIESGO = ('Bajo', 'Moderado', 'Alto', 'Critico')
 
-    if not umbrales or not umbrales.get('p75'):
-        tasa = (casos_predichos / max(poblacion, 1)) * 100000
-        probabilidad = round(min(100, max(0, tasa * 2)), 1)
-    else:
-        p25 = umbrales.get('p25', 1)
-        p50 = umbrales.get('p50', 3)
-        p75 = umbrales.get('p75', 8)
-        p90 = umbrales.get('p90', 15)
-
-        if casos_predichos <= 0:
-            probabilidad = 0.0
-        elif casos_predichos <= p25:
-            probabilidad = (casos_predichos / max(p25, 0.01)) * 25
-        elif casos_predichos <= p50:
-            probabilidad = 25 + ((casos_predichos - p25) / max(p50 - p25, 0.01)) * 25
-        elif casos_predichos <= p75:
-            probabilidad = 50 + ((casos_predichos - p50) / max(p75 - p50, 0.01)) * 25
-        else:
-            extra = ((casos_predichos - p75) / max(p90 - p75, 0.01)) * 25
-            probabilidad = 75 + min(25, extra)
-
-        probabilidad = round(min(100, max(0, probabilidad)), 1)
-
-    if probabilidad >= 75:
-        nivel = 'Critico'
-        mensaje = 'ALERTA CRITICA: Riesgo muy alto de brote. Activar protocolos de emergencia.'
-    elif probabilidad >= 50:
-        nivel = 'Alto'
-        mensaje = 'ADVERTENCIA: Riesgo elevado de brote. Intensificar vigilancia epidemiologica.'
-    elif probabilidad >= 25:
-        nivel = 'Moderado'
-        mensaje = 'PRECAUCION: Riesgo moderado. Mantener vigilancia activa.'
-    else:
-        nivel = 'Bajo'
-        mensaje = 'Riesgo bajo. Mantener vigilancia estandar y control vectorial.'
+MENSAJES_RIESGO = {
+    'Critico': 'ALERTA CRITICA: Riesgo muy alto de brote. Activar protocolos de emergencia.',
+    'Alto': 'ADVERTENCIA: Riesgo elevado de brote. Intensificar vigilancia epidemiologica.',
+    'Moderado': 'PRECAUCION: Riesgo moderado. Mantener vigilancia activa.',
+    'Bajo': 'Riesgo bajo. Mantener vigilancia estandar y control vectorial.'
+}
 
-    riesgo_clase = 1 if probabilidad >= 50 else 0
+RECOMENDACIONES_RIESGO = {
+    'Critico': 'Activar protocolos de emergencia, reforzar fumigacion y comunicacion inmediata.',
+    'Alto': 'Intensificar vigilancia, aumentar fumigacion y campanas de descacharrizacion.',
+    'Moderado': 'Mantener vigilancia activa y reforzar educacion preventiva.',
+    'Bajo': 'Continuar con las acciones preventivas habituales.'
+}
 
-    recomendaciones_map = {
-        'Critico': 'Activar protocolos de emergencia, reforzar fumigacion y comunicacion inmediata.',
-        'Alto': 'Intensificar vigilancia, aumentar fumigacion y campanas de descacharrizacion.',
-        'Moderado': 'Mantener vigilancia activa y reforzar educacion preventiva.',
-        'Bajo': 'Continuar con las acciones preventivas habituales.'
-    }
 
+def probabilidad_riesgo_lote(casos_predichos, poblacion=100000, umbrales=None):
+    """Probabilidad de brote (0-100, 1 decimal) para un arreglo de casos.
+
+    Con umbrales p25/p50/p75/p90 interpola por tramos; sin ellos usa la
+    tasa por 100k habitantes. poblacion puede ser escalar o arreglo.
+    """
+    casos = np.asarray(casos_predichos, dtype=float)
+
+    if not umbrales or not umbrales.get('p75'):
+        tasa = (casos / np.maximum(poblacion, 1)) * 100000
+        return np.round(np.clip(tasa * 2, 0, 100), 1)
+
+    p25 = umbrales.get('p25', 1)
+    p50 = umbrales.get('p50', 3)
+    p75 = umbrales.get('p75', 8)
+    p90 = umbrales.get('p90', 15)
+
+    probabilidad = np.select(
+        [casos <= 0, casos <= p25, casos <= p50, casos <= p75],
+        [
+            0.0,
+            (casos / max(p25, 0.01)) * 25,
+            25 + ((casos - p25) / max(p50 - p25, 0.01)) * 25,
+            50 + ((casos - p50) / max(p75 - p50, 0.01)) * 25
+        ],
+        default=75 + np.minimum(25, ((casos - p75) / max(p90 - p75, 0.01)) * 25)
+    )
+    return np.round(np.clip(probabilidad, 0, 100), 1)
+
+
+def derivar_riesgo_lote(casos_predichos, poblacion=100000, snap=None):
+    """Version vectorizada de derivar_riesgo para N predicciones.
+
+    Returns:
+        dict de arreglos de largo N: probabilidad (float), nivel_idx (int,
+        indice en NIVELES_RIESGO), nivel (str) y clase (0/1).
+    """
+    umbrales = (snap or models.snapshot()).umbrales_riesgo
+    probabilidad = probabilidad_riesgo_lote(casos_predichos, poblacion, umbrales)
+    nivel_idx = np.searchsorted([25, 50, 75], probabilidad, side='right')
     return {
         'probabilidad': probabilidad,
+        'nivel_idx': nivel_idx,
+        'nivel': np.asarray(NIVELES_RIESGO, dtype=object)[nivel_idx],
+        'clase': (probabilidad >= 50).astype(int)
+    }
+
+
+def riesgo_desde_lote(lote, i):
+    """Dict de riesgo (misma forma que derivar_riesgo) para la fila i de un lote."""
+    nivel = NIVELES_RIESGO[int(lote['nivel_idx'][i])]
+    return {
+        'probabilidad': float(lote['probabilidad'][i]),
         'nivel': nivel,
-        'clase': riesgo_clase,
-        'mensaje': mensaje,
-        'recomendaciones': recomendaciones_map.get(nivel, 'Mantener vigilancia.')
+        'clase': int(lote['clase'][i]),
+        'mensaje': MENSAJES_RIESGO[nivel],
+        'recomendaciones': RECOMENDACIONES_RIESGO.get(nivel, 'Mantener vigilancia.')
     }
 
 
-def construir_features(datos_hist, id_region, semana=None, mes=None):
-    """Construye DataFrame de features a partir de ultimos 4 registros de BD.
+def derivar_riesgo(casos_predichos, poblacion=100000, snap=None):
+    """Deriva nivel de riesgo y probabilidad a partir de casos predichos."""
+    return riesgo_desde_lote(derivar_riesgo_lote([casos_predichos], poblacion, snap), 0)
 
-    Args:
-        datos_hist: lista de dicts con casos_confirmados y tasa_incidencia (DESC)
-        id_region: int
-        semana: int (auto si None)
-        mes: int (auto si None)
 
-    Returns:
-        (X_df, info_dict)
+_layouts = {}
+_codigos_estado = (None, {})
+
+
+def _layout_features(feature_cols):
+    """Posiciones destino/origen para copiar FEATURE_COLS al orden del modelo.
+
+    Se calcula una vez por lista de features y se reutiliza en cada llamada.
     """
+    clave = tuple(feature_cols) if feature_cols else tuple(FEATURE_COLS)
+    layout = _layouts.get(clave)
+    if layout is None:
+        origen = {c: i for i, c in enumerate(FEATURE_COLS)}
+        pares = [(j, origen[c]) for j, c in enumerate(clave) if c in origen]
+        layout = (
+            len(clave),
+            np.array([j for j, _ in pares], dtype=np.intp),
+            np.array([i for _, i in pares], dtype=np.intp)
+        )
+        _layouts[clave] = layout
+    return layout
+
+
+def _estado_coded(id_region, encoder):
+    """Codigo del LabelEncoder para una region sin invocar transform()."""
+    global _codigos_estado
+    cacheado, codigos = _codigos_estado
+    if cacheado is not encoder:
+        clases = getattr(encoder, 'classes_', [])
+        codigos = {c: i for i, c in enumerate(clases)}
+        _codigos_estado = (encoder, codigos)
+    coded = codigos.get(ESTADO_POR_ID.get(id_region, ''))
+    return coded if coded is not None else id_region - 1
+
+
+def _valores_features(datos_hist, id_region, semana=None, mes=None, snap=None):
+    """Calcula las 11 features (en orden FEATURE_COLS) y el dict informativo."""
     from datetime import datetime
 
-    casos_hist = [int(d['casos_confirmados']) for d in datos_hist]
-    ti_hist = [float(d['tasa_incidencia']) for d in datos_hist]
-
-    c1 = casos_hist[0] if len(casos_hist) > 0 else 0
-    c2 = casos_hist[1] if len(casos_hist) > 1 else c1
-    c3 = casos_hist[2] if len(casos_hist) > 2 else c1
-    c4 = casos_hist[3] if len(casos_hist) > 3 else c1
-    t1 = ti_hist[0] if len(ti_hist) > 0 else 0
-    t2 = ti_hist[1] if len(ti_hist) > 1 else t1
+    datos_hist = datos_hist[:VENTANA]
+    casos_lag = np.zeros((1, VENTANA))
+    tasas_lag = np.zeros((1, 2))
+    casos_lag[0, :len(datos_hist)] = [int(d['casos_confirmados']) for d in datos_hist]
+    tasas_lag[0, :min(2, len(datos_hist))] = [float(d['tasa_incidencia']) for d in datos_hist[:2]]
 
-    n = min(4, len(casos_hist))
-    promedio = sum(casos_hist[:n]) / n if n > 0 else 0
-    tendencia = c1 - c4
+    c1, c2, c3, c4, t1, t2, promedio, tendencia = features_desde_historia(
+        casos_lag, tasas_lag, [len(datos_hist)])[0].tolist()
 
     if semana is None:
         semana = datetime.now().isocalendar()[1]
     if mes is None:
         mes = datetime.now().month
 
-    nombre = ESTADO_POR_ID.get(id_region, '')
-    try:
-        coded = models.label_encoder.transform([nombre])[0]
-    except Exception:
-        coded = id_region - 1
-
-    X_df = pd.DataFrame({
-        'casos_lag_1w': [c1], 'casos_lag_2w': [c2],
-        'casos_lag_3w': [c3], 'casos_lag_4w': [c4],
-        'ti_lag_1w': [t1], 'ti_lag_2w': [t2],
-        'casos_promedio_4w': [promedio], 'tendencia_4w': [tendencia],
-        'semana_anio': [semana], 'mes': [mes],
-        'estado_coded': [coded]
-    })
+    coded = _estado_coded(id_region, (snap or models.snapshot()).label_encoder)
+
+    valores = (c1, c2, c3, c4, t1, t2, promedio, tendencia, semana, mes, coded)
 
     info = {
-        'casos_ultima_semana': c1, 'casos_hace_4_semanas': c4,
+        'casos_ultima_semana': int(c1), 'casos_hace_4_semanas': int(c4),
         'tasa_incidencia_actual': round(t1, 4),
         'tasa_incidencia_anterior': round(t2, 4),
         'casos_promedio_4w': round(promedio, 2),
-        'tendencia_4w': tendencia,
+        'tendencia_4w': int(tendencia),
         'semana_epidemiologica': semana, 'mes': mes
     }
 
+    return valores, info
+
+
+def construir_features(datos_hist, id_region, semana=None, mes=None, snap=None):
+    """Construye DataFrame de features a partir de ultimos 4 registros de BD.
+
+    Args:
+        datos_hist: lista de dicts con casos_confirmados y tasa_incidencia (DESC)
+        id_region: int
+        semana: int (auto si None)
+        mes: int (auto si None)
+        snap: ModelSnapshot a usar (vigente si None)
+
+    Returns:
+        (X_df, info_dict)
+    """
+    valores, info = _valores_features(datos_hist, id_region, semana, mes, snap)
+    X_df = pd.DataFrame([valores], columns=FEATURE_COLS)
     return X_df, info
+
+
+def construir_vector_features(datos_hist, id_region, semana=None, mes=None, out=None,
+                              snap=None):
+    """Version NumPy de construir_features, sin DataFrame ni chequeo de columnas.
+
+    Escribe la fila directamente en el orden de snap.feature_cols
+    (model_features.pkl); las features que el modelo espera y no se
+    calculan aqui quedan en 0.
+
+    Args:
+        datos_hist, id_region, semana, mes: igual que construir_features
+        out: arreglo 1-D preasignado de tamano len(feature_cols) (opcional),
+             p.ej. una fila de una matriz de lote.
+        snap: ModelSnapshot a usar (vigente si None)
+
+    Returns:
+        (x, info_dict) con x de forma (1, n_features) si out es None.
+    """
+    snap = snap or models.snapshot()
+    n_cols, destino, origen = _layout_features(snap.feature_cols)
+    valores, info = _valores_features(datos_hist, id_region, semana, mes, snap)
+
+    if out is None:
+        x = np.zeros((1, n_cols))
+        x[0, destino] = np.asarray(valores, dtype=float)[origen]
+        return x, info
+
+    out[:] = 0
+    out[destino] = np.asarray(valores, dtype=float)[origen]
+    return out, info
+
+
+def matriz_features(n_filas, snap=None):
+    """Matriz de ceros (n_filas, n_features) en el orden del modelo."""
+    n_cols, _, _ = _layout_features((snap or models.snapshot()).feature_cols)
+    return np.zeros((n_filas, n_cols))
+
+
+# Horizonte maximo del pronostico recursivo (un anio epidemiologico)
+HORIZONTE_MAX = 52
+
+
+def calendario_pronostico(semana, mes, horizonte):
+    """Semana y mes de las features de cada paso del pronostico recursivo.
+
+    El paso 0 usa la semana/mes de referencia; el paso s >= 1 avanza la
+    semana (ciclo de 52) y el mes cada 4 semanas.
+    """
+    s = np.arange(horizonte)
+    semanas = np.where(s == 0, semana, (semana + 1 + s) % 52)
+    semanas[semanas == 0] = 52
+    meses = ((mes + s // 4) - 1) % 12 + 1
+    meses[0] = mes
+    return semanas, meses
+
+
+def _predecir_mejor_array(X, fuente, maximo):
+    """Casos (enteros en [0, maximo]) del mejor modelo disponible para N filas.
+
+    Mismo criterio que predecir_casos_lote (mejor, lineal, polinomial) pero
+    evalua un solo modelo de la fuente (snapshot o ModeloRegional) y
+    devuelve solo el arreglo de casos. NaN cuenta como 0 (como max(0, pred))
+    e inf o valores sobre maximo se recortan a maximo.
+
+    Returns:
+        (casos, modelo usado, validos: prediccion finita y <= maximo)
+    """
+    modelos = {
+        'lineal': fuente.compilado_lineal or fuente.modelo_lineal,
+        'polinomial': fuente.compilado_polinomial or fuente.modelo_polinomial
+    }
+    for candidato in (mejor_modelo(fuente), 'lineal', 'polinomial'):
+        modelo = modelos[candidato]
+        if modelo is None:
+            continue
+        try:
+            preds = np.asarray(modelo.predict(X), dtype=float).ravel()
+        except Exception:
+            continue
+        validos = np.isfinite(preds) & (preds <= maximo)
+        return np.rint(np.clip(np.nan_to_num(preds, nan=0.0), 0, maximo)), candidato, validos
+    return np.zeros(len(X)), None, np.ones(len(X), dtype=bool)
+
+
+def pronosticar_recursivo(historias, id_regiones, semana=None, mes=None, horizonte=12,
+                          poblaciones=100000, snap=None):
+    """Pronostico recursivo multi-semana para varias regiones a la vez.
+
+    Cada paso predice la semana siguiente de todas las regiones con una sola
+    invocacion por modelo (global y regionales) y usa esa prediccion como lag mas reciente del
+    paso siguiente (tasa = casos / poblacion * 100k). El estado se mantiene
+    en arreglos (R, 4) de lags en lugar de listas de dicts, con los mismos
+    valores de features que construir_vector_features.
+
+    Args:
+        historias: R listas de dicts con casos_confirmados y tasa_incidencia (DESC)
+        id_regiones: R ids de region
+        semana, mes: semana/mes de referencia del paso 0 (auto si None)
+        horizonte: numero de semanas a pronosticar (1..HORIZONTE_MAX)
+        poblaciones: escalar o R poblaciones
+        snap: ModelSnapshot a usar (vigente si None)
+
+    Returns:
+        dict con 'casos' (R, H) (valores enteros en float64, entre 0 y la
+        poblacion de la region), 'valido' (R, H) (False desde el primer paso en
+        que la recursion del polinomial divergio: prediccion no finita o mayor
+        que la poblacion, recortada), 'semana' y 'mes' (H,), 'modelo' (H,)
+        (mejor modelo global de cada paso) y el riesgo de derivar_riesgo_lote
+        con forma (R, H).
+    """
+    from datetime import datetime
+
+    if not 1 <= horizonte <= HORIZONTE_MAX:
+        raise ValueError(f'horizonte debe estar entre 1 y {HORIZONTE_MAX}')
+
+    snap = snap or models.snapshot()
+    n_regiones = len(id_regiones)
+    n_cols, destino, origen = _layout_features(snap.feature_cols)
+
+    if semana is None:
+        semana = datetime.now().isocalendar()[1]
+    if mes is None:
+        mes = datetime.now().month
+    semanas, meses = calendario_pronostico(semana, mes, horizonte)
+
+    # Estado: ultimos 4 casos y 2 tasas por region (columna 0 = mas reciente)
+    casos_lag = np.zeros((n_regiones, 4))
+    tasas_lag = np.zeros((n_regiones, 2))
+    n_validos = np.zeros(n_regiones, dtype=np.intp)
+    for r, datos in enumerate(historias):
+        datos = datos[:4]
+        n_validos[r] = len(datos)
+        casos_lag[r, :len(datos)] = [int(d['casos_confirmados']) for d in datos]
+        tasas_lag[r, :min(2, len(datos))] = [float(d['tasa_incidencia']) for d in datos[:2]]
+
+    coded = np.array([_estado_coded(i, snap.label_encoder) for i in id_regiones], dtype=float)
+    poblaciones = np.broadcast_to(np.maximum(np.asarray(poblaciones, dtype=float), 1), (n_regiones,))
+
+    fuentes = _fuentes_por_fila(snap, id_regiones, n_regiones)
+
+    V = np.empty((n_regiones, len(FEATURE_COLS)))
+    X = np.zeros((n_regiones, n_cols))
+    casos = np.empty((n_regiones, horizonte))
+    valido = np.empty((n_regiones, horizonte), dtype=bool)
+    usados = []
+
+    for paso in range(horizonte):
+        # Lags faltantes toman el valor de la semana mas reciente
+        features_desde_historia(casos_lag, tasas_lag, n_validos, out=V[:, 0:8])
+        V[:, 8] = semanas[paso]
+        V[:, 9] = meses[paso]
+        V[:, 10] = coded
+        X[:, destino] = V[:, origen]
+
+        modelo = None
+        for fuente, idx in fuentes:
+            if idx is None:
+                casos[:, paso], modelo, valido[:, paso] = _predecir_mejor_array(X, fuente, poblaciones)
+            else:
+                casos[idx, paso], usado, valido[idx, paso] = _predecir_mejor_array(
+                    X[idx], fuente, poblaciones[idx])
+                if fuente is snap:
+                    modelo = usado
+        usados.append(modelo)
+        if paso:
+            valido[:, paso] &= valido[:, paso - 1]
+
+        # Desplazar lags e insertar la prediccion como semana mas reciente
+        casos_lag[:, 1:] = casos_lag[:, :-1]
+        casos_lag[:, 0] = casos[:, paso]
+        tasas_lag[:, 1] = tasas_lag[:, 0]
+        tasas_lag[:, 0] = casos[:, paso] / poblaciones * 100000
+        np.minimum(n_validos + 1, 4, out=n_validos)
+
+    resultado = derivar_riesgo_lote(casos, poblaciones[:, None], snap)
+    resultado.update({
+        'casos': casos,
+        'valido': valido,
+        'semana': semanas,
+        'mes': meses,
+        'modelo': usados
+    })
+    return resultado
@@ -0,0 +1,179 @@
+# backend/modelo_compilado.py
+# Evaluador compilado (forma cerrada) de los pipelines de regresion
+# [PolynomialFeatures] -> [StandardScaler] -> LinearRegression se reduce a
+# expansion polinomial + producto punto con pesos ya escalados.
+
+import numpy as np
+
+
+class ModeloCompilado:
+    """Pipeline de regresion reducido a arreglos NumPy.
+
+    - pesos / sesgo: scaler y coeficientes plegados (y = Z @ pesos + sesgo)
+    - term_col / term_padre / term_grado: mapa de terminos polinomiales,
+      cada termino de grado k es su padre (grado k-1) por una columna de X.
+      Vacios si el pipeline no tiene PolynomialFeatures.
+    """
+
+    def __init__(self, pesos, sesgo, term_col=None, term_padre=None,
+                 term_grado=None, feature_names=None, n_features_in=None):
+        self.pesos = np.asarray(pesos, dtype=float)
+        self.sesgo = float(sesgo)
+        self.term_col = np.asarray(term_col if term_col is not None else [], dtype=np.intp)
+        self.term_padre = np.asarray(term_padre if term_padre is not None else [], dtype=np.intp)
+        self.term_grado = np.asarray(term_grado if term_grado is not None else [], dtype=np.intp)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.n_features_in = n_features_in if n_features_in is not None else (
+            len(self.pesos) if len(self.term_col) == 0 else None)
+
+        # Bloques por grado para evaluar todos los terminos de un grado a la vez
+        self._bloques = []
+        if len(self.term_grado):
+            for g in range(int(self.term_grado.max()) + 1):
+                idx = np.flatnonzero(self.term_grado == g)
+                if len(idx):
+                    self._bloques.append((g, idx, self.term_padre[idx], self.term_col[idx]))
+
+    @property
+    def grado(self):
+        return int(self.term_grado.max()) if len(self.term_grado) else 1
+
+    def expandir(self, X):
+        """Expansion polinomial de X (n, n_in) -> (n, n_terminos)."""
+        if not self._bloques:
+            return X
+        Z = np.empty((X.shape[0], len(self.term_grado)), dtype=X.dtype)
+        for g, idx, padre, col in self._bloques:
+            if g == 0:
+                Z[:, idx] = 1.0
+            elif g == 1:
+                Z[:, idx] = X[:, col]
+            else:
+                Z[:, idx] = Z[:, padre] * X[:, col]
+        return Z
+
+    def predict(self, X):
+        """Predice para X (ndarray o DataFrame) sin validaciones de sklearn."""
+        if self.feature_names is not None and hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return self.expandir(X) @ self.pesos + self.sesgo
+
+    def exportar(self):
+        """Arreglos planos del modelo (serializables con joblib/np.savez).
+
+        El mapa de terminos se omite si esta vacio (modelo lineal): los
+        arreglos de tamano cero no se mapean en memoria igual que el resto
+        y alterarian el checksum del bundle.
+        """
+        terminos = {
+            'term_col': self.term_col,
+            'term_padre': self.term_padre,
+            'term_grado': self.term_grado
+        } if len(self.term_grado) else {}
+        return {
+            'pesos': self.pesos,
+            'sesgo': np.array(self.sesgo),
+            **terminos,
+            'feature_names': np.array(self.feature_names if self.feature_names is not None else [], dtype=object),
+            'n_features_in': np.array(self.n_features_in if self.n_features_in is not None else -1)
+        }
+
+    @classmethod
+    def desde_exportado(cls, datos):
+        names = list(datos.get('feature_names', []))
+        n_in = int(datos.get('n_features_in', -1))
+        return cls(
+            datos['pesos'], float(datos['sesgo']),
+            datos.get('term_col'), datos.get('term_padre'), datos.get('term_grado'),
+            feature_names=names or None,
+            n_features_in=n_in if n_in >= 0 else None
+        )
+
+
+def _mapa_terminos(powers):
+    """Construye (col, padre, grado) a partir de PolynomialFeatures.powers_."""
+    powers = np.asarray(powers, dtype=np.intp)
+    indice = {tuple(p): i for i, p in enumerate(powers)}
+    n_terms = len(powers)
+    term_col = np.full(n_terms, -1, dtype=np.intp)
+    term_padre = np.full(n_terms, -1, dtype=np.intp)
+    term_grado = powers.sum(axis=1)
+
+    for i, p in enumerate(powers):
+        if term_grado[i] == 0:
+            continue
+        col = int(np.flatnonzero(p)[-1])
+        term_col[i] = col
+        if term_grado[i] >= 2:
+            padre = p.copy()
+            padre[col] -= 1
+            if tuple(padre) not in indice:
+                raise ValueError('PolynomialFeatures sin termino padre: no compilable')
+            term_padre[i] = indice[tuple(padre)]
+
+    return term_col, term_padre, term_grado
+
+
+def compilar_pipeline(pipeline):
+    """Pliega un Pipeline [PolynomialFeatures] -> [StandardScaler] -> lineal.
+
+    El estimador final puede ser cualquier regresor lineal con coef_ e
+    intercept_ (LinearRegression, Ridge, ...). Lanza ValueError si el
+    pipeline tiene otra forma.
+    """
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+    pasos = [p for _, p in getattr(pipeline, 'steps', [(None, pipeline)])]
+    poly = scaler = None
+    if pasos and isinstance(pasos[0], PolynomialFeatures):
+        poly = pasos.pop(0)
+    if pasos and isinstance(pasos[0], StandardScaler):
+        scaler = pasos.pop(0)
+    if len(pasos) != 1 or not hasattr(pasos[0], 'coef_') or not hasattr(pasos[0], 'intercept_'):
+        raise ValueError(f'Pipeline no compilable: {pipeline}')
+    regresor = pasos[0]
+
+    coef = np.asarray(regresor.coef_, dtype=float).ravel()
+    intercepto = float(np.ravel(regresor.intercept_)[0])
+
+    if scaler is not None:
+        escala = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+        media = scaler.mean_ if scaler.with_mean and scaler.mean_ is not None else np.zeros_like(coef)
+        pesos = coef / escala
+        sesgo = intercepto - float(media @ pesos)
+    else:
+        pesos, sesgo = coef, intercepto
+
+    term_col = term_padre = term_grado = None
+    if poly is not None:
+        term_col, term_padre, term_grado = _mapa_terminos(poly.powers_)
+
+    primero = next(p for p in (poly, scaler, regresor) if p is not None)
+    return ModeloCompilado(
+        pesos, sesgo, term_col, term_padre, term_grado,
+        feature_names=getattr(primero, 'feature_names_in_', None),
+        n_features_in=getattr(primero, 'n_features_in_', None)
+    )
+
+
+def verificar_paridad(pipeline, compilado, n_filas=32, rtol=1e-6, semilla=0):
+    """Compara pipeline.predict vs compilado.predict sobre filas de prueba.
+
+    Returns:
+        (ok, diferencia_maxima_relativa)
+    """
+    n_in = compilado.n_features_in or len(compilado.feature_names or []) or 1
+    rng = np.random.default_rng(semilla)
+    X = np.vstack([
+        np.zeros((1, n_in)),
+        np.ones((1, n_in)),
+        rng.uniform(0, 50, size=(n_filas - 2, n_in))
+    ])
+    esperado = np.asarray(pipeline.predict(X), dtype=float).ravel()
+    obtenido = compilado.predict(X)
+    escala = max(1.0, float(np.abs(esperado).max()))
+    diff = float(np.abs(esperado - obtenido).max()) / escala
+    return diff <= rtol, diff
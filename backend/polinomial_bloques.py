@@ -0,0 +1,145 @@
+# backend/polinomial_bloques.py
+# Regresion polinomial con memoria acotada. Con grado 5 y 11 features la
+# expansion tiene 4367 columnas: ajustar el Pipeline denso materializa la
+# matriz expandida completa (filas x terminos) en cada fold de CV y en el
+# ajuste final. Aqui la expansion se hace por bloques de filas y solo se
+# acumulan las ecuaciones normales (terminos x terminos), de modo que la
+# memoria pico no crece con el numero de filas. El resultado es el mismo
+# Pipeline PolynomialFeatures -> StandardScaler -> LinearRegression, asi que
+# compilacion, bundle e inferencia no cambian.
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+
+from config import POLINOMIAL_MEMORIA_MB, POLINOMIAL_FLOAT32
+
+
+def filas_por_bloque(n_terminos, memoria_mb, itemsize=8):
+    """Filas de la expansion que caben en memoria_mb (expansion + copia centrada)."""
+    return max(64, int(memoria_mb * 1024 * 1024 // (2 * n_terminos * itemsize)))
+
+
+def poly_ajustado(pipeline, X):
+    """Ajusta el paso poly de pipeline con la primera fila de X y lo retorna.
+
+    PolynomialFeatures solo necesita el numero de columnas; ajustarlo con la
+    entrada original (DataFrame) conserva feature_names_in_ en el pipeline
+    aunque el resto se resuelva desde estadisticas.
+    """
+    return pipeline.named_steps['poly'].fit(X[:1])
+
+
+def estadisticas_polinomiales(X, y, grado, filas_bloque, dtype=np.float64):
+    """EstadisticasMCO de la expansion polinomial de X, acumuladas bloque a bloque.
+
+    Cada bloque se desplaza por la media del primer bloque (K) antes del
+    producto, lo que evita la cancelacion de sumar cuadrados grandes; al
+    final M2 = S2 - n d d^T con d = media - K.
+    """
+    from entrenamiento_incremental import EstadisticasMCO
+    from scipy.linalg.blas import dsyrk
+    from sklearn.preprocessing import PolynomialFeatures
+
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    poly = PolynomialFeatures(degree=grado, include_bias=False).fit(X[:1])
+    m = int(poly.n_output_features_)
+    n = len(y)
+    s1 = np.zeros(m)
+    s2 = np.zeros((m, m), order='F')
+    s_zy = np.zeros(m)
+    s_y = s_yy = 0.0
+    ref_z = ref_y = None
+
+    # En float32 solo se guarda la expansion: los productos se acumulan en
+    # float64 por sub-bloques (un GEMM en float32 pierde demasiada precision
+    # con terminos de grado 4-5)
+    filas_producto = filas_bloque if dtype == np.float64 else max(64, filas_bloque // 8)
+    for inicio in range(0, n, filas_bloque):
+        fin = inicio + filas_bloque
+        Z = poly.transform(X[inicio:fin].astype(dtype, copy=False))
+        if ref_z is None:
+            ref_z = Z.mean(axis=0, dtype=np.float64)
+            ref_y = float(y[inicio:fin].mean())
+        Z -= ref_z.astype(dtype)
+        yc = y[inicio:fin] - ref_y
+
+        s1 += Z.sum(axis=0, dtype=np.float64)
+        for a in range(0, len(Z), filas_producto):
+            Zb = Z[a:a + filas_producto].astype(np.float64, copy=False)
+            # Triangulo superior de s2 += Zb^T Zb en el lugar (sin temporal m x m)
+            s2 = dsyrk(1.0, Zb.T, beta=1.0, c=s2, trans=0, lower=0, overwrite_c=1)
+            s_zy += Zb.T @ yc[a:a + filas_producto]
+        s_y += float(yc.sum())
+        s_yy += float(yc @ yc)
+        del Z, Zb
+
+    d = s1 / n
+    d_y = s_y / n
+    # Completar el triangulo inferior y luego restar n d d^T, por franjas de filas
+    for inicio in range(0, m, 512):
+        fin = inicio + 512
+        s2[inicio:fin, :inicio] = s2[:inicio, inicio:fin].T
+        diagonal = s2[inicio:fin, inicio:fin]
+        s2[inicio:fin, inicio:fin] = np.triu(diagonal) + np.triu(diagonal, 1).T
+    for inicio in range(0, m, 512):
+        s2[inicio:inicio + 512] -= n * np.outer(d[inicio:inicio + 512], d)
+    return EstadisticasMCO(n, ref_z + d, ref_y + d_y, s2, s_zy - n * d * d_y,
+                           s_yy - n * d_y * d_y)
+
+
+class RegresionPolinomialBloques(RegressorMixin, BaseEstimator):
+    """Regresion polinomial que expande y acumula por bloques de filas.
+
+    Si la matriz expandida densa cabe en memoria_mb se ajusta el Pipeline
+    de siempre (mismo resultado que pipeline_polinomial). Si no, cada
+    bloque se expande (en float32 si float32=True: bloques del doble de
+    filas en la misma memoria), se centra en la media del primer bloque y
+    suma su producto Z^T Z a la acumulacion en float64; al final se resuelve
+    con EstadisticasMCO (ver entrenamiento_incremental.py). La memoria pico
+    es la del bloque mas la matriz terminos x terminos, sin importar las filas.
+
+    Atributos tras fit: pipeline_ (Pipeline equivalente), por_bloques_,
+    filas_bloque_ y n_output_features_.
+    """
+
+    def __init__(self, grado=2, memoria_mb=None, float32=None):
+        self.grado = grado
+        self.memoria_mb = memoria_mb
+        self.float32 = float32
+
+    def _parametros(self):
+        memoria_mb = POLINOMIAL_MEMORIA_MB if self.memoria_mb is None else self.memoria_mb
+        float32 = POLINOMIAL_FLOAT32 if self.float32 is None else bool(self.float32)
+        return float(memoria_mb), (np.float32 if float32 else np.float64)
+
+    def fit(self, X, y):
+        from seleccion_grado import pipeline_polinomial
+
+        memoria_mb, dtype = self._parametros()
+        plantilla = pipeline_polinomial(self.grado)
+        poly = poly_ajustado(plantilla, X)
+        self.n_output_features_ = int(poly.n_output_features_)
+        self.filas_bloque_ = filas_por_bloque(self.n_output_features_, memoria_mb,
+                                              np.dtype(dtype).itemsize)
+        # Con menos filas que terminos la matriz densa no supera a la de
+        # terminos x terminos y lstsq sobre los datos es mas estable
+        self.por_bloques_ = len(X) > max(self.filas_bloque_, self.n_output_features_)
+
+        if not self.por_bloques_:
+            self.pipeline_ = plantilla.fit(X, y)
+        else:
+            from entrenamiento_incremental import pipeline_desde_estadisticas
+            self.pipeline_ = pipeline_desde_estadisticas(
+                plantilla, estadisticas_polinomiales(X, y, self.grado, self.filas_bloque_, dtype))
+        return self
+
+    def predict(self, X):
+        if not self.por_bloques_:
+            return self.pipeline_.predict(X)
+        filas = X.iloc if hasattr(X, 'iloc') else X
+        salida = np.empty(len(X))
+        for inicio in range(0, len(X), self.filas_bloque_):
+            fin = inicio + self.filas_bloque_
+            salida[inicio:fin] = self.pipeline_.predict(filas[inicio:fin])
+        return salida
@@ -0,0 +1,310 @@
+# backend/regularizacion.py
+# Regresion polinomial regularizada (Ridge o Lasso) con seleccion conjunta
+# de grado y alpha por validacion cruzada. Cada (grado, fold) acumula las
+# ecuaciones normales de su particion (ver polinomial_bloques.py) y las
+# descompone una sola vez (eigh de la correlacion): con esa descomposicion
+# el camino completo de Ridge es cerrado (un producto por alpha) y el de
+# Lasso se recorre con warm starts (lasso_path) sobre pseudo-datos de
+# terminos x terminos, sin volver a tocar las filas. El costo por tarea es
+# el de un ajuste sin regularizar, de modo que toda la rejilla de alphas
+# cabe en el tiempo de la busqueda de grado.
+
+import time
+
+import numpy as np
+
+from config import ENTRENAMIENTO_N_JOBS, POLINOMIAL_MEMORIA_MB, POLINOMIAL_FLOAT32
+from seleccion_grado import GRADOS_POLINOMIO
+
+TIPOS_REGULARIZACION = ('ridge', 'lasso')
+
+# Rejilla de Ridge (alpha absoluto sobre las features escaladas, como Ridge)
+ALPHAS_RIDGE = tuple(float(a) for a in np.logspace(-3, 5, 17))
+
+# Rejilla de Lasso: N_ALPHAS_LASSO valores de alpha_max a EPS_LASSO * alpha_max (como LassoCV)
+N_ALPHAS_LASSO = 20
+EPS_LASSO = 1e-3
+
+
+def pipeline_regularizado(grado, tipo, alpha):
+    """PolynomialFeatures(grado) -> StandardScaler -> Ridge/Lasso(alpha)."""
+    from sklearn.linear_model import Lasso, Ridge
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+    from sklearn.pipeline import Pipeline
+
+    regresor = Ridge(alpha=alpha) if tipo == 'ridge' else Lasso(alpha=alpha)
+    return Pipeline([
+        ('poly', PolynomialFeatures(degree=grado, include_bias=False, interaction_only=False)),
+        ('scaler', StandardScaler()),
+        ('regressor', regresor)
+    ])
+
+
+def _bloques(grado, n_features, memoria_mb, float32):
+    """(filas por bloque, dtype) de la expansion (ver polinomial_bloques.py)."""
+    from math import comb
+    from polinomial_bloques import filas_por_bloque
+
+    memoria_mb = POLINOMIAL_MEMORIA_MB if memoria_mb is None else float(memoria_mb)
+    dtype = np.float32 if (POLINOMIAL_FLOAT32 if float32 is None else float32) else np.float64
+    n_terminos = comb(n_features + grado, grado) - 1
+    return filas_por_bloque(n_terminos, memoria_mb, np.dtype(dtype).itemsize), dtype
+
+
+def alphas_lasso(X, y, grado, n_alphas=N_ALPHAS_LASSO, eps=EPS_LASSO, memoria_mb=None):
+    """Rejilla de alphas de Lasso para un grado (una pasada, sin ecuaciones normales).
+
+    alpha_max = max |Zs^T (y - media)| / n es el menor alpha con todos los
+    coeficientes en 0; la rejilla va de ahi a eps * alpha_max en escala log.
+    """
+    from sklearn.preprocessing import PolynomialFeatures
+
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    filas_bloque, _ = _bloques(grado, X.shape[1], memoria_mb, False)
+    poly = PolynomialFeatures(degree=grado, include_bias=False).fit(X[:1])
+    n = len(y)
+    yc = y - y.mean()
+
+    # Sumas desplazadas por la media del primer bloque (estables)
+    ref = s1 = s2 = s_zy = None
+    for inicio in range(0, n, filas_bloque):
+        Z = poly.transform(X[inicio:inicio + filas_bloque])
+        if ref is None:
+            ref = Z.mean(axis=0)
+            s1, s2, s_zy = (np.zeros_like(ref) for _ in range(3))
+        Z -= ref
+        s1 += Z.sum(axis=0)
+        s2 += np.einsum('ij,ij->j', Z, Z)
+        s_zy += Z.T @ yc[inicio:inicio + filas_bloque]
+    d = s1 / n
+    escala = np.sqrt(np.maximum(s2 / n - d * d, 0))
+    escala[escala == 0] = 1.0
+    alpha_max = float(np.max(np.abs(s_zy / escala)) / n)
+    return tuple(float(a) for a in np.geomspace(alpha_max, alpha_max * eps, n_alphas))
+
+
+def camino(estadisticas, tipo, alphas):
+    """Coeficientes para todos los alphas a partir de una sola descomposicion.
+
+    Con la correlacion C = V diag(l) V^T de las features escaladas:
+    Ridge(alpha) = V diag(1 / (l + alpha)) V^T b, y Lasso se resuelve sobre
+    los pseudo-datos X' = diag(sqrt(l)) V^T (X'^T X' = C) con lasso_path,
+    que recorre los alphas de mayor a menor reutilizando la solucion previa.
+
+    Args:
+        estadisticas: EstadisticasMCO de la expansion (polinomial_bloques)
+        tipo: 'ridge' o 'lasso'
+        alphas: valores de alpha (> 0), en el orden en que se devuelven
+
+    Returns:
+        (media, var, escala, coefs (terminos x len(alphas)), intercepto)
+    """
+    n = estadisticas.n
+    var, escala = estadisticas.escalado()
+    correlacion = estadisticas.m2_zz / np.outer(escala, escala)
+    b = estadisticas.m2_zy / escala
+    lam, V = np.linalg.eigh(correlacion)
+    del correlacion
+    lam = np.maximum(lam, 0.0)
+    Vb = V.T @ b
+    alphas = np.asarray(alphas, dtype=float)
+
+    if tipo == 'ridge':
+        coefs = V @ (Vb[:, None] / (lam[:, None] + alphas[None, :]))
+    else:
+        from sklearn.linear_model import lasso_path
+
+        # Direcciones de varianza nula no aportan a los pseudo-datos
+        utiles = lam > lam.max() * len(lam) * np.finfo(float).eps
+        raiz = np.sqrt(lam[utiles])
+        Xp = raiz[:, None] * V[:, utiles].T
+        yp = Vb[utiles] / raiz
+        # lasso_path promedia sobre las filas de Xp (k) y no sobre las n originales
+        orden = np.argsort(-alphas)
+        # Con la tol de Lasso (1e-4) los alphas chicos quedan a ~1e-2 de la solucion;
+        # los pseudo-datos son de k x k, converger mas fino cuesta milisegundos
+        _, coefs_desc, _ = lasso_path(Xp, yp, alphas=alphas[orden] * n / len(yp),
+                                      precompute=True, max_iter=10000, tol=1e-6)
+        coefs = np.empty_like(coefs_desc)
+        coefs[:, orden] = coefs_desc
+    return estadisticas.media_z, var, escala, coefs, estadisticas.media_y
+
+
+def predecir_camino(X, grado, media, escala, coefs, intercepto, filas_bloque):
+    """Predicciones (filas x alphas) expandiendo X por bloques."""
+    from sklearn.preprocessing import PolynomialFeatures
+
+    X = np.asarray(X, dtype=float)
+    poly = PolynomialFeatures(degree=grado, include_bias=False).fit(X[:1])
+    pesos = coefs / escala[:, None]
+    sesgo = intercepto - media @ pesos
+    salida = np.empty((len(X), coefs.shape[1]))
+    for inicio in range(0, len(X), filas_bloque):
+        fin = inicio + filas_bloque
+        salida[inicio:fin] = poly.transform(X[inicio:fin]) @ pesos + sesgo
+    return salida
+
+
+def _tarea(tipo, grado, fold, X_fit, y_fit, X_eval, y_eval, alphas, memoria_mb, float32):
+    """Camino de alphas de un (grado, fold) evaluado sobre X_eval (en un worker).
+
+    fold None es el ajuste sobre todo train: devuelve ademas el camino para
+    construir el pipeline del alpha elegido.
+    """
+    from polinomial_bloques import estadisticas_polinomiales
+
+    try:
+        filas_bloque, dtype = _bloques(grado, X_fit.shape[1], memoria_mb, float32)
+        est = estadisticas_polinomiales(X_fit, y_fit, grado, filas_bloque, dtype)
+        media, var, escala, coefs, intercepto = camino(est, tipo, alphas)
+        pred = predecir_camino(X_eval, grado, media, escala, coefs, intercepto, filas_bloque)
+
+        y_eval = np.asarray(y_eval, dtype=float)
+        residuo = y_eval[:, None] - pred
+        total = float(((y_eval - y_eval.mean()) ** 2).sum())
+        salida = {
+            'grado': grado,
+            'fold': fold,
+            'r2': 1.0 - (residuo ** 2).sum(axis=0) / total,
+            'mae': np.abs(residuo).mean(axis=0)
+        }
+        if fold is None:
+            salida['camino'] = (media, var, escala, est.n, coefs, intercepto)
+        return salida
+    except Exception as e:
+        return {'grado': grado, 'fold': fold, 'error': str(e)}
+
+
+def _pipeline_desde_camino(X_ref, grado, tipo, alphas, i, camino_final):
+    from entrenamiento_incremental import fijar_parametros
+    from polinomial_bloques import poly_ajustado
+
+    media, var, escala, n, coefs, intercepto = camino_final
+    pipeline = pipeline_regularizado(grado, tipo, alphas[i])
+    poly_ajustado(pipeline, X_ref)
+    return fijar_parametros(pipeline, media, var, escala, n, coefs[:, i].copy(), intercepto)
+
+
+def buscar_grado_regularizado(tipo, X_train, y_train, X_test, y_test, grados=GRADOS_POLINOMIO,
+                              cv=5, n_jobs=None, progreso=None, alphas=None, memoria_mb=None,
+                              float32=None):
+    """Elige grado y alpha juntos por R2 de CV (misma interfaz que buscar_grado).
+
+    Args:
+        tipo: 'ridge' o 'lasso'
+        alphas: rejilla comun a todos los grados (ALPHAS_RIDGE / alphas_lasso si None)
+        (resto: ver seleccion_grado.buscar_grado)
+
+    Returns:
+        dict como buscar_grado; resultados_grados incluye alpha y r2_cv_por_alpha
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import KFold
+
+    n_jobs = ENTRENAMIENTO_N_JOBS if n_jobs is None else n_jobs
+    particiones = list(KFold(n_splits=cv).split(X_train))
+
+    rejillas = {}
+    for grado in grados:
+        if alphas:
+            rejillas[grado] = tuple(float(a) for a in alphas)
+        elif tipo == 'ridge':
+            rejillas[grado] = ALPHAS_RIDGE
+        else:
+            rejillas[grado] = alphas_lasso(X_train, y_train, grado, memoria_mb=memoria_mb)
+
+    tareas = []
+    for grado in sorted(grados, reverse=True):
+        tareas.append(delayed(_tarea)(tipo, grado, None, X_train, y_train, X_test, y_test,
+                                      rejillas[grado], memoria_mb, float32))
+        for fold, (idx_fit, idx_val) in enumerate(particiones):
+            tareas.append(delayed(_tarea)(
+                tipo, grado, fold,
+                X_train.iloc[idx_fit], y_train.iloc[idx_fit],
+                X_train.iloc[idx_val], y_train.iloc[idx_val],
+                rejillas[grado], memoria_mb, float32
+            ))
+
+    inicio = time.perf_counter()
+    salidas = Parallel(n_jobs=n_jobs, backend='loky', return_as='generator')(tareas)
+
+    por_grado = {grado: {'folds': [], 'final': None, 'error': None, 'tareas': 0} for grado in grados}
+    terminados = 0
+    for salida in salidas:
+        entrada = por_grado[salida['grado']]
+        entrada['tareas'] += 1
+        if 'error' in salida:
+            entrada['error'] = entrada['error'] or salida['error']
+        elif salida['fold'] is None:
+            entrada['final'] = salida
+        else:
+            entrada['folds'].append(salida['r2'])
+
+        if entrada['tareas'] == cv + 1:
+            terminados += 1
+            if progreso:
+                r2_cv = float(np.max(np.mean(entrada['folds'], axis=0))) if entrada['folds'] else float('nan')
+                progreso(salida['grado'], terminados, len(grados), r2_cv)
+
+    resultados_grados = {}
+    pipelines = {}
+    mejor_grado = grados[0]
+    mejor_r2_cv = -np.inf
+    for grado in grados:
+        entrada = por_grado[grado]
+        if entrada['error'] is not None:
+            print(f"   Grado {grado}: ERROR - {entrada['error']}")
+            resultados_grados[grado] = {'error': entrada['error']}
+            continue
+
+        r2_cv_alphas = np.mean(entrada['folds'], axis=0)
+        i = int(np.argmax(r2_cv_alphas))
+        r2_cv = float(r2_cv_alphas[i])
+        alpha = rejillas[grado][i]
+        final = entrada['final']
+        pipelines[grado] = _pipeline_desde_camino(X_train, grado, tipo, rejillas[grado], i,
+                                                  final['camino'])
+        n_features_poly = pipelines[grado].named_steps['poly'].n_output_features_
+
+        resultados_grados[grado] = {
+            'r2_test': round(float(final['r2'][i]), 4),
+            'r2_cv': round(r2_cv, 4),
+            'mae': round(float(final['mae'][i]), 2),
+            'n_features': n_features_poly,
+            'regularizacion': tipo,
+            'alpha': alpha,
+            'r2_cv_por_alpha': [[a, round(float(r), 4)] for a, r in zip(rejillas[grado], r2_cv_alphas)]
+        }
+        print(f"   Grado {grado}: {tipo} alpha={alpha:.4g}, R2_test={final['r2'][i]:.4f}, "
+              f"R2_CV={r2_cv:.4f}, MAE={final['mae'][i]:.2f}, features={n_features_poly}")
+
+        if r2_cv > mejor_r2_cv:
+            mejor_r2_cv = r2_cv
+            mejor_grado = grado
+
+    return {
+        'resultados_grados': resultados_grados,
+        'mejor_grado': mejor_grado,
+        'mejor_r2_cv': mejor_r2_cv,
+        'pipelines': pipelines,
+        'n_jobs': n_jobs,
+        'tiempo_s': round(time.perf_counter() - inicio, 2)
+    }
+
+
+def r2_cv_regularizado(tipo, grado, alpha, X, y, cv=5, n_jobs=None, memoria_mb=None, float32=None):
+    """R2 por fold de KFold(cv) para un (grado, alpha) fijo (como cross_val_score)."""
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import KFold
+
+    n_jobs = ENTRENAMIENTO_N_JOBS if n_jobs is None else n_jobs
+    salidas = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_tarea)(tipo, grado, fold, X.iloc[idx_fit], y.iloc[idx_fit],
+                        X.iloc[idx_val], y.iloc[idx_val], (alpha,), memoria_mb, float32)
+        for fold, (idx_fit, idx_val) in enumerate(KFold(n_splits=cv).split(X))
+    )
+    errores = [s['error'] for s in salidas if 'error' in s]
+    if errores:
+        raise RuntimeError(errores[0])
+    return np.array([float(s['r2'][0]) for s in salidas])
@@ -6,7 +6,8 @@ from datetime import datetime
 
 from config import ESTADO_POR_ID, POBLACION_2025
 from database import get_db_connection
-from ml import models, hay_modelos, predecir_casos, derivar_riesgo, construir_features
+from ml import (models, hay_modelos, predecir_casos_lote, derivar_riesgo_lote, riesgo_desde_lote,
+                construir_vector_features, matriz_features)
 
 alertas_bp = Blueprint('alertas', __name__, url_prefix='/api/alertas')
 
@@ -55,7 +56,8 @@ def generar_alertas_automaticas():
     """Genera alertas automaticas para todos los estados con modelo ML."""
     conn = None
     try:
-        if not hay_modelos():
+        snap = models.snapshot()
+        if not hay_modelos(snap):
             return jsonify({
                 'success': False,
                 'error': 'No hay modelos entrenados'
@@ -76,11 +78,10 @@ def generar_alertas_automaticas():
         alertas_generadas = []
         errores = []
 
+        # 1) Obtener ultimos 4 registros de todas las regiones
+        candidatos = []
         for id_region in regiones:
             try:
-                nombre_estado = ESTADO_POR_ID.get(id_region, f'Region {id_region}')
-                poblacion = POBLACION_2025.get(nombre_estado, 100000)
-
                 cursor.execute("""
                     SELECT casos_confirmados, tasa_incidencia, fecha_fin_semana
                     FROM dato_epidemiologico
@@ -93,17 +94,31 @@ def generar_alertas_automaticas():
                 if len(datos) < 1:
                     continue
 
-                X_df, info = construir_features(datos, id_region)
+                candidatos.append((id_region, datos))
+            except Exception as e:
+                errores.append({'region': id_region, 'error': str(e)})
 
-                if models.feature_cols:
-                    for col in models.feature_cols:
-                        if col not in X_df.columns:
-                            X_df[col] = 0
-                    X_df = X_df[models.feature_cols]
+        # 2) Una sola invocacion por modelo (global o regional) para todo el pais
+        predicciones_lote = []
+        if candidatos:
+            X_todas = matriz_features(len(candidatos), snap)
+            for fila, (id_region, datos) in zip(X_todas, candidatos):
+                construir_vector_features(datos, id_region, out=fila, snap=snap)
+            predicciones_lote = predecir_casos_lote(X_todas, snap, [id_region for id_region, _ in candidatos])
+
+            # Riesgo de todas las regiones en una sola pasada
+            nombres = [ESTADO_POR_ID.get(id_region, f'Region {id_region}') for id_region, _ in candidatos]
+            riesgos_lote = derivar_riesgo_lote(
+                [p.get('casos_mejor_modelo', 0) for p in predicciones_lote],
+                [POBLACION_2025.get(nombre, 100000) for nombre in nombres],
+                snap
+            )
 
-                predicciones = predecir_casos(X_df)
+        for k, ((id_region, _), predicciones) in enumerate(zip(candidatos, predicciones_lote)):
+            try:
+                nombre_estado = nombres[k]
                 casos_pred = predicciones.get('casos_mejor_modelo', 0)
-                riesgo = derivar_riesgo(casos_pred, poblacion)
+                riesgo = riesgo_desde_lote(riesgos_lote, k)
 
                 # Solo crear alerta si riesgo >= Moderado
                 if riesgo['probabilidad'] >= 25:
@@ -1,26 +1,110 @@
 # backend/routes/datos.py
 # Endpoints de gestión de datos: upload CSV, procesamiento, estadísticas, limpieza
 
-import os
-import numpy as np
-import pandas as pd
+import threading
+import uuid
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
-from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS, ESTADO_POR_ID, POBLACION_2025
+from config import ALLOWED_EXTENSIONS, INGESTA_MAX_CONCURRENTES
 from database import get_db_connection
+from cache_predicciones import cache_predicciones
+from ingesta_csv import (COLUMNAS_SINAVE, ErrorIngesta, cargar_csv_sinave, columnas_csv,
+                         procesar_csv_sinave, vista_previa_csv_sinave)
+from manifiesto_uploads import guardar_upload, olvidar_resultados, registrar_resultado
+from trabajos import ESTADOS_FINALES, GestorTrabajos
 
 datos_bp = Blueprint('datos', __name__, url_prefix='/api/datos')
 
+# Cargas de CSV en procesos aparte (ver trabajos.py / ingesta_csv.py)
+trabajos_ingesta = GestorTrabajos(max_concurrentes=INGESTA_MAX_CONCURRENTES)
+
+# Hash del contenido -> id del trabajo de carga en curso (un mismo archivo no
+# se encola dos veces); _lock_ingestas protege la consulta y el registro
+_ingestas_por_hash = {}
+_lock_ingestas = threading.Lock()
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def _bandera(campo):
+    """Campo booleano del formulario (1/true/si)."""
+    return request.form.get(campo, '').lower() in ('1', 'true', 'si')
+
+
+def _guardar_upload(archivo):
+    """Guarda el archivo subido en UPLOAD_FOLDER, salvo que su contenido ya este.
+
+    El sufijo aleatorio evita que dos cargas del mismo segundo se pisen
+    (un trabajo en cola aun no ha leido su archivo).
+
+    Returns:
+        entrada del manifiesto (ver manifiesto_uploads.guardar_upload)
+    """
+    filename = secure_filename(archivo.filename)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return guardar_upload(archivo, f"dengue_{timestamp}_{uuid.uuid4().hex[:6]}_{filename}")
+
+
+def _encolar_ingesta(upload):
+    """Valida el encabezado y encola la carga del CSV en dato_epidemiologico.
+
+    Si el mismo contenido ya se esta cargando devuelve ese trabajo.
+
+    Raises:
+        ErrorIngesta: faltan columnas requeridas (antes de encolar)
+    """
+    sha256 = upload['sha256']
+    columnas = columnas_csv(upload['ruta'])
+    faltantes = [c for c in COLUMNAS_SINAVE if c not in columnas]
+    if faltantes:
+        raise ErrorIngesta(f'Columnas faltantes: {", ".join(faltantes)}', 400,
+                           columnas_encontradas=columnas)
+
+    def al_terminar(resultado):
+        # El resultado queda en el manifiesto antes de soltar el hash
+        registrar_resultado(sha256, resultado)
+        with _lock_ingestas:
+            _ingestas_por_hash.pop(sha256, None)
+        cache_predicciones.invalidar()
+
+    with _lock_ingestas:
+        # Descarta trabajos terminados con error/cancelados o ya podados
+        for clave, id_trabajo in list(_ingestas_por_hash.items()):
+            previo = trabajos_ingesta.obtener(id_trabajo)
+            if previo is None or previo.estado in ESTADOS_FINALES:
+                del _ingestas_por_hash[clave]
+
+        en_curso = _ingestas_por_hash.get(sha256)
+        if en_curso is not None:
+            return trabajos_ingesta.obtener(en_curso)
+
+        trabajo = trabajos_ingesta.enviar(
+            'ingesta', cargar_csv_sinave,
+            args=(upload['ruta'],),
+            parametros={'archivo': upload['archivo'], 'sha256': sha256},
+            al_terminar=al_terminar
+        )
+        _ingestas_por_hash[sha256] = trabajo.id
+    return trabajo
+
+
 @datos_bp.route('/cargar-csv', methods=['POST'])
 def cargar_csv():
-    """Carga de archivos CSV"""
+    """Carga de archivos CSV.
+
+    Con procesar=true (campo del formulario, solo .csv) el archivo guardado
+    se encola para cargarse en dato_epidemiologico y se responde 202 con el
+    id del trabajo (ver /api/datos/trabajos/<id>).
+
+    Si el contenido ya se habia subido (mismo SHA-256) no se guarda otra
+    copia: se responde con el archivo existente y duplicado=true, y con
+    procesar=true se devuelve el resultado de la carga previa salvo que se
+    envie forzar=true.
+    """
     try:
         if 'archivo' not in request.files:
             return jsonify({'success': False, 'error': 'No se subió ningún archivo'}), 400
@@ -30,15 +114,16 @@ def cargar_csv():
         if archivo.filename == '':
             return jsonify({'success': False, 'error': 'No se seleccionó ningún archivo'}), 400
 
-        if archivo and allowed_file(archivo.filename):
-            filename = secure_filename(archivo.filename)
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            nombre_archivo = f"dengue_{timestamp}_{filename}"
-            ruta_archivo = os.path.join(UPLOAD_FOLDER, nombre_archivo)
+        procesar = _bandera('procesar')
+        if procesar and not archivo.filename.lower().endswith('.csv'):
+            return jsonify({'success': False, 'error': 'Solo se pueden procesar archivos CSV'}), 400
 
-            archivo.save(ruta_archivo)
+        if archivo and allowed_file(archivo.filename):
+            upload = _guardar_upload(archivo)
+            nombre_archivo, ruta_archivo = upload['archivo'], upload['ruta']
 
-            conn = get_db_connection()
+            # Un contenido ya subido no se vuelve a escribir ni a registrar
+            conn = None if upload['duplicado'] else get_db_connection()
             if conn:
                 try:
                     cursor = conn.cursor()
@@ -53,11 +138,37 @@ def cargar_csv():
                     cursor.close()
                     conn.close()
 
+            if procesar:
+                if upload['resultado'] is not None and not _bandera('forzar'):
+                    return jsonify({
+                        'success': True,
+                        'message': 'Archivo ya cargado y procesado',
+                        'nombreArchivo': nombre_archivo,
+                        'ruta': ruta_archivo,
+                        'duplicado': True,
+                        'resultado': upload['resultado']
+                    })
+                try:
+                    trabajo = _encolar_ingesta(upload)
+                except ErrorIngesta as e:
+                    return jsonify({'success': False, 'error': str(e), 'nombreArchivo': nombre_archivo,
+                                    **e.extra}), e.codigo
+                return jsonify({
+                    'success': True,
+                    'message': 'Archivo cargado, procesamiento en cola',
+                    'nombreArchivo': nombre_archivo,
+                    'ruta': ruta_archivo,
+                    'duplicado': upload['duplicado'],
+                    'id_trabajo': trabajo.id,
+                    'trabajo': trabajo.como_dict(incluir_resultado=False)
+                }), 202
+
             return jsonify({
                 'success': True,
-                'message': 'Archivo cargado exitosamente',
+                'message': 'Archivo ya cargado previamente' if upload['duplicado'] else 'Archivo cargado exitosamente',
                 'nombreArchivo': nombre_archivo,
-                'ruta': ruta_archivo
+                'ruta': ruta_archivo,
+                'duplicado': upload['duplicado']
             })
         else:
             return jsonify({
@@ -124,7 +235,15 @@ def get_estadisticas_datos():
 
 @datos_bp.route('/procesar-csv', methods=['POST'])
 def procesar_csv_preview():
-    """Procesa un archivo CSV y devuelve preview sin guardar en BD"""
+    """Procesa un archivo CSV y devuelve preview sin guardar en BD.
+
+    Por defecto el resumen se estima con una muestra acotada del archivo
+    (ver ingesta_csv.vista_previa_csv_sinave) y resumen.estimaciones indica
+    que cifras son estimadas: 'escalado' (conteo de la muestra extrapolado
+    al archivo) o 'muestra' (calculado solo con la muestra; estados, anios
+    y fechas extremas pueden faltar). Con completo=true se lee el archivo
+    entero y el resumen es exacto.
+    """
     if 'archivo' not in request.files:
         return jsonify({'error': 'No se envió ningun archivo'}), 400
 
@@ -136,45 +255,12 @@ def procesar_csv_preview():
         return jsonify({'error': 'Solo se permiten archivos CSV'}), 400
 
     try:
-        df = pd.read_csv(archivo)
-        registros_originales = len(df)
-
-        columnas_requeridas = ['FECHA_SIGN_SINTOMAS', 'ENTIDAD_RES', 'ESTATUS_CASO']
-        columnas_faltantes = [c for c in columnas_requeridas if c not in df.columns]
-        if columnas_faltantes:
-            return jsonify({
-                'success': False,
-                'error': f'Columnas faltantes: {", ".join(columnas_faltantes)}',
-                'columnas_encontradas': list(df.columns)
-            }), 400
-
-        df['FECHA_SIGN_SINTOMAS'] = pd.to_datetime(df['FECHA_SIGN_SINTOMAS'], errors='coerce')
-        df.dropna(subset=['FECHA_SIGN_SINTOMAS'], inplace=True)
-        df_confirmados = df[df['ESTATUS_CASO'] == 1].copy()
-
-        if len(df_confirmados) == 0:
-            return jsonify({
-                'success': False,
-                'error': 'No hay casos confirmados (ESTATUS_CASO=1) en el archivo',
-                'registros_totales': registros_originales
-            }), 400
-
-        df_confirmados['POBLACION'] = df_confirmados['ENTIDAD_RES'].map(POBLACION_2025)
-        df_confirmados.dropna(subset=['POBLACION'], inplace=True)
-        df_confirmados['NOMBRE_ESTADO'] = df_confirmados['ENTIDAD_RES'].map(ESTADO_POR_ID)
-
-        df_ts = (
-            df_confirmados.groupby(['ENTIDAD_RES', 'NOMBRE_ESTADO', 'POBLACION'])
-            .resample('W', on='FECHA_SIGN_SINTOMAS')
-            .size()
-            .reset_index(name='casos_confirmados')
-        )
-        df_ts.rename(columns={'FECHA_SIGN_SINTOMAS': 'fecha_fin_semana'}, inplace=True)
-
-        df_ts['tasa_incidencia'] = (df_ts['casos_confirmados'] / df_ts['POBLACION']) * 100000
-
-        umbral_riesgo = df_ts['tasa_incidencia'].quantile(0.75)
-        df_ts['riesgo_brote_target'] = np.where(df_ts['tasa_incidencia'] > umbral_riesgo, 1, 0).astype(int)
+        if _bandera('completo'):
+            ingesta = dict(procesar_csv_sinave(archivo), estimado=False)
+        else:
+            ingesta = vista_previa_csv_sinave(archivo)
+        df_ts = ingesta['df_ts']
+        umbral_riesgo = ingesta['umbral_riesgo']
 
         preview_data = []
         for _, row in df_ts.head(10).iterrows():
@@ -192,21 +278,42 @@ def procesar_csv_preview():
         fecha_inicio = df_ts['fecha_fin_semana'].min().strftime('%Y-%m-%d')
         fecha_fin = df_ts['fecha_fin_semana'].max().strftime('%Y-%m-%d')
 
+        resumen = {
+            'registros_originales': ingesta['registros_originales'],
+            'casos_confirmados': ingesta['casos_confirmados'],
+            'registros_procesados': len(df_ts),
+            'estados_procesados': len(estados_procesados),
+            'anios': anios_procesados,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'umbral_riesgo_ti': round(float(umbral_riesgo), 4),
+            'estimado': ingesta['estimado'],
+            'estimaciones': {}
+        }
+        if ingesta['estimado']:
+            resumen['estimaciones'] = {
+                'registros_originales': 'escalado',
+                'casos_confirmados': 'escalado',
+                'umbral_riesgo_ti': 'escalado',
+                'registros_procesados': 'muestra',
+                'estados_procesados': 'muestra',
+                'anios': 'muestra',
+                'fecha_inicio': 'muestra',
+                'fecha_fin': 'muestra'
+            }
+            resumen['muestra'] = {
+                'fraccion_bytes': round(ingesta['fraccion_muestreada'], 4),
+                'registros': ingesta['registros_muestra']
+            }
+
         return jsonify({
             'success': True,
-            'resumen': {
-                'registros_originales': registros_originales,
-                'casos_confirmados': len(df_confirmados),
-                'registros_procesados': len(df_ts),
-                'estados_procesados': len(estados_procesados),
-                'anios': anios_procesados,
-                'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin,
-                'umbral_riesgo_ti': round(float(umbral_riesgo), 4)
-            },
+            'resumen': resumen,
             'preview': preview_data
         })
 
+    except ErrorIngesta as e:
+        return jsonify({'success': False, 'error': str(e), **e.extra}), e.codigo
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -215,7 +322,19 @@ def procesar_csv_preview():
 
 @datos_bp.route('/procesar-csv-completo', methods=['POST'])
 def procesar_csv_completo():
-    """Carga un archivo CSV con datos de dengue y los inserta en BD"""
+    """Carga un archivo CSV con datos de dengue y los inserta en BD.
+
+    El archivo se guarda en uploads/CSV y se procesa como trabajo en un
+    proceso aparte (ver ingesta_csv.cargar_csv_sinave): responde 202 con el
+    id del trabajo (consultar /api/datos/trabajos/<id>). Con esperar=true
+    (campo del formulario) bloquea hasta que termine y responde las
+    estadisticas; sin conexion a la BD el trabajo termina con error 503.
+
+    Un archivo con el mismo contenido (SHA-256) que uno ya cargado responde
+    de inmediato el resultado previo con duplicado=true, sin volver a leerlo
+    ni escribir en la BD (forzar=true lo vuelve a cargar); si ese archivo se
+    esta cargando en este momento se reutiliza su trabajo.
+    """
     if 'archivo' not in request.files:
         return jsonify({'error': 'No se envió ningún archivo'}), 400
 
@@ -226,106 +345,72 @@ def procesar_csv_completo():
     if not archivo.filename.endswith('.csv'):
         return jsonify({'error': 'Solo se permiten archivos CSV'}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Error de conexión a base de datos'}), 500
-
-    cursor = None
     try:
-        df = pd.read_csv(archivo)
-        registros_originales = len(df)
+        upload = _guardar_upload(archivo)
+        nombre_archivo = upload['archivo']
+        if upload['resultado'] is not None and not _bandera('forzar'):
+            return jsonify(dict(upload['resultado'], duplicado=True, nombreArchivo=nombre_archivo)), 200
 
-        columnas_requeridas = ['FECHA_SIGN_SINTOMAS', 'ENTIDAD_RES', 'ESTATUS_CASO']
-        columnas_faltantes = [c for c in columnas_requeridas if c not in df.columns]
-        if columnas_faltantes:
+        trabajo = _encolar_ingesta(upload)
+        if not _bandera('esperar'):
             return jsonify({
-                'error': f'Columnas faltantes: {", ".join(columnas_faltantes)}',
-                'columnas_encontradas': list(df.columns)
-            }), 400
-
-        df['FECHA_SIGN_SINTOMAS'] = pd.to_datetime(df['FECHA_SIGN_SINTOMAS'], errors='coerce')
-        df.dropna(subset=['FECHA_SIGN_SINTOMAS'], inplace=True)
-        df_confirmados = df[df['ESTATUS_CASO'] == 1].copy()
-
-        if len(df_confirmados) == 0:
-            return jsonify({
-                'error': 'No hay casos confirmados (ESTATUS_CASO=1) en el archivo',
-                'registros_totales': registros_originales
-            }), 400
-
-        df_confirmados['POBLACION'] = df_confirmados['ENTIDAD_RES'].map(POBLACION_2025)
-        df_confirmados.dropna(subset=['POBLACION'], inplace=True)
-        df_confirmados['NOMBRE_ESTADO'] = df_confirmados['ENTIDAD_RES'].map(ESTADO_POR_ID)
+                'success': True,
+                'nombreArchivo': nombre_archivo,
+                'duplicado': upload['duplicado'],
+                'id_trabajo': trabajo.id,
+                'trabajo': trabajo.como_dict(incluir_resultado=False)
+            }), 202
+
+        trabajo.esperar()
+        if trabajo.error:
+            return jsonify({'error': trabajo.error, **(trabajo.extra_error or {})}), trabajo.codigo_error
+        return jsonify(trabajo.resultado), 200
+
+    except ErrorIngesta as e:
+        return jsonify({'error': str(e), **e.extra}), e.codigo
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
 
-        df_ts = (
-            df_confirmados.groupby(['ENTIDAD_RES', 'NOMBRE_ESTADO', 'POBLACION'])
-            .resample('W', on='FECHA_SIGN_SINTOMAS')
-            .size()
-            .reset_index(name='casos_confirmados')
-        )
-        df_ts.rename(columns={'FECHA_SIGN_SINTOMAS': 'fecha_fin_semana'}, inplace=True)
 
-        df_ts['tasa_incidencia'] = (df_ts['casos_confirmados'] / df_ts['POBLACION']) * 100000
+@datos_bp.route('/trabajos', methods=['GET'])
+def listar_trabajos_ingesta():
+    """Cargas de CSV recientes (sin el resultado completo)."""
+    return jsonify({
+        'success': True,
+        'trabajos': [t.como_dict(incluir_resultado=False) for t in trabajos_ingesta.listar()]
+    }), 200
 
-        umbral_riesgo = df_ts['tasa_incidencia'].quantile(0.75)
-        df_ts['riesgo_brote_target'] = np.where(df_ts['tasa_incidencia'] > umbral_riesgo, 1, 0).astype(int)
 
-        cursor = conn.cursor()
-        fecha_carga = datetime.now().date()
-
-        insert_sql = """
-        INSERT INTO dato_epidemiologico
-            (id_enfermedad, id_region, fecha_fin_semana, casos_confirmados,
-             defunciones, tasa_incidencia, riesgo_brote_target, fecha_carga)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            casos_confirmados = VALUES(casos_confirmados),
-            tasa_incidencia = VALUES(tasa_incidencia),
-            riesgo_brote_target = VALUES(riesgo_brote_target),
-            fecha_carga = VALUES(fecha_carga)
-        """
-
-        registros_insertados = 0
-        for _, row in df_ts.iterrows():
-            cursor.execute(insert_sql, (
-                1,
-                int(row['ENTIDAD_RES']),
-                row['fecha_fin_semana'].date(),
-                int(row['casos_confirmados']),
-                0,
-                round(float(row['tasa_incidencia']), 4),
-                int(row['riesgo_brote_target']),
-                fecha_carga
-            ))
-            registros_insertados += 1
+@datos_bp.route('/trabajos/<id_trabajo>', methods=['GET'])
+def estado_trabajo_ingesta(id_trabajo):
+    """Progreso de una carga (filas leidas, semanas agregadas, filas escritas) y su resultado."""
+    trabajo = trabajos_ingesta.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'success': False, 'error': f'Trabajo no encontrado: {id_trabajo}'}), 404
+    return jsonify({'success': True, 'trabajo': trabajo.como_dict()}), 200
 
-        conn.commit()
 
-        anios_procesados = df_ts['fecha_fin_semana'].dt.year.unique().tolist()
-        estados_procesados = df_ts['NOMBRE_ESTADO'].unique().tolist()
+@datos_bp.route('/trabajos/<id_trabajo>/cancelar', methods=['POST'])
+def cancelar_trabajo_ingesta(id_trabajo):
+    """Cancela una carga en cola o en ejecucion.
 
-        return jsonify({
-            'success': True,
-            'mensaje': f'Datos cargados exitosamente',
-            'estadisticas': {
-                'registros_originales': registros_originales,
-                'casos_confirmados': len(df_confirmados),
-                'registros_insertados': registros_insertados,
-                'anios_procesados': sorted(anios_procesados),
-                'estados_procesados': len(estados_procesados),
-                'fecha_carga': fecha_carga.isoformat()
-            }
-        })
+    Los lotes ya confirmados en dato_epidemiologico se conservan; el upsert
+    es idempotente, asi que la carga se puede repetir completa.
+    """
+    trabajo = trabajos_ingesta.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'success': False, 'error': f'Trabajo no encontrado: {id_trabajo}'}), 404
+    if trabajo.estado in ESTADOS_FINALES:
+        return jsonify({'success': False, 'error': f'El trabajo ya termino ({trabajo.estado})',
+                        'trabajo': trabajo.como_dict(incluir_resultado=False)}), 409
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    en_ejecucion = trabajo.estado == 'ejecutando'
+    trabajos_ingesta.cancelar(id_trabajo)
+    if en_ejecucion:
+        cache_predicciones.invalidar()  # pudo escribir lotes antes de cancelarse
+    return jsonify({'success': True, 'trabajo': trabajo.como_dict(incluir_resultado=False)}), 200
 
 
 @datos_bp.route('/limpiar', methods=['DELETE'])
@@ -343,6 +428,8 @@ def limpiar_datos():
 
         cursor.execute("DELETE FROM dato_epidemiologico")
         conn.commit()
+        cache_predicciones.invalidar()
+        olvidar_resultados()  # los archivos ya subidos deben volver a cargarse
 
         return jsonify({
             'success': True,
@@ -371,6 +458,8 @@ def limpiar_datos_anio(anio):
 
         cursor.execute("DELETE FROM dato_epidemiologico WHERE YEAR(fecha_fin_semana) = %s", (anio,))
         conn.commit()
+        cache_predicciones.invalidar()
+        olvidar_resultados()  # los archivos ya subidos deben volver a cargarse
 
         return jsonify({
             'success': True,
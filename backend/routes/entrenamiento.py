@@ -2,382 +2,266 @@
 # Endpoints de entrenamiento: Regresion Lineal vs Polinomial
 
 import os
-import numpy as np
 import pandas as pd
-import joblib
 from flask import Blueprint, request, jsonify
 
-from config import BACKEND_DIR
-from ml import models
+from config import BACKEND_DIR, MODEL_BUNDLE, ENTRENAMIENTO_MAX_CONCURRENTES
+from ml import models, publicar_bundle
+from cache_predicciones import cache_predicciones
+from entrenador import entrenar, validar_parametros, ErrorEntrenamiento
+from entrenamiento_incremental import actualizar
+from backtest import ejecutar_backtest, listar_resultados, leer_resultado, validar_parametros_backtest
+from trabajos import ESTADOS_FINALES, GestorTrabajos
 
 modelos_bp = Blueprint('modelos', __name__, url_prefix='/api/modelos')
 
+# Entrenamientos en procesos aparte (ver trabajos.py / entrenador.py)
+trabajos_entrenamiento = GestorTrabajos(max_concurrentes=ENTRENAMIENTO_MAX_CONCURRENTES)
+
+
+def _bandera(data, campo):
+    """Campo booleano del payload (true, o cadena 1/true/si)."""
+    valor = data.get(campo)
+    return valor is True or (isinstance(valor, str) and valor.lower() in ('1', 'true', 'si'))
+
+
+def _publicar_entrenamiento(resultado):
+    """Publica el bundle escrito por el proceso de entrenamiento."""
+    publicar_bundle()
+    cache_predicciones.invalidar()
+
 
 @modelos_bp.route('/entrenar', methods=['POST'])
 def entrenar_modelo():
-    """Entrena Regresion Lineal y Polinomial, devuelve comparativa."""
-    from sklearn.linear_model import LinearRegression
-    from sklearn.preprocessing import PolynomialFeatures, StandardScaler, LabelEncoder
-    from sklearn.pipeline import Pipeline
-    from sklearn.model_selection import train_test_split, cross_val_score
-    from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
-
+    """Entrena Regresion Lineal y Polinomial (desde CSV o BD), devuelve comparativa.
+
+    El entrenamiento corre en un proceso aparte: responde 202 con el id del
+    trabajo de inmediato (consultar /api/modelos/trabajos/<id>, cancelar con
+    /api/modelos/trabajos/<id>/cancelar). Con esperar=true bloquea hasta que
+    termine y responde la comparativa como antes.
+
+    Payload:
+      - fuente (str): 'csv' (default) o 'bd' (dato_epidemiologico por bloques)
+      - archivo_csv (str): CSV de entrenamiento (fuente csv)
+      - id_enfermedad (int): filtrar dato_epidemiologico (fuente bd, opcional)
+      - tam_bloque (int): filas por bloque al leer la BD (fuente bd, opcional)
+      - por_region (bool): ademas del global, entrenar un modelo por region
+      - n_jobs (int): procesos para la busqueda de grado y el entrenamiento por region
+      - memoria_poly_mb (float): MB maximos de la expansion polinomial; si no
+        cabe se ajusta por bloques (default POLINOMIAL_MEMORIA_MB)
+      - poly_float32 (bool): expandir los bloques en float32
+      - regularizacion (str): 'ridge' o 'lasso' para elegir grado y alpha juntos
+        por CV (default: sin regularizar)
+      - alphas (list): rejilla de alphas (default: ver regularizacion.py)
+      - grados (list): grados polinomiales a evaluar (default [2, 3, 4, 5])
+      - usar_cache (bool): reutilizar features en cache si el CSV/BD no cambio (default true)
+      - esperar (bool): esperar el resultado en la misma peticion (default false)
+    """
     try:
         data = request.get_json() or {}
-        archivo_csv = data.get('archivo_csv')
-
-        if not archivo_csv:
+        fuente = data.get('fuente', 'csv')
+        if fuente not in ('csv', 'bd'):
+            return jsonify({'success': False, 'error': "fuente debe ser 'csv' o 'bd'"}), 400
+        if fuente == 'csv' and not data.get('archivo_csv'):
             return jsonify({'success': False, 'error': 'archivo_csv es requerido'}), 400
 
-        # Buscar CSV
-        csv_path = None
-        for ruta in [
-            os.path.join(BACKEND_DIR, '..', 'data', archivo_csv),
-            os.path.join(BACKEND_DIR, '..', 'modelo', archivo_csv),
-            os.path.join(BACKEND_DIR, archivo_csv),
-            archivo_csv
-        ]:
-            if os.path.exists(ruta):
-                csv_path = ruta
-                break
-
-        if not csv_path:
-            return jsonify({'success': False, 'error': f'CSV no encontrado: {archivo_csv}'}), 404
-
-        df = pd.read_csv(csv_path)
-        print(f"[INFO] Datos cargados: {len(df)} registros, {len(df.columns)} columnas")
-
-        # -----------------------------------------------------------
-        # Preparar features: si el CSV tiene datos crudos, crearlas
-        # -----------------------------------------------------------
-        feature_cols = [
-            'casos_lag_1w', 'casos_lag_2w', 'casos_lag_3w', 'casos_lag_4w',
-            'ti_lag_1w', 'ti_lag_2w',
-            'casos_promedio_4w', 'tendencia_4w',
-            'semana_anio', 'mes', 'estado_coded'
-        ]
-
-        has_features = all(c in df.columns for c in feature_cols)
-
-        if not has_features:
-            # Crear features desde datos crudos
-            print("[INFO] Creando features desde datos crudos...")
-
-            # Detectar columnas
-            col_casos = next((c for c in ['casos_confirmados', 'CASOS_CONFIRMADOS'] if c in df.columns), None)
-            col_ti = next((c for c in ['tasa_incidencia', 'TASA_INCIDENCIA'] if c in df.columns), None)
-            col_estado = next((c for c in ['ENTIDAD_FED', 'NOMBRE_ESTADO', 'estado'] if c in df.columns), None)
-            col_fecha = next((c for c in ['fecha_fin_semana', 'FECHA', 'fecha'] if c in df.columns), None)
-
-            if not col_casos:
-                return jsonify({'success': False, 'error': 'CSV debe tener columna casos_confirmados'}), 400
-
-            if col_fecha:
-                df[col_fecha] = pd.to_datetime(df[col_fecha])
-                df = df.sort_values([col_estado, col_fecha] if col_estado else [col_fecha]).reset_index(drop=True)
-
-            # Label encode estado
-            if col_estado:
-                le = LabelEncoder()
-                df['estado_coded'] = le.fit_transform(df[col_estado])
-                models.label_encoder = le
-            elif 'ENTIDAD_CODED' in df.columns:
-                df['estado_coded'] = df['ENTIDAD_CODED']
-            else:
-                df['estado_coded'] = 0
-
-            # Crear lags
-            group_col = col_estado if col_estado else None
-            if group_col:
-                for lag in [1, 2, 3, 4]:
-                    df[f'casos_lag_{lag}w'] = df.groupby(group_col)[col_casos].shift(lag)
-                if col_ti:
-                    for lag in [1, 2]:
-                        df[f'ti_lag_{lag}w'] = df.groupby(group_col)[col_ti].shift(lag)
-                df['casos_promedio_4w'] = df.groupby(group_col)[col_casos].transform(
-                    lambda x: x.rolling(4, min_periods=1).mean().shift(1))
-            else:
-                for lag in [1, 2, 3, 4]:
-                    df[f'casos_lag_{lag}w'] = df[col_casos].shift(lag)
-                if col_ti:
-                    for lag in [1, 2]:
-                        df[f'ti_lag_{lag}w'] = df[col_ti].shift(lag)
-                df['casos_promedio_4w'] = df[col_casos].rolling(4, min_periods=1).mean().shift(1)
-
-            df['tendencia_4w'] = df.get('casos_lag_1w', 0) - df.get('casos_lag_4w', 0)
-
-            if col_fecha:
-                df['semana_anio'] = df[col_fecha].dt.isocalendar().week.astype(int)
-                df['mes'] = df[col_fecha].dt.month
-            else:
-                if 'SEMANA_DEL_ANIO' in df.columns:
-                    df['semana_anio'] = df['SEMANA_DEL_ANIO']
-                else:
-                    df['semana_anio'] = 1
-                if 'MES' in df.columns:
-                    df['mes'] = df['MES']
-                else:
-                    df['mes'] = 1
-
-            # Rellenar TI si no existe
-            if 'ti_lag_1w' not in df.columns:
-                df['ti_lag_1w'] = 0
-                df['ti_lag_2w'] = 0
-
-            df = df.dropna(subset=[c for c in feature_cols if c in df.columns])
-            print(f"[INFO] Registros despues de feature engineering: {len(df)}")
-        else:
-            col_casos = 'casos_confirmados' if 'casos_confirmados' in df.columns else 'CASOS_CONFIRMADOS'
-            # Asegurar label encoder si no existe
-            col_estado = next((c for c in ['ENTIDAD_FED', 'NOMBRE_ESTADO', 'estado'] if c in df.columns), None)
-            if col_estado and models.label_encoder is None:
-                le = LabelEncoder()
-                le.fit(df[col_estado].unique())
-                models.label_encoder = le
-
-        # Target
-        col_target = next((c for c in ['casos_confirmados', 'CASOS_CONFIRMADOS'] if c in df.columns), None)
-        if not col_target:
-            return jsonify({'success': False, 'error': 'No se encontro columna target (casos_confirmados)'}), 400
-
-        # Filtrar features existentes
-        available_features = [c for c in feature_cols if c in df.columns]
-        X = df[available_features].copy()
-        y = df[col_target].copy()
-
-        # Limpiar NaN
-        mask = X.notna().all(axis=1) & y.notna()
-        X = X[mask]
-        y = y[mask]
-
-        if len(X) < 20:
-            return jsonify({'success': False, 'error': f'Datos insuficientes: {len(X)} registros'}), 400
-
-        # Split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        print(f"[INFO] Train: {len(X_train)}, Test: {len(X_test)}, Features: {len(available_features)}")
-
-        # -----------------------------------------------------------
-        # 1) Regresion Lineal
-        # -----------------------------------------------------------
-        print("[ML] Entrenando Regresion Lineal...")
-        pipe_lineal = Pipeline([
-            ('scaler', StandardScaler()),
-            ('regressor', LinearRegression())
-        ])
-        pipe_lineal.fit(X_train, y_train)
-
-        y_pred_lin = pipe_lineal.predict(X_test)
-        r2_lin = r2_score(y_test, y_pred_lin)
-        mae_lin = mean_absolute_error(y_test, y_pred_lin)
-        rmse_lin = float(np.sqrt(mean_squared_error(y_test, y_pred_lin)))
-
-        cv_lin = cross_val_score(pipe_lineal, X, y, cv=5, scoring='r2')
-        r2_cv_lin = float(cv_lin.mean())
-
-        metricas_lineal = {
-            'r2': round(float(r2_lin), 4),
-            'r2_cv': round(r2_cv_lin, 4),
-            'mae': round(float(mae_lin), 2),
-            'rmse': round(rmse_lin, 2)
-        }
-        print(f"[OK] Lineal: R2={r2_lin:.4f}, R2_CV={r2_cv_lin:.4f}, MAE={mae_lin:.2f}")
-
-        # -----------------------------------------------------------
-        # 2) Regresion Polinomial (grados 2-5, elegir mejor)
-        # -----------------------------------------------------------
-        print("[ML] Entrenando Regresion Polinomial (grados 2-5)...")
-        mejor_grado = 2
-        mejor_r2_cv = -np.inf
-        resultados_grados = {}
-
-        for grado in range(2, 6):
-            try:
-                pipe_poly = Pipeline([
-                    ('poly', PolynomialFeatures(degree=grado, include_bias=False, interaction_only=False)),
-                    ('scaler', StandardScaler()),
-                    ('regressor', LinearRegression())
-                ])
-
-                # Cross-validation para evitar overfitting
-                cv_scores = cross_val_score(pipe_poly, X_train, y_train, cv=5, scoring='r2')
-                r2_cv = float(cv_scores.mean())
-
-                pipe_poly.fit(X_train, y_train)
-                y_pred_poly = pipe_poly.predict(X_test)
-                r2_test = float(r2_score(y_test, y_pred_poly))
-                mae_test = float(mean_absolute_error(y_test, y_pred_poly))
-
-                n_features_poly = pipe_poly.named_steps['poly'].n_output_features_
-
-                resultados_grados[grado] = {
-                    'r2_test': round(r2_test, 4),
-                    'r2_cv': round(r2_cv, 4),
-                    'mae': round(mae_test, 2),
-                    'n_features': n_features_poly
-                }
-
-                print(f"   Grado {grado}: R2_test={r2_test:.4f}, R2_CV={r2_cv:.4f}, "
-                      f"MAE={mae_test:.2f}, features={n_features_poly}")
-
-                # Seleccionar por R2 de CV (evita overfitting)
-                if r2_cv > mejor_r2_cv:
-                    mejor_r2_cv = r2_cv
-                    mejor_grado = grado
-
-            except Exception as e:
-                print(f"   Grado {grado}: ERROR - {e}")
-                resultados_grados[grado] = {'error': str(e)}
-
-        # Entrenar modelo final con mejor grado
-        print(f"[ML] Mejor grado polinomial: {mejor_grado} (R2_CV={mejor_r2_cv:.4f})")
-
-        pipe_mejor_poly = Pipeline([
-            ('poly', PolynomialFeatures(degree=mejor_grado, include_bias=False)),
-            ('scaler', StandardScaler()),
-            ('regressor', LinearRegression())
-        ])
-        pipe_mejor_poly.fit(X_train, y_train)
-
-        y_pred_poly_final = pipe_mejor_poly.predict(X_test)
-        r2_poly = float(r2_score(y_test, y_pred_poly_final))
-        mae_poly = float(mean_absolute_error(y_test, y_pred_poly_final))
-        rmse_poly = float(np.sqrt(mean_squared_error(y_test, y_pred_poly_final)))
-
-        cv_poly_final = cross_val_score(pipe_mejor_poly, X, y, cv=5, scoring='r2')
-        r2_cv_poly = float(cv_poly_final.mean())
-
-        metricas_polinomial = {
-            'r2': round(r2_poly, 4),
-            'r2_cv': round(r2_cv_poly, 4),
-            'mae': round(mae_poly, 2),
-            'rmse': round(rmse_poly, 2),
-            'grado': mejor_grado
-        }
-        print(f"[OK] Polinomial(grado {mejor_grado}): R2={r2_poly:.4f}, "
-              f"R2_CV={r2_cv_poly:.4f}, MAE={mae_poly:.2f}")
-
-        # -----------------------------------------------------------
-        # 3) Calcular umbrales de riesgo
-        # -----------------------------------------------------------
-        umbrales = {
-            'p25': float(np.percentile(y, 25)),
-            'p50': float(np.percentile(y, 50)),
-            'p75': float(np.percentile(y, 75)),
-            'p90': float(np.percentile(y, 90)),
-            'media': float(np.mean(y)),
-            'std': float(np.std(y)),
-            'max': float(np.max(y)),
-            'min': float(np.min(y))
-        }
+        parametros = {k: data[k] for k in ('fuente', 'archivo_csv', 'id_enfermedad', 'tam_bloque',
+                                           'por_region', 'n_jobs', 'usar_cache', 'memoria_poly_mb',
+                                           'poly_float32', 'regularizacion', 'alphas', 'grados') if k in data}
+        try:
+            validar_parametros(parametros)
+        except ErrorEntrenamiento as e:
+            return jsonify({'success': False, 'error': str(e)}), e.codigo
+        trabajo = trabajos_entrenamiento.enviar(
+            'entrenamiento', entrenar,
+            args=(parametros,),
+            kwargs={'label_encoder': models.snapshot().label_encoder},
+            parametros=parametros,
+            al_terminar=_publicar_entrenamiento
+        )
+
+        if not _bandera(data, 'esperar'):
+            return jsonify({
+                'success': True,
+                'id_trabajo': trabajo.id,
+                'trabajo': trabajo.como_dict(incluir_resultado=False)
+            }), 202
+
+        trabajo.esperar()
+        if trabajo.error:
+            respuesta = {'success': False, 'error': trabajo.error}
+            if trabajo.codigo_error == 500:
+                respuesta['detalles'] = trabajo.detalles
+            return jsonify(respuesta), trabajo.codigo_error
+        return jsonify(trabajo.resultado), 200
 
-        # -----------------------------------------------------------
-        # 4) Guardar modelos
-        # -----------------------------------------------------------
-        joblib.dump(pipe_lineal, os.path.join(BACKEND_DIR, 'model_lineal.pkl'))
-        joblib.dump(pipe_mejor_poly, os.path.join(BACKEND_DIR, 'model_polinomial.pkl'))
-        joblib.dump(available_features, os.path.join(BACKEND_DIR, 'model_features.pkl'))
-        joblib.dump(umbrales, os.path.join(BACKEND_DIR, 'model_umbrales.pkl'))
-
-        if models.label_encoder is not None:
-            joblib.dump(models.label_encoder, os.path.join(BACKEND_DIR, 'label_encoder.pkl'))
-
-        metricas_all = {
-            'lineal': metricas_lineal,
-            'polinomial': metricas_polinomial,
-            'poly_degree': mejor_grado
-        }
-        joblib.dump(metricas_all, os.path.join(BACKEND_DIR, 'model_metricas.pkl'))
-
-        # Actualizar ModelStore en memoria
-        models.modelo_lineal = pipe_lineal
-        models.modelo_polinomial = pipe_mejor_poly
-        models.poly_degree = mejor_grado
-        models.feature_cols = available_features
-        models.metricas_lineal = metricas_lineal
-        models.metricas_polinomial = metricas_polinomial
-        models.umbrales_riesgo = umbrales
-
-        # -----------------------------------------------------------
-        # 5) Determinar mejor modelo
-        # -----------------------------------------------------------
-        mejor = 'polinomial' if r2_cv_poly >= r2_cv_lin else 'lineal'
-        mejor_r2 = max(r2_poly, r2_lin)
-        mejor_mae = metricas_polinomial['mae'] if mejor == 'polinomial' else metricas_lineal['mae']
-
-        print(f"[OK] Mejor modelo: {mejor} (R2={mejor_r2:.4f})")
-
-        return jsonify({
-            'success': True,
-            'tipo_modelo': 'regresor',
-            'mensaje': (f'Modelos entrenados - Mejor: '
-                        f'{"Polinomial grado " + str(mejor_grado) if mejor == "polinomial" else "Lineal"} '
-                        f'(R2={mejor_r2:.4f})'),
-            'metricas': {
-                'r2_score': round(mejor_r2, 4),
-                'mae': round(mejor_mae, 2)
-            },
-            'datos': {
-                'total_registros': len(df),
-                'registros_entrenamiento': len(X_train),
-                'registros_prueba': len(X_test),
-                'features': available_features
-            },
-            'archivo_guardado': 'model_lineal.pkl + model_polinomial.pkl',
-            'comparativa': {
-                'lineal': metricas_lineal,
-                'polinomial': metricas_polinomial,
-                'grados_evaluados': resultados_grados,
-                'mejor_modelo': mejor,
-                'mejor_grado': mejor_grado
-            },
-            'umbrales_riesgo': umbrales
-        }), 200
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e), 'detalles': traceback.format_exc()}), 500
 
+
+@modelos_bp.route('/actualizar', methods=['POST'])
+def actualizar_modelo():
+    """Actualizacion incremental: suma las semanas nuevas de la BD y re-resuelve.
+
+    Corre en este proceso (milisegundos): parte de las estadisticas
+    guardadas en el bundle por el ultimo entrenamiento completo.
+
+    Payload (opcional):
+      - desde (str): fecha a partir de la cual leer (default: la ultima incorporada)
+      - id_enfermedad (int): filtrar dato_epidemiologico
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        resultado = actualizar(data, models.snapshot())
+        if resultado['bundle'] is not None:
+            _publicar_entrenamiento(resultado)
+        return jsonify(resultado), 200
+
+    except ErrorEntrenamiento as e:
+        return jsonify({'success': False, 'error': str(e)}), e.codigo
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e), 'detalles': traceback.format_exc()}), 500
 
 
+@modelos_bp.route('/backtest', methods=['POST'])
+def iniciar_backtest():
+    """Backtest walk-forward en segundo plano (responde 202 con el id del trabajo).
+
+    Payload:
+      - fuente, archivo_csv, id_enfermedad, usar_cache: datos como en /entrenar
+      - horizonte (int): semanas pronosticadas desde cada origen (default 4)
+      - grado (int): grado polinomial (default: el del modelo vigente)
+      - n_origenes (int): ultimos origenes a evaluar (default 52, 0 = todos)
+      - paso (int): semanas entre origenes (default 1)
+      - min_semanas (int): semanas minimas de entrenamiento (default 104)
+      - n_jobs (int): procesos para evaluar los origenes
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get('fuente', 'csv') == 'csv' and not data.get('archivo_csv'):
+        return jsonify({'success': False, 'error': 'archivo_csv es requerido'}), 400
+
+    snap = models.snapshot()
+    parametros = dict(data, grado=data.get('grado') or snap.poly_degree)
+    try:
+        parametros.update(validar_parametros_backtest(parametros))
+    except ErrorEntrenamiento as e:
+        return jsonify({'success': False, 'error': str(e)}), e.codigo
+    manifiesto = snap.manifiesto or {}
+    trabajo = trabajos_entrenamiento.enviar(
+        'backtest', ejecutar_backtest,
+        args=(parametros,),
+        kwargs={
+            'label_encoder': snap.label_encoder,
+            'modelo_vigente': {
+                'version': snap.version,
+                'creado': manifiesto.get('creado'),
+                'checksum': manifiesto.get('checksum'),
+                'poly_degree': snap.poly_degree
+            }
+        },
+        parametros=parametros
+    )
+    return jsonify({
+        'success': True,
+        'id_trabajo': trabajo.id,
+        'trabajo': trabajo.como_dict(incluir_resultado=False)
+    }), 202
+
+
+@modelos_bp.route('/backtests', methods=['GET'])
+def listar_backtests():
+    """Backtests guardados: configuracion y MAE por horizonte de cada modelo."""
+    return jsonify({'success': True, 'backtests': listar_resultados()}), 200
+
+
+@modelos_bp.route('/backtests/<archivo>', methods=['GET'])
+def obtener_backtest(archivo):
+    """Resultado completo de un backtest guardado."""
+    resultado = leer_resultado(archivo)
+    if resultado is None:
+        return jsonify({'success': False, 'error': f'Backtest no encontrado: {archivo}'}), 404
+    return jsonify(resultado), 200
+
+
+@modelos_bp.route('/trabajos', methods=['GET'])
+def listar_trabajos():
+    """Trabajos de entrenamiento y backtest recientes (sin el resultado completo)."""
+    return jsonify({
+        'success': True,
+        'trabajos': [t.como_dict(incluir_resultado=False) for t in trabajos_entrenamiento.listar()]
+    }), 200
+
+
+@modelos_bp.route('/trabajos/<id_trabajo>', methods=['GET'])
+def estado_trabajo(id_trabajo):
+    """Progreso por etapa de un entrenamiento y, al terminar, su comparativa."""
+    trabajo = trabajos_entrenamiento.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'success': False, 'error': f'Trabajo no encontrado: {id_trabajo}'}), 404
+    return jsonify({'success': True, 'trabajo': trabajo.como_dict()}), 200
+
+
+@modelos_bp.route('/trabajos/<id_trabajo>/cancelar', methods=['POST'])
+def cancelar_trabajo(id_trabajo):
+    """Cancela un entrenamiento o backtest en cola o en ejecucion.
+
+    Cancelar antes de la etapa persistencia deja intacto el modelo vigente
+    (el bundle se escribe de forma atomica y se publica al terminar).
+    """
+    trabajo = trabajos_entrenamiento.obtener(id_trabajo)
+    if trabajo is None:
+        return jsonify({'success': False, 'error': f'Trabajo no encontrado: {id_trabajo}'}), 404
+    if trabajo.estado in ESTADOS_FINALES:
+        return jsonify({'success': False, 'error': f'El trabajo ya termino ({trabajo.estado})',
+                        'trabajo': trabajo.como_dict(incluir_resultado=False)}), 409
+
+    trabajos_entrenamiento.cancelar(id_trabajo)
+    return jsonify({'success': True, 'trabajo': trabajo.como_dict(incluir_resultado=False)}), 200
+
+
 @modelos_bp.route('/info', methods=['GET'])
 def get_modelos_info():
     """Informacion de modelos cargados y CSVs disponibles."""
+    snap = models.snapshot()
 
-    lineal_existe = os.path.exists(os.path.join(BACKEND_DIR, 'model_lineal.pkl'))
-    poli_existe = os.path.exists(os.path.join(BACKEND_DIR, 'model_polinomial.pkl'))
+    bundle_existe = os.path.exists(MODEL_BUNDLE)
+    lineal_existe = bundle_existe or os.path.exists(os.path.join(BACKEND_DIR, 'model_lineal.pkl'))
+    poli_existe = bundle_existe or os.path.exists(os.path.join(BACKEND_DIR, 'model_polinomial.pkl'))
 
     modelos_info = {
         'lineal': {
-            'cargado': models.modelo_lineal is not None,
+            'cargado': snap.modelo_lineal is not None,
             'archivo': 'model_lineal.pkl',
             'existe': lineal_existe,
-            'metricas': models.metricas_lineal,
-            'features': models.feature_cols or []
+            'metricas': snap.metricas_lineal,
+            'features': snap.feature_cols or []
         },
         'polinomial': {
-            'cargado': models.modelo_polinomial is not None,
+            'cargado': snap.modelo_polinomial is not None,
             'archivo': 'model_polinomial.pkl',
             'existe': poli_existe,
-            'grado': models.poly_degree,
-            'metricas': models.metricas_polinomial,
-            'features': models.feature_cols or []
+            'grado': snap.poly_degree,
+            'metricas': snap.metricas_polinomial,
+            'features': snap.feature_cols or []
         },
         # Backward compat aliases for frontend
         'clasificador': {
-            'cargado': models.modelo_lineal is not None,
+            'cargado': snap.modelo_lineal is not None,
             'existe': lineal_existe,
             'archivo': 'model_lineal.pkl',
-            'n_features': len(models.feature_cols) if models.feature_cols else 0,
+            'n_features': len(snap.feature_cols) if snap.feature_cols else 0,
             'n_classes': 4,
-            'label_encoder': models.label_encoder is not None
+            'label_encoder': snap.label_encoder is not None
         },
         'regresor': {
-            'cargado': models.modelo_polinomial is not None,
+            'cargado': snap.modelo_polinomial is not None,
             'existe': poli_existe,
             'archivo': 'model_polinomial.pkl',
-            'features': models.feature_cols or []
+            'features': snap.feature_cols or []
         }
     }
 
@@ -412,6 +296,12 @@ def get_modelos_info():
     return jsonify({
         'success': True,
         'modelos': modelos_info,
-        'mejor_modelo': mejor_modelo() if hay_modelos() else None,
+        'bundle': snap.manifiesto,
+        'modelos_regionales': sorted(snap.modelos_region),
+        'incremental': {
+            'hasta': snap.estadisticas.get('hasta'),
+            'actualizaciones': snap.estadisticas.get('actualizaciones', 0)
+        } if snap.estadisticas else None,
+        'mejor_modelo': mejor_modelo(snap) if hay_modelos(snap) else None,
         'archivos_csv': archivos_csv
     }), 200
@@ -6,17 +6,48 @@ from datetime import datetime
 
 from config import ESTADO_POR_ID, POBLACION_2025
 from database import get_db_connection
-from ml import models, hay_modelos, mejor_modelo, predecir_casos, derivar_riesgo, construir_features
+from cache_predicciones import cache_predicciones
+from ml import (models, hay_modelos, mejor_modelo, predecir_casos, derivar_riesgo,
+                construir_vector_features, pronosticar_recursivo, HORIZONTE_MAX)
 
 modelo_bp = Blueprint('modelo', __name__, url_prefix='/api/modelo')
 
 
+def _registrar_alerta(conn, cursor, response):
+    """Guarda una alerta si el riesgo de la respuesta es >= 50%.
+
+    Se llama igual con respuesta nueva o desde el cache: cada consulta con
+    riesgo alto deja su alerta, como antes de existir el cache.
+    """
+    if response['riesgo_probabilidad'] < 50:
+        return
+    try:
+        cursor.execute("""
+            INSERT INTO alertas (tipo, nivel, estado, mensaje,
+                                 probabilidad, casos_predichos,
+                                 fecha_generacion, estado_alerta)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'activa')
+        """, (
+            'prediccion_automatica',
+            response['nivel_riesgo'],
+            response['estado'],
+            response['mensaje'],
+            response['riesgo_probabilidad'],
+            response['prediccion']['casos_proxima_semana'],
+            datetime.now()
+        ))
+        conn.commit()
+    except Exception:
+        pass  # Tabla puede no existir aun
+
+
 @modelo_bp.route('/predecir-riesgo-automatico', methods=['POST'])
 def predecir_riesgo_automatico():
     """Prediccion automatica que usa datos recientes de la BD."""
     conn = None
     try:
-        if not hay_modelos():
+        snap = models.snapshot()
+        if not hay_modelos(snap):
             return jsonify({
                 'success': False,
                 'error': 'No hay modelos entrenados. Entrene via /api/modelos/entrenar'
@@ -39,39 +70,53 @@ def predecir_riesgo_automatico():
 
         cursor = conn.cursor(dictionary=True)
 
-        # Obtener ultimos 4 registros para features
+        # Ultima semana con datos de la region (clave del cache, sin leer las filas)
         cursor.execute("""
-            SELECT casos_confirmados, tasa_incidencia, fecha_fin_semana
+            SELECT MAX(fecha_fin_semana) AS ultima_semana
             FROM dato_epidemiologico
             WHERE id_region = %s
-            ORDER BY fecha_fin_semana DESC
-            LIMIT 4
         """, (id_region,))
-        datos = cursor.fetchall()
+        marca = cursor.fetchone()
+        ultima_semana = marca['ultima_semana'] if marca else None
 
-        if len(datos) < 1:
+        if ultima_semana is None:
             return jsonify({
                 'success': False,
                 'error': f'Sin datos epidemiologicos para {nombre_estado}'
             }), 404
 
-        X_df, info_datos = construir_features(datos, id_region)
-        info_datos['poblacion_region'] = poblacion
+        # Mismo resultado mientras no haya semana nueva ni modelos nuevos
+        hoy = datetime.now()
+        semana = hoy.isocalendar()[1]
+        mes = hoy.month
+        clave_cache = (id_region, ultima_semana, semana, mes, snap.version)
+        response = cache_predicciones.obtener(clave_cache)
+        if response is not None:
+            response = dict(response, fecha_evaluacion=hoy.strftime('%Y-%m-%d'))
+            _registrar_alerta(conn, cursor, response)
+            return jsonify(response), 200
+
+        # Obtener ultimos 4 registros para features
+        cursor.execute("""
+            SELECT casos_confirmados, tasa_incidencia, fecha_fin_semana
+            FROM dato_epidemiologico
+            WHERE id_region = %s
+            ORDER BY fecha_fin_semana DESC
+            LIMIT 4
+        """, (id_region,))
+        datos = cursor.fetchall()
 
-        # Asegurar que las features coincidan con las del modelo
-        if models.feature_cols:
-            for col in models.feature_cols:
-                if col not in X_df.columns:
-                    X_df[col] = 0
-            X_df = X_df[models.feature_cols]
+        # Fila de features ya en el orden de snap.feature_cols
+        x, info_datos = construir_vector_features(datos, id_region, semana, mes, snap=snap)
+        info_datos['poblacion_region'] = poblacion
 
         # Predecir con ambos modelos
-        predicciones = predecir_casos(X_df)
+        predicciones = predecir_casos(x, snap, id_region)
         casos_pred = predicciones.get('casos_mejor_modelo', 0)
         modelo_usado = predicciones.get('mejor', 'desconocido')
 
         # Derivar riesgo
-        riesgo = derivar_riesgo(casos_pred, poblacion)
+        riesgo = derivar_riesgo(casos_pred, poblacion, snap)
 
         # Calcular tendencia
         c1 = info_datos.get('casos_ultima_semana', 0)
@@ -92,6 +137,7 @@ def predecir_riesgo_automatico():
         response = {
             'success': True,
             'modelo_utilizado': modelo_usado,
+            'ambito_modelo': predicciones.get('ambito', 'global'),
             'estado': nombre_estado,
             'id_region': id_region,
             'fecha_evaluacion': datetime.now().strftime('%Y-%m-%d'),
@@ -125,27 +171,8 @@ def predecir_riesgo_automatico():
                 'mejor_modelo': modelo_usado
             }
         }
-
-        # Guardar alerta si riesgo >= 50%
-        if riesgo['probabilidad'] >= 50:
-            try:
-                cursor.execute("""
-                    INSERT INTO alertas (tipo, nivel, estado, mensaje,
-                                         probabilidad, casos_predichos,
-                                         fecha_generacion, estado_alerta)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'activa')
-                """, (
-                    'prediccion_automatica',
-                    riesgo['nivel'],
-                    nombre_estado,
-                    riesgo['mensaje'],
-                    riesgo['probabilidad'],
-                    casos_pred,
-                    datetime.now()
-                ))
-                conn.commit()
-            except Exception:
-                pass  # Tabla puede no existir aun
+        cache_predicciones.guardar(clave_cache, response)
+        _registrar_alerta(conn, cursor, response)
 
         return jsonify(response), 200
 
@@ -171,11 +198,12 @@ def predecir_riesgo_avanzado():
       - incluir_validacion (bool): si True, busca casos reales para esa semana
       - semana_offset (int): offset semanal para proyecciones secuenciales
       - fecha_inicio / fecha_fin: rango alternativo (compat legacy)
-      - num_semanas (int): cuantas semanas proyectar hacia adelante
+      - num_semanas (int): cuantas semanas proyectar hacia adelante (max 52)
     """
     conn = None
     try:
-        if not hay_modelos():
+        snap = models.snapshot()
+        if not hay_modelos(snap):
             return jsonify({
                 'success': False,
                 'error': 'No hay modelos entrenados. Entrene via /api/modelos/entrenar'
@@ -243,24 +271,21 @@ def predecir_riesgo_avanzado():
             except ValueError:
                 pass
 
-        X_df, info_datos = construir_features(datos, id_region, semana, mes)
-
-        if models.feature_cols:
-            for col in models.feature_cols:
-                if col not in X_df.columns:
-                    X_df[col] = 0
-            X_df = X_df[models.feature_cols]
+        x, info_datos = construir_vector_features(datos, id_region, semana, mes, snap=snap)
 
-        predicciones_ml = predecir_casos(X_df)
+        predicciones_ml = predecir_casos(x, snap, id_region)
         casos_pred = predicciones_ml.get('casos_mejor_modelo', 0)
         modelo_usado = predicciones_ml.get('mejor', 'desconocido')
-        riesgo = derivar_riesgo(casos_pred, poblacion)
+        riesgo = derivar_riesgo(casos_pred, poblacion, snap)
 
         # Metricas del modelo para el frontend
+        # (del modelo regional si la prediccion se enruto a uno)
+        usado = predicciones_ml.get(modelo_usado) or {}
         metricas_modelo = {
-            'r2': models.metricas_lineal.get('r2', 0) if modelo_usado == 'lineal' else models.metricas_polinomial.get('r2', 0),
-            'mae': models.metricas_lineal.get('mae', 0) if modelo_usado == 'lineal' else models.metricas_polinomial.get('mae', 0),
-            'accuracy': models.metricas_lineal.get('r2', 0) if modelo_usado == 'lineal' else models.metricas_polinomial.get('r2', 0)
+            'r2': usado.get('r2', 0),
+            'mae': usado.get('mae', 0),
+            'accuracy': usado.get('r2', 0),
+            'ambito': predicciones_ml.get('ambito', 'global')
         }
 
         # Proyecciones multiples semanas (si se solicitan)
@@ -272,35 +297,25 @@ def predecir_riesgo_avanzado():
             'probabilidad': riesgo['probabilidad']
         })
 
+        proyeccion_truncada = False
         if num_semanas > 1:
-            datos_iter = list(datos)
-            for s in range(1, min(num_semanas, 12)):
-                sem_siguiente = (info_datos.get('semana_epidemiologica', 0) + 1 + s) % 52 or 52
-                mes_sig = ((info_datos.get('mes', 1) + (s // 4)) - 1) % 12 + 1
-
-                nuevo_registro = {
-                    'casos_confirmados': proyecciones[-1]['casos_predichos'],
-                    'tasa_incidencia': (proyecciones[-1]['casos_predichos'] / max(poblacion, 1)) * 100000
-                }
-                datos_iter.insert(0, nuevo_registro)
-                datos_iter = datos_iter[:4]
-
-                X_next, _ = construir_features(datos_iter, id_region, sem_siguiente, mes_sig)
-                if models.feature_cols:
-                    for col in models.feature_cols:
-                        if col not in X_next.columns:
-                            X_next[col] = 0
-                    X_next = X_next[models.feature_cols]
-
-                pred_next = predecir_casos(X_next)
-                casos_next = pred_next.get('casos_mejor_modelo', 0)
-                riesgo_next = derivar_riesgo(casos_next, poblacion)
-
+            pronostico = pronosticar_recursivo(
+                [datos], [id_region],
+                info_datos.get('semana_epidemiologica', 0), info_datos.get('mes', 1),
+                min(num_semanas, HORIZONTE_MAX), poblacion, snap
+            )
+            for s in range(1, pronostico['casos'].shape[1]):
+                # La recursion divergio (no finita o sobre la poblacion): cortar aqui
+                if not pronostico['valido'][0, s]:
+                    proyeccion_truncada = True
+                    print(f"[WARN] Pronostico de {nombre_estado} divergio en el paso {s + 1}; "
+                          f"se devuelven {len(proyecciones)} semanas")
+                    break
                 proyecciones.append({
-                    'semana': sem_siguiente,
-                    'casos_predichos': casos_next,
-                    'nivel_riesgo': riesgo_next['nivel'],
-                    'probabilidad': riesgo_next['probabilidad']
+                    'semana': int(pronostico['semana'][s]),
+                    'casos_predichos': int(pronostico['casos'][0, s]),
+                    'nivel_riesgo': pronostico['nivel'][0, s],
+                    'probabilidad': float(pronostico['probabilidad'][0, s])
                 })
 
         # -----------------------------------------------------------
@@ -372,7 +387,7 @@ def predecir_riesgo_avanzado():
         # Nombre legible del modelo
         nombre_modelo_map = {
             'lineal': 'Regresion Lineal',
-            'polinomial': f'Regresion Polinomial (grado {models.poly_degree})'
+            'polinomial': f'Regresion Polinomial (grado {snap.poly_degree})'
         }
 
         response = {
@@ -405,6 +420,7 @@ def predecir_riesgo_avanzado():
             },
 
             'proyecciones': proyecciones,
+            'proyeccion_truncada': proyeccion_truncada,
 
             'comparativa': {
                 'lineal': predicciones_ml.get('lineal', {}),
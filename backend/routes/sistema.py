@@ -192,18 +192,22 @@ def health():
                 cursor.close()
             conn.close()
 
-    if hay_modelos():
+    snap = models.snapshot()
+    if hay_modelos(snap):
         health_status['models']['loaded'] = True
-        health_status['models']['lineal'] = 'Regresion Lineal' if models.modelo_lineal else None
-        health_status['models']['polinomial'] = f'Regresion Polinomial (grado {models.poly_degree})' if models.modelo_polinomial else None
-        health_status['models']['mejor_modelo'] = get_mejor()
+        health_status['models']['lineal'] = 'Regresion Lineal' if snap.modelo_lineal else None
+        health_status['models']['polinomial'] = f'Regresion Polinomial (grado {snap.poly_degree})' if snap.modelo_polinomial else None
+        health_status['models']['mejor_modelo'] = get_mejor(snap)
         health_status['models']['metrics'] = {
-            'r2_lineal': round(models.metricas_lineal.get('r2', 0), 4),
-            'r2_polinomial': round(models.metricas_polinomial.get('r2', 0), 4),
-            'mae_lineal': round(models.metricas_lineal.get('mae', 0), 2),
-            'mae_polinomial': round(models.metricas_polinomial.get('mae', 0), 2)
+            'r2_lineal': round(snap.metricas_lineal.get('r2', 0), 4),
+            'r2_polinomial': round(snap.metricas_polinomial.get('r2', 0), 4),
+            'mae_lineal': round(snap.metricas_lineal.get('mae', 0), 2),
+            'mae_polinomial': round(snap.metricas_polinomial.get('mae', 0), 2)
         }
 
+    from cache_predicciones import cache_predicciones
+    health_status['predictions']['cache'] = cache_predicciones.estadisticas()
+
     return jsonify(health_status), 200
 
 
@@ -211,6 +215,7 @@ def health():
 def info_sistema():
     """Información del sistema y modelos"""
     from ml import hay_modelos, mejor_modelo as get_mejor
+    snap = models.snapshot()
     return jsonify({
         'success': True,
         'sistema': {
@@ -222,35 +227,35 @@ def info_sistema():
             'lineal': {
                 'nombre': 'Regresion Lineal',
                 'archivo': 'model_lineal.pkl',
-                'cargado': models.modelo_lineal is not None,
-                'metricas': models.metricas_lineal,
-                'features': models.feature_cols or [],
-                'r2_score': models.metricas_lineal.get('r2', 0)
+                'cargado': snap.modelo_lineal is not None,
+                'metricas': snap.metricas_lineal,
+                'features': snap.feature_cols or [],
+                'r2_score': snap.metricas_lineal.get('r2', 0)
             },
             'polinomial': {
-                'nombre': f'Regresion Polinomial (grado {models.poly_degree})',
+                'nombre': f'Regresion Polinomial (grado {snap.poly_degree})',
                 'archivo': 'model_polinomial.pkl',
-                'cargado': models.modelo_polinomial is not None,
-                'metricas': models.metricas_polinomial,
-                'features': models.feature_cols or [],
-                'r2_score': models.metricas_polinomial.get('r2', 0)
+                'cargado': snap.modelo_polinomial is not None,
+                'metricas': snap.metricas_polinomial,
+                'features': snap.feature_cols or [],
+                'r2_score': snap.metricas_polinomial.get('r2', 0)
             },
             # Backward-compatible aliases for frontend (Configuracion.js)
             'clasificador': {
                 'nombre': 'Regresion Lineal',
                 'archivo': 'model_lineal.pkl',
-                'cargado': models.modelo_lineal is not None,
-                'features': models.feature_cols or [],
-                'r2_score': models.metricas_lineal.get('r2', 0)
+                'cargado': snap.modelo_lineal is not None,
+                'features': snap.feature_cols or [],
+                'r2_score': snap.metricas_lineal.get('r2', 0)
             },
             'regresor': {
-                'nombre': f'Regresion Polinomial (grado {models.poly_degree})',
+                'nombre': f'Regresion Polinomial (grado {snap.poly_degree})',
                 'archivo': 'model_polinomial.pkl',
-                'cargado': models.modelo_polinomial is not None,
-                'features': models.feature_cols or [],
-                'r2_score': models.metricas_polinomial.get('r2', 0)
+                'cargado': snap.modelo_polinomial is not None,
+                'features': snap.feature_cols or [],
+                'r2_score': snap.metricas_polinomial.get('r2', 0)
             },
-            'mejor_modelo': get_mejor() if hay_modelos() else None
+            'mejor_modelo': get_mejor(snap) if hay_modelos(snap) else None
         },
         'conexion_db': connection_pool is not None
     })
@@ -0,0 +1,168 @@
+# backend/seleccion_grado.py
+# Busqueda del grado polinomial en paralelo: cada (grado, fold) de la
+# validacion cruzada y cada ajuste de grado sobre train es una tarea
+# independiente de un pool de procesos (joblib/loky).
+
+import time
+
+import numpy as np
+
+from config import ENTRENAMIENTO_N_JOBS
+
+GRADOS_POLINOMIO = (2, 3, 4, 5)
+
+
+def pipeline_lineal():
+    """StandardScaler -> LinearRegression (el modelo lineal de referencia)."""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ('scaler', StandardScaler()),
+        ('regressor', LinearRegression())
+    ])
+
+
+def pipeline_polinomial(grado):
+    """PolynomialFeatures(grado) -> StandardScaler -> LinearRegression."""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        ('poly', PolynomialFeatures(degree=grado, include_bias=False, interaction_only=False)),
+        ('scaler', StandardScaler()),
+        ('regressor', LinearRegression())
+    ])
+
+
+def _tarea(grado, fold, X_fit, y_fit, X_eval, y_eval, memoria_mb=None, float32=None):
+    """Ajusta un grado sobre X_fit y evalua sobre X_eval (se ejecuta en un worker).
+
+    fold es el indice de la particion de CV, o None para el ajuste sobre
+    todo train que se evalua en test y se conserva como modelo final. Si
+    la expansion densa no cabe en memoria_mb se ajusta por bloques (ver
+    polinomial_bloques.py).
+    """
+    from sklearn.metrics import r2_score, mean_absolute_error
+    from polinomial_bloques import RegresionPolinomialBloques
+
+    try:
+        modelo = RegresionPolinomialBloques(grado, memoria_mb, float32)
+        modelo.fit(X_fit, y_fit)
+        y_pred = modelo.predict(X_eval)
+        return {
+            'grado': grado,
+            'fold': fold,
+            'r2': float(r2_score(y_eval, y_pred)),
+            'mae': float(mean_absolute_error(y_eval, y_pred)),
+            'por_bloques': modelo.por_bloques_,
+            'pipeline': modelo.pipeline_ if fold is None else None
+        }
+    except Exception as e:
+        return {'grado': grado, 'fold': fold, 'error': str(e)}
+
+
+def buscar_grado(X_train, y_train, X_test, y_test, grados=GRADOS_POLINOMIO, cv=5, n_jobs=None,
+                 progreso=None, memoria_mb=None, float32=None):
+    """Evalua los grados polinomiales con CV y elige el de mayor R2 de CV.
+
+    Las len(grados) * (cv + 1) tareas se reparten en n_jobs procesos; los
+    grados altos (los mas costosos) se encolan primero. El pipeline de cada
+    grado ajustado sobre train se devuelve para no volver a entrenarlo.
+
+    Args:
+        X_train, y_train: datos de entrenamiento (CV con KFold(cv), como cross_val_score)
+        X_test, y_test: datos de prueba
+        grados: grados a evaluar
+        cv: particiones de validacion cruzada
+        n_jobs: procesos (ENTRENAMIENTO_N_JOBS si None)
+        progreso: callable(grado, grados_terminados, total_grados, r2_cv)
+            invocado al completar todas las tareas de un grado
+        memoria_mb, float32: limite de la expansion y precision de los
+            bloques (POLINOMIAL_MEMORIA_MB / POLINOMIAL_FLOAT32 si None)
+
+    Returns:
+        dict con resultados_grados, mejor_grado, mejor_r2_cv, pipelines
+        (grado -> Pipeline ajustado sobre train), n_jobs y tiempo_s
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import KFold
+
+    n_jobs = ENTRENAMIENTO_N_JOBS if n_jobs is None else n_jobs
+    particiones = list(KFold(n_splits=cv).split(X_train))
+
+    tareas = []
+    for grado in sorted(grados, reverse=True):
+        tareas.append(delayed(_tarea)(grado, None, X_train, y_train, X_test, y_test,
+                                      memoria_mb, float32))
+        for fold, (idx_fit, idx_val) in enumerate(particiones):
+            tareas.append(delayed(_tarea)(
+                grado, fold,
+                X_train.iloc[idx_fit], y_train.iloc[idx_fit],
+                X_train.iloc[idx_val], y_train.iloc[idx_val],
+                memoria_mb, float32
+            ))
+
+    inicio = time.perf_counter()
+    salidas = Parallel(n_jobs=n_jobs, backend='loky', return_as='generator')(tareas)
+
+    por_grado = {grado: {'folds': [], 'final': None, 'error': None, 'tareas': 0} for grado in grados}
+    terminados = 0
+    for salida in salidas:
+        entrada = por_grado[salida['grado']]
+        entrada['tareas'] += 1
+        if 'error' in salida:
+            entrada['error'] = entrada['error'] or salida['error']
+        elif salida['fold'] is None:
+            entrada['final'] = salida
+        else:
+            entrada['folds'].append(salida['r2'])
+
+        if entrada['tareas'] == cv + 1:
+            terminados += 1
+            if progreso:
+                r2_cv = float(np.mean(entrada['folds'])) if entrada['folds'] else float('nan')
+                progreso(salida['grado'], terminados, len(grados), r2_cv)
+
+    resultados_grados = {}
+    pipelines = {}
+    mejor_grado = grados[0]
+    mejor_r2_cv = -np.inf
+    for grado in grados:
+        entrada = por_grado[grado]
+        if entrada['error'] is not None:
+            print(f"   Grado {grado}: ERROR - {entrada['error']}")
+            resultados_grados[grado] = {'error': entrada['error']}
+            continue
+
+        r2_cv = float(np.mean(entrada['folds']))
+        final = entrada['final']
+        pipelines[grado] = final['pipeline']
+        n_features_poly = final['pipeline'].named_steps['poly'].n_output_features_
+
+        resultados_grados[grado] = {
+            'r2_test': round(final['r2'], 4),
+            'r2_cv': round(r2_cv, 4),
+            'mae': round(final['mae'], 2),
+            'n_features': n_features_poly,
+            'por_bloques': final['por_bloques']
+        }
+        print(f"   Grado {grado}: R2_test={final['r2']:.4f}, R2_CV={r2_cv:.4f}, "
+              f"MAE={final['mae']:.2f}, features={n_features_poly}"
+              f"{' (por bloques)' if final['por_bloques'] else ''}")
+
+        # Seleccionar por R2 de CV (evita overfitting)
+        if r2_cv > mejor_r2_cv:
+            mejor_r2_cv = r2_cv
+            mejor_grado = grado
+
+    return {
+        'resultados_grados': resultados_grados,
+        'mejor_grado': mejor_grado,
+        'mejor_r2_cv': mejor_r2_cv,
+        'pipelines': pipelines,
+        'n_jobs': n_jobs,
+        'tiempo_s': round(time.perf_counter() - inicio, 2)
+    }
@@ -0,0 +1,264 @@
+# backend/trabajos.py
+# Trabajos en segundo plano con progreso consultable.
+# Cada trabajo corre en un proceso aparte (multiprocessing, spawn) para que
+# el trabajo pesado no compita por el GIL con los hilos de la API; un hilo
+# monitor recibe el progreso por una cola y guarda el resultado.
+
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+ESTADOS_FINALES = ('completado', 'error', 'cancelado')
+
+
+def _ejecutar_en_proceso(funcion, args, kwargs, cola):
+    """Punto de entrada del proceso hijo: ejecuta funcion y reporta por la cola."""
+    def progreso(etapa, porcentaje, mensaje='', **contadores):
+        cola.put(('progreso', etapa, porcentaje, mensaje, contadores))
+
+    if hasattr(os, 'setpgrp'):
+        # Grupo propio: cancelar termina tambien los workers loky que abra el trabajo
+        os.setpgrp()
+    try:
+        cola.put(('resultado', funcion(*args, progreso=progreso, **kwargs)))
+    except Exception as e:
+        cola.put(('error', str(e), getattr(e, 'codigo', 500), traceback.format_exc(),
+                  getattr(e, 'extra', None)))
+    finally:
+        # Los workers loky reutilizables impiden que el proceso termine
+        if 'joblib' in sys.modules:
+            from joblib.externals.loky import get_reusable_executor
+            get_reusable_executor().shutdown(wait=True)
+
+
+def _terminar_grupo(proceso):
+    """Termina el proceso hijo y los procesos que lanzo (workers loky).
+
+    El hijo crea su propio grupo de procesos al arrancar; si aun no lo hizo
+    (o no hay grupos, p.ej. en Windows) solo se termina el hijo.
+    """
+    try:
+        if os.getpgid(proceso.pid) == proceso.pid:
+            os.killpg(proceso.pid, signal.SIGTERM)
+            return
+    except (AttributeError, OSError):
+        pass
+    proceso.terminate()
+
+
+class Trabajo:
+    """Estado de un trabajo: etapa actual, historial de etapas, contadores y resultado."""
+
+    def __init__(self, tipo, parametros=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.tipo = tipo
+        self.parametros = parametros or {}
+        self.estado = 'en_cola'
+        self.progreso = 0
+        self.etapa = None
+        self.etapas = []
+        self.contadores = {}
+        self.resultado = None
+        self.error = None
+        self.codigo_error = None
+        self.detalles = None
+        self.extra_error = None
+        self.creado = datetime.now()
+        self.iniciado = None
+        self.finalizado = None
+        self._fin = threading.Event()
+        self._cancelar = threading.Event()
+
+    def registrar_etapa(self, etapa, porcentaje, mensaje='', contadores=None):
+        """Registra avance; si la etapa se repite se actualiza su ultima entrada."""
+        self.etapa = etapa
+        self.progreso = max(self.progreso, int(porcentaje))
+        if contadores:
+            self.contadores.update(contadores)
+        entrada = {
+            'etapa': etapa,
+            'progreso': int(porcentaje),
+            'mensaje': mensaje,
+            'hora': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        if self.etapas and self.etapas[-1]['etapa'] == etapa:
+            self.etapas[-1] = entrada
+        else:
+            self.etapas.append(entrada)
+
+    def terminar(self, resultado=None, error=None, codigo_error=None, detalles=None,
+                 extra_error=None, cancelado=False):
+        self.resultado = resultado
+        self.error = error
+        self.codigo_error = codigo_error
+        self.detalles = detalles
+        self.extra_error = extra_error
+        if cancelado:
+            self.estado = 'cancelado'
+        else:
+            self.estado = 'error' if error is not None else 'completado'
+        if error is None:
+            self.progreso = 100
+        self.finalizado = datetime.now()
+        self._fin.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que el trabajo termine; True si termino."""
+        return self._fin.wait(timeout)
+
+    def como_dict(self, incluir_resultado=True):
+        fecha = lambda d: d.strftime('%Y-%m-%d %H:%M:%S') if d else None
+        datos = {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'progreso': self.progreso,
+            'etapa': self.etapa,
+            'etapas': list(self.etapas),
+            'contadores': dict(self.contadores),
+            'parametros': self.parametros,
+            'creado': fecha(self.creado),
+            'iniciado': fecha(self.iniciado),
+            'finalizado': fecha(self.finalizado),
+            'error': self.error
+        }
+        if incluir_resultado:
+            datos['resultado'] = self.resultado
+        return datos
+
+
+class GestorTrabajos:
+    """Cola de trabajos en procesos aparte con limite de concurrencia.
+
+    enviar() registra el trabajo y retorna de inmediato; un hilo por trabajo
+    espera turno (max_concurrentes), lanza el proceso y traduce sus mensajes
+    a progreso. al_terminar(resultado) corre en este proceso (p.ej. para
+    publicar modelos) antes de marcar el trabajo como completado. cancelar()
+    descarta un trabajo en cola o termina el proceso de uno en ejecucion
+    junto con los workers que haya lanzado.
+    """
+
+    def __init__(self, max_concurrentes=1, max_historial=50):
+        self.max_historial = max_historial
+        self._cupos = threading.BoundedSemaphore(max_concurrentes)
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+        self._ctx = multiprocessing.get_context('spawn')
+
+    def enviar(self, tipo, funcion, args=(), kwargs=None, parametros=None, al_terminar=None):
+        """Encola funcion(*args, progreso=..., **kwargs) en un proceso aparte.
+
+        funcion debe ser importable a nivel de modulo (se ejecuta con spawn)
+        y aceptar el argumento progreso(etapa, porcentaje, mensaje, **contadores).
+        """
+        trabajo = Trabajo(tipo, parametros)
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._podar()
+        threading.Thread(
+            target=self._correr, args=(trabajo, funcion, args, kwargs or {}, al_terminar),
+            name=f'trabajo-{tipo}-{trabajo.id}', daemon=True
+        ).start()
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        return self._trabajos.get(id_trabajo)
+
+    def cancelar(self, id_trabajo):
+        """Cancela un trabajo en cola o en ejecucion.
+
+        Returns:
+            El Trabajo (None si no existe). Si ya habia terminado no cambia.
+        """
+        trabajo = self._trabajos.get(id_trabajo)
+        if trabajo is None or trabajo.estado in ESTADOS_FINALES:
+            return trabajo
+        trabajo._cancelar.set()
+        if trabajo.estado == 'en_cola':
+            # El hilo lo descarta al obtener cupo, sin lanzar el proceso
+            trabajo.terminar(error='Trabajo cancelado', codigo_error=409, cancelado=True)
+        else:
+            trabajo.esperar(timeout=10)
+        return trabajo
+
+    def listar(self, tipo=None):
+        with self._lock:
+            trabajos = list(self._trabajos.values())
+        return [t for t in reversed(trabajos) if tipo is None or t.tipo == tipo]
+
+    def _podar(self):
+        """Descarta los trabajos terminados mas antiguos por encima de max_historial."""
+        terminados = [i for i, t in self._trabajos.items() if t.estado in ESTADOS_FINALES]
+        for id_trabajo in terminados[:max(0, len(self._trabajos) - self.max_historial)]:
+            del self._trabajos[id_trabajo]
+
+    def _correr(self, trabajo, funcion, args, kwargs, al_terminar):
+        with self._cupos:
+            if trabajo.cancelado:
+                print(f"[INFO] Trabajo {trabajo.tipo} {trabajo.id} cancelado en cola")
+                return
+            trabajo.estado = 'ejecutando'
+            trabajo.iniciado = datetime.now()
+            try:
+                mensaje = self._ejecutar(trabajo, funcion, args, kwargs)
+                if mensaje[0] == 'resultado':
+                    if al_terminar:
+                        al_terminar(mensaje[1])
+                    trabajo.terminar(resultado=mensaje[1])
+                elif mensaje[0] == 'cancelado':
+                    trabajo.terminar(error='Trabajo cancelado', codigo_error=409, cancelado=True)
+                else:
+                    _, error, codigo, detalles, extra = mensaje
+                    trabajo.terminar(error=error, codigo_error=codigo, detalles=detalles,
+                                     extra_error=extra)
+            except Exception as e:
+                trabajo.terminar(error=str(e), codigo_error=500, detalles=traceback.format_exc())
+
+        if trabajo.cancelado:
+            print(f"[INFO] Trabajo {trabajo.tipo} {trabajo.id} cancelado")
+        elif trabajo.error:
+            print(f"[ERROR] Trabajo {trabajo.tipo} {trabajo.id}: {trabajo.error}")
+        else:
+            print(f"[OK] Trabajo {trabajo.tipo} {trabajo.id} completado")
+
+    def _ejecutar(self, trabajo, funcion, args, kwargs):
+        """Lanza el proceso y consume su cola hasta recibir resultado o error."""
+        cola = self._ctx.Queue()
+        # No daemon: el trabajo puede abrir su propio pool de procesos (loky)
+        proceso = self._ctx.Process(target=_ejecutar_en_proceso,
+                                    args=(funcion, args, kwargs, cola))
+        proceso.start()
+        try:
+            while True:
+                if trabajo.cancelado:
+                    _terminar_grupo(proceso)
+                    return ('cancelado',)
+                try:
+                    mensaje = cola.get(timeout=0.5)
+                except queue.Empty:
+                    if not proceso.is_alive():
+                        # Ultimo intento por si el mensaje llego justo al salir
+                        try:
+                            mensaje = cola.get(timeout=0.5)
+                        except queue.Empty:
+                            return ('error', f'El proceso termino sin resultado '
+                                             f'(codigo {proceso.exitcode})', 500, None, None)
+                    else:
+                        continue
+                if mensaje[0] == 'progreso':
+                    trabajo.registrar_etapa(*mensaje[1:])
+                else:
+                    return mensaje
+        finally:
+            proceso.join(timeout=5)
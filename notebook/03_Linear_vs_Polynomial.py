@@ -16,6 +16,7 @@ from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 # --- RUTA ---
 BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
 sys.path.insert(0, BACKEND_DIR)
+from features import COLS_REZAGO, features_rezago
 
 try:
     from config import DB_CONFIG, ESTADO_POR_ID
@@ -96,29 +97,14 @@ if col_casos is None:
     print("[FATAL] No se encuentra columna de casos")
     sys.exit(1)
 
-if group_col:
-    for lag in [1, 2, 3, 4]:
-        df[f'casos_lag_{lag}w'] = df.groupby(group_col)[col_casos].shift(lag)
-    if col_ti:
-        for lag in [1, 2]:
-            df[f'ti_lag_{lag}w'] = df.groupby(group_col)[col_ti].shift(lag)
-    else:
-        df['ti_lag_1w'] = 0
-        df['ti_lag_2w'] = 0
-    df['casos_promedio_4w'] = df.groupby(group_col)[col_casos].transform(
-        lambda x: x.rolling(4, min_periods=1).mean().shift(1))
-else:
-    for lag in [1, 2, 3, 4]:
-        df[f'casos_lag_{lag}w'] = df[col_casos].shift(lag)
-    if col_ti:
-        for lag in [1, 2]:
-            df[f'ti_lag_{lag}w'] = df[col_ti].shift(lag)
-    else:
-        df['ti_lag_1w'] = 0
-        df['ti_lag_2w'] = 0
-    df['casos_promedio_4w'] = df[col_casos].rolling(4, min_periods=1).mean().shift(1)
-
-df['tendencia_4w'] = df['casos_lag_1w'] - df['casos_lag_4w']
+# Mismas features que el backend (backend/features.py)
+rezagos = features_rezago(
+    df[col_casos].to_numpy(dtype=float),
+    df[col_ti].to_numpy(dtype=float) if col_ti else None,
+    df[group_col].to_numpy() if group_col else None
+)
+for i, col in enumerate(COLS_REZAGO):
+    df[col] = rezagos[:, i]
 
 # Semana y mes
 if 'semana_epidemiologica' in df.columns:
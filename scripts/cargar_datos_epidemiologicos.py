@@ -4,10 +4,9 @@ Script para cargar datos de dengue del CSV a la base de datos
 Adaptado a la estructura de tablas del proyecto
 """
 
-import pandas as pd
 import mysql.connector
-from datetime import datetime
 import os
+import sys
 
 # Configuración de la base de datos
 DB_CONFIG = {
@@ -17,77 +16,12 @@ DB_CONFIG = {
     'database': 'proyecto_integrador'
 }
 
-# Mapeo de códigos de entidad a nombres de estados (INEGI)
-ENTIDADES = {
-    1: 'Aguascalientes',
-    2: 'Baja California',
-    3: 'Baja California Sur',
-    4: 'Campeche',
-    5: 'Coahuila',
-    6: 'Colima',
-    7: 'Chiapas',
-    8: 'Chihuahua',
-    9: 'Ciudad de México',
-    10: 'Durango',
-    11: 'Guanajuato',
-    12: 'Guerrero',
-    13: 'Hidalgo',
-    14: 'Jalisco',
-    15: 'Estado de México',
-    16: 'Michoacán',
-    17: 'Morelos',
-    18: 'Nayarit',
-    19: 'Nuevo León',
-    20: 'Oaxaca',
-    21: 'Puebla',
-    22: 'Querétaro',
-    23: 'Quintana Roo',
-    24: 'San Luis Potosí',
-    25: 'Sinaloa',
-    26: 'Sonora',
-    27: 'Tabasco',
-    28: 'Tamaulipas',
-    29: 'Tlaxcala',
-    30: 'Veracruz',
-    31: 'Yucatán',
-    32: 'Zacatecas'
-}
+# Lectura, agregación semanal y upsert: el mismo motor que la API y ETL_LOADER
+# (backend/ingesta_csv.py); estados y población vienen de backend/config.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
 
-# Población por estado (Censo 2020)
-POBLACION = {
-    1: 1425607,
-    2: 3769020,
-    3: 798447,
-    4: 928363,
-    5: 3146771,
-    6: 731391,
-    7: 5543828,
-    8: 3741869,
-    9: 9209944,
-    10: 1832650,
-    11: 6166934,
-    12: 3540685,
-    13: 3082841,
-    14: 8348151,
-    15: 16992418,
-    16: 4748846,
-    17: 1971520,
-    18: 1235456,
-    19: 5784442,
-    20: 4132148,
-    21: 6583278,
-    22: 2368467,
-    23: 1857985,
-    24: 2822255,
-    25: 3026943,
-    26: 2944840,
-    27: 2402598,
-    28: 3527735,
-    29: 1342977,
-    30: 8062579,
-    31: 2320898,
-    32: 1622138
-}
+from escritura_bd import upsert_regiones  # noqa: E402
+from ingesta_csv import ESTATUS_CONFIRMADO, escribir_serie, procesar_csv_sinave  # noqa: E402
 
 def conectar_db():
     """Conecta a la base de datos MySQL"""
@@ -109,10 +43,8 @@ def insertar_enfermedad_dengue(cursor):
     
     try:
         cursor.execute("""
-            INSERT INTO enfermedad (nombre, descripcion, sintomas, via_transmision)
-            VALUES ('Dengue', 'Enfermedad viral transmitida por mosquitos Aedes', 
-                    'Fiebre alta, dolor de cabeza, dolor muscular, sarpullido', 
-                    'Picadura de mosquito Aedes aegypti')
+            INSERT INTO enfermedad (nombre, descripcion)
+            VALUES ('Dengue', 'Enfermedad viral transmitida por mosquitos Aedes')
         """)
         id_enfermedad = cursor.lastrowid
         print(f"✅ Enfermedad 'Dengue' insertada con ID: {id_enfermedad}")
@@ -124,113 +56,45 @@ def insertar_enfermedad_dengue(cursor):
         result = cursor.fetchone()
         return result[0] if result else 1
 
-def insertar_regiones(cursor):
+def insertar_regiones(conn):
     """Inserta las 32 entidades federativas"""
     print("\n📍 Insertando/actualizando regiones...")
-    
-    regiones_db = {}
-    for codigo, nombre in ENTIDADES.items():
-        poblacion = POBLACION.get(codigo, 0)
-        try:
-            cursor.execute("""
-                INSERT INTO region (id_region, nombre, codigo_postal, poblacion)
-                VALUES (%s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    nombre = VALUES(nombre),
-                    poblacion = VALUES(poblacion)
-            """, (codigo, nombre, str(codigo * 1000).zfill(5), poblacion))
-            regiones_db[codigo] = nombre
-        except mysql.connector.Error as e:
-            print(f"   ⚠️ Error con {nombre}: {e}")
-    
-    print(f"✅ {len(regiones_db)} regiones configuradas")
-    return regiones_db
+    n = upsert_regiones(conn)
+    print(f"✅ {n} regiones configuradas")
 
 def cargar_csv(ruta_csv):
-    """Carga y procesa el CSV de datos de dengue"""
+    """Lee el CSV y lo agrega por semana y estado"""
     print(f"\n📂 Cargando CSV: {ruta_csv}")
     
-    df = pd.read_csv(ruta_csv, encoding='latin-1', low_memory=False)
-    print(f"   Total de registros en CSV: {len(df):,}")
-    
-    # Convertir fecha
-    df['fecha'] = pd.to_datetime(df['FECHA_SIGN_SINTOMAS'], errors='coerce')
-    
-    # Filtrar registros válidos
-    df = df.dropna(subset=['fecha', 'ENTIDAD_RES'])
-    df['ENTIDAD_RES'] = df['ENTIDAD_RES'].astype(int)
-    print(f"   Registros válidos: {len(df):,}")
-    
-    # ESTATUS_CASO: 1=Probable, 2=No es caso, 3=Confirmado
-    df['es_confirmado'] = (df['ESTATUS_CASO'] == 3).astype(int)
-    df['es_defuncion'] = (df['DEFUNCION'] == 1).astype(int) if 'DEFUNCION' in df.columns else 0
-    
-    # Agregar columna de semana (para agrupar por semana)
-    df['fecha_semana'] = df['fecha'].dt.to_period('W').dt.start_time
+    ingesta = procesar_csv_sinave(ruta_csv)
+    print(f"   Total de registros en CSV: {ingesta['registros_originales']:,}")
+    print(f"   Casos confirmados (ESTATUS_CASO={ESTATUS_CONFIRMADO}): {ingesta['casos_confirmados']:,}")
     
-    return df
+    return ingesta
 
-def procesar_y_agregar(df):
-    """Agrega datos por semana y entidad"""
+def procesar_y_agregar(ingesta):
+    """Muestra la serie agregada por semana y estado"""
     print("\n🔄 Agregando datos por semana y estado...")
     
-    agregado = df.groupby(['ENTIDAD_RES', 'fecha_semana']).agg({
-        'es_confirmado': 'sum',
-        'es_defuncion': 'sum'
-    }).reset_index()
-    
-    agregado.columns = ['id_region', 'fecha', 'casos_confirmados', 'defunciones']
-    
+    agregado = ingesta['df_ts']
     print(f"   Registros agregados: {len(agregado):,}")
-    print(f"   Rango de fechas: {agregado['fecha'].min().date()} a {agregado['fecha'].max().date()}")
+    print(f"   Rango de fechas: {agregado['fecha_fin_semana'].min().date()} a {agregado['fecha_fin_semana'].max().date()}")
     print(f"   Total casos confirmados: {agregado['casos_confirmados'].sum():,}")
     
     return agregado
 
-def insertar_datos(cursor, datos, id_enfermedad):
+def insertar_datos(conn, datos, id_enfermedad):
     """Inserta los datos en la tabla dato_epidemiologico"""
     print("\n💾 Insertando datos epidemiológicos...")
     
-    # NO borramos datos anteriores, agregamos usando INSERT ... ON DUPLICATE KEY UPDATE
-    
-    sql = """
-        INSERT INTO dato_epidemiologico 
-        (id_enfermedad, id_region, fecha, fecha_carga, casos_confirmados, defunciones)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            casos_confirmados = casos_confirmados + VALUES(casos_confirmados),
-            defunciones = defunciones + VALUES(defunciones)
-    """
-    
-    insertados = 0
-    errores = 0
-    fecha_carga = datetime.now().date()
-    
-    for _, row in datos.iterrows():
-        try:
-            valores = (
-                id_enfermedad,
-                int(row['id_region']),
-                row['fecha'].strftime('%Y-%m-%d'),
-                fecha_carga,
-                int(row['casos_confirmados']),
-                int(row['defunciones'])
-            )
-            cursor.execute(sql, valores)
-            insertados += 1
-            
-            if insertados % 500 == 0:
-                print(f"   Progreso: {insertados:,} registros...")
-                
-        except mysql.connector.Error as e:
-            errores += 1
-            if errores <= 3:
-                print(f"   ⚠️ Error: {e}")
+    # INSERT ... ON DUPLICATE KEY UPDATE en lotes: volver a cargar el mismo
+    # CSV reemplaza sus semanas en lugar de sumarlas
+    insertados = escribir_serie(
+        conn, datos, id_enfermedad=id_enfermedad,
+        progreso=lambda escritas, total: print(f"   Progreso: {escritas:,}/{total:,} registros...")
+    )
     
     print(f"\n✅ Insertados: {insertados:,} registros")
-    if errores > 0:
-        print(f"⚠️ Errores: {errores}")
-    
     return insertados
 
 def mostrar_resumen(cursor):
@@ -242,7 +106,7 @@ def mostrar_resumen(cursor):
     cursor.execute("SELECT COUNT(*) FROM dato_epidemiologico")
     print(f"Total registros: {cursor.fetchone()[0]:,}")
     
-    cursor.execute("SELECT MIN(fecha), MAX(fecha) FROM dato_epidemiologico")
+    cursor.execute("SELECT MIN(fecha_fin_semana), MAX(fecha_fin_semana) FROM dato_epidemiologico")
     fechas = cursor.fetchone()
     print(f"Período: {fechas[0]} a {fechas[1]}")
     
@@ -268,8 +132,8 @@ def main():
     print("🦟 CARGADOR DE DATOS DE DENGUE - CSV A MySQL")
     print("=" * 60)
     
-    # Ruta al CSV - CAMBIAR AQUÍ PARA OTROS ARCHIVOS
-    ruta_csv = r'c:\GDPS-PROEVIRA\ProeVira\data\Datos abiertos dengue_2021.csv'
+    # Ruta al CSV (primer argumento) - CAMBIAR AQUÍ PARA OTROS ARCHIVOS
+    ruta_csv = sys.argv[1] if len(sys.argv) > 1 else r'c:\GDPS-PROEVIRA\ProeVira\data\Datos abiertos dengue_2021.csv'
     
     if not os.path.exists(ruta_csv):
         print(f"❌ No se encontró: {ruta_csv}")
@@ -287,18 +151,16 @@ def main():
         conn.commit()
         
         # 2. Insertar regiones
-        insertar_regiones(cursor)
-        conn.commit()
+        insertar_regiones(conn)
         
         # 3. Cargar CSV
-        df = cargar_csv(ruta_csv)
+        ingesta = cargar_csv(ruta_csv)
         
         # 4. Procesar datos
-        datos = procesar_y_agregar(df)
+        datos = procesar_y_agregar(ingesta)
         
         # 5. Insertar datos
-        insertar_datos(cursor, datos, id_enfermedad)
-        conn.commit()
+        insertar_datos(conn, datos, id_enfermedad)
         
         # 6. Mostrar resumen
         mostrar_resumen(cursor)
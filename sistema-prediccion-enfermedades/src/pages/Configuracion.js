@@ -117,7 +117,11 @@ const Configuracion = () => {
       if (data.success) {
         setCsvProcesado(data);
         setPaso(3);
-        setMensaje({ tipo: 'success', texto: `✅ ${data.resumen.casos_confirmados.toLocaleString()} casos confirmados procesados` });
+        // Por defecto el backend estima el resumen con una muestra del archivo
+        const texto = data.resumen.estimado
+          ? `✅ ~${data.resumen.casos_confirmados.toLocaleString()} casos confirmados (estimado con una muestra del ${(data.resumen.muestra.fraccion_bytes * 100).toFixed(1)}% del archivo)`
+          : `✅ ${data.resumen.casos_confirmados.toLocaleString()} casos confirmados procesados`;
+        setMensaje({ tipo: 'success', texto });
       } else {
         setMensaje({ tipo: 'error', texto: data.error });
       }
@@ -128,6 +132,9 @@ const Configuracion = () => {
     }
   };
 
+  // Prefijo '~' para las cifras del resumen que el backend estimo con la muestra
+  const aprox = (campo) => (csvProcesado?.resumen?.estimaciones?.[campo] ? '~' : '');
+
   // Paso 3: Guardar en Base de Datos
   const guardarEnBD = async () => {
     if (!archivo) return;
@@ -590,22 +597,30 @@ const Configuracion = () => {
                 <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6">
                   <div className="bg-blue-50 border border-blue-200 rounded-lg p-4 text-center">
                     <p className="text-xs text-blue-600 mb-1">Registros Originales</p>
-                    <p className="text-2xl font-bold text-blue-800">{csvProcesado.resumen.registros_originales.toLocaleString()}</p>
+                    <p className="text-2xl font-bold text-blue-800">{aprox('registros_originales')}{csvProcesado.resumen.registros_originales.toLocaleString()}</p>
                   </div>
                   <div className="bg-green-50 border border-green-200 rounded-lg p-4 text-center">
                     <p className="text-xs text-green-600 mb-1">Casos Confirmados</p>
-                    <p className="text-2xl font-bold text-green-800">{csvProcesado.resumen.casos_confirmados.toLocaleString()}</p>
+                    <p className="text-2xl font-bold text-green-800">{aprox('casos_confirmados')}{csvProcesado.resumen.casos_confirmados.toLocaleString()}</p>
                   </div>
                   <div className="bg-purple-50 border border-purple-200 rounded-lg p-4 text-center">
                     <p className="text-xs text-purple-600 mb-1">Registros Procesados</p>
-                    <p className="text-2xl font-bold text-purple-800">{csvProcesado.resumen.registros_procesados.toLocaleString()}</p>
+                    <p className="text-2xl font-bold text-purple-800">{aprox('registros_procesados')}{csvProcesado.resumen.registros_procesados.toLocaleString()}</p>
                   </div>
                   <div className="bg-orange-50 border border-orange-200 rounded-lg p-4 text-center">
                     <p className="text-xs text-orange-600 mb-1">Estados</p>
-                    <p className="text-2xl font-bold text-orange-800">{csvProcesado.resumen.estados_procesados}</p>
+                    <p className="text-2xl font-bold text-orange-800">{aprox('estados_procesados')}{csvProcesado.resumen.estados_procesados}</p>
                   </div>
                 </div>
                 
+                {csvProcesado.resumen.estimado && (
+                  <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-3 mb-6 text-sm text-yellow-800 flex items-center gap-2">
+                    <AlertTriangle className="w-4 h-4 flex-shrink-0" />
+                    Resumen estimado con una muestra del {(csvProcesado.resumen.muestra.fraccion_bytes * 100).toFixed(1)}% del archivo:
+                    las cifras con ~ son aproximadas.
+                  </div>
+                )}
+
                 {/* Años y rango */}
                 <div className="bg-gray-50 rounded-lg p-4 mb-6">
                   <div className="flex flex-wrap gap-4 justify-center">
@@ -653,7 +668,7 @@ const Configuracion = () => {
                     </tbody>
                   </table>
                   <div className="bg-gray-50 px-3 py-2 text-xs text-gray-500 text-center">
-                    Mostrando 10 de {csvProcesado.resumen.registros_procesados.toLocaleString()} registros procesados
+                    Mostrando 10 de {aprox('registros_procesados')}{csvProcesado.resumen.registros_procesados.toLocaleString()} registros procesados
                   </div>
                 </div>
                 
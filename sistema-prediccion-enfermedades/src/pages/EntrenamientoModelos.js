@@ -62,6 +62,23 @@ const EntrenamientoModelos = () => {
     }
   };
 
+  const esperarTrabajo = async (idTrabajo) => {
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      const response = await fetch(`${API_URL}/modelos/trabajos/${idTrabajo}`);
+      if (!response.ok) {
+        throw new Error(`Error HTTP: ${response.status}`);
+      }
+      const { trabajo } = await response.json();
+      if (trabajo.estado === 'completado') {
+        return trabajo.resultado;
+      }
+      if (trabajo.estado === 'error' || trabajo.estado === 'cancelado') {
+        return { success: false, error: trabajo.error };
+      }
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
 
@@ -85,7 +102,8 @@ const EntrenamientoModelos = () => {
         throw new Error(`Error HTTP: ${response.status}`);
       }
 
-      const data = await response.json();
+      // El backend responde 202 con el id del trabajo; se consulta hasta que termine
+      const data = await esperarTrabajo((await response.json()).id_trabajo);
 
       if (data.success) {
         setResultado(data);
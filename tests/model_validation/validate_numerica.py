@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Validación numérica de los ajustes polinomiales sin matriz densa.
+Compara cada atajo del backend contra el ajuste de sklearn sobre los mismos
+datos sintéticos y termina con código 1 si alguna diferencia supera su
+tolerancia. Las diferencias de predicción se reportan relativas a la
+desviación estándar de y; las de coeficientes, al mayor coeficiente.
+
+Validaciones:
+    incremental      EstadisticasMCO acumuladas por partes vs reajuste completo
+    bloques          RegresionPolinomialBloques (float64) vs pipeline_polinomial
+    bloques_float32  lo mismo con la expansión en float32 (--tolerancia-float32)
+    ridge            regularizacion.camino en ALPHAS_RIDGE vs Ridge de sklearn
+    lasso            regularizacion.camino en la rejilla de alphas_lasso vs Lasso de
+                     sklearn; solo se exigen las predicciones (--tolerancia-lasso)
+
+Uso:
+    python tests/model_validation/validate_numerica.py
+    python tests/model_validation/validate_numerica.py --filas 20000 --semilla 3
+
+Los grados 4 y 5 expanden a terminos casi colineales: los coeficientes con
+alpha chico solo estan determinados a ~1e-7 y necesitan tolerancias mayores:
+    python tests/model_validation/validate_numerica.py --grados 4,5 --tolerancia 1e-6 --tolerancia-float32 1e-4
+"""
+
+import argparse
+import json
+import sys
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = REPO_ROOT / 'backend'
+
+
+def datos_sinteticos(filas, semilla):
+    """Features con escalas y medias distintas (como casos, tasas y semanas) y y no lineal."""
+    rng = np.random.default_rng(semilla)
+    medias = [0.0, 5.0, 100.0, -3.0, 0.5, 20.0]
+    escalas = [1.0, 2.0, 30.0, 1.0, 0.1, 5.0]
+    X = pd.DataFrame(rng.normal(medias, escalas, (filas, len(medias))),
+                     columns=[f'x{i}' for i in range(len(medias))])
+    y = (0.5 * X['x0'] + 0.002 * np.abs(X['x2']) ** 1.5 + X['x1'] * X['x3']
+         + rng.normal(0, 1, filas)).to_numpy()
+    return X, y
+
+
+def _diferencia(a, b, escala):
+    return float(np.max(np.abs(np.asarray(a) - np.asarray(b))) / escala)
+
+
+def validar_incremental(X, y, grados, particiones):
+    """Acumula EstadisticasMCO por partes (acumular y combinar) y resuelve una vez.
+
+    Debe coincidir con reajustar el mismo pipeline con todas las filas, tanto
+    sin regularizar como con Ridge.
+    """
+    from entrenamiento_incremental import (EstadisticasMCO, _expandir, estadisticas_pipeline,
+                                           pipeline_desde_estadisticas)
+    from regularizacion import pipeline_regularizado
+    from seleccion_grado import pipeline_polinomial
+
+    cortes = np.linspace(0, len(X), particiones + 1).astype(int)
+    desv_y = float(np.std(y))
+    resultados = []
+    for grado in grados:
+        for nombre, crear in (('lineal', lambda: pipeline_polinomial(grado)),
+                              ('ridge', lambda: pipeline_regularizado(grado, 'ridge', 1.0))):
+            completo = crear().fit(X, y)
+
+            primera = slice(cortes[0], cortes[1])
+            plantilla = crear().fit(X[primera], y[primera])
+            acumuladas = estadisticas_pipeline(plantilla, X[primera], y[primera])
+            # La mitad de las partes se suma con acumular y el resto con combinar
+            for i in range(1, particiones):
+                parte = slice(cortes[i], cortes[i + 1])
+                Z = _expandir(plantilla, X[parte])
+                if i % 2:
+                    acumuladas = acumuladas.acumular(Z, y[parte])
+                else:
+                    acumuladas = acumuladas.combinar(EstadisticasMCO.de_bloque(Z, y[parte]))
+            incremental = pipeline_desde_estadisticas(plantilla, acumuladas)
+
+            coef = completo.named_steps['regressor'].coef_
+            resultados.append({
+                'grado': grado,
+                'regresor': nombre,
+                'prediccion': _diferencia(incremental.predict(X), completo.predict(X), desv_y),
+                'coeficientes': _diferencia(incremental.named_steps['regressor'].coef_, coef,
+                                            np.max(np.abs(coef)))
+            })
+    return resultados
+
+
+def validar_bloques(X, y, grados, float32):
+    """RegresionPolinomialBloques forzada a bloques vs el pipeline denso de siempre."""
+    from polinomial_bloques import RegresionPolinomialBloques
+    from seleccion_grado import pipeline_polinomial
+
+    desv_y = float(np.std(y))
+    resultados = []
+    for grado in grados:
+        denso = pipeline_polinomial(grado).fit(X, y)
+        # Con 0.05 MB caben pocas filas por bloque: siempre se acumula por partes
+        modelo = RegresionPolinomialBloques(grado, memoria_mb=0.05, float32=float32).fit(X, y)
+        if not modelo.por_bloques_:
+            raise RuntimeError(f'grado {grado}: RegresionPolinomialBloques no uso bloques')
+        resultados.append({
+            'grado': grado,
+            'prediccion': _diferencia(modelo.predict(X), denso.predict(X), desv_y)
+        })
+    return resultados
+
+
+def validar_camino(X, y, grados, tipo):
+    """Camino de Ridge/Lasso desde las estadisticas vs un ajuste de sklearn por alpha.
+
+    Para Lasso la referencia converge con tol estricta: la diferencia que
+    queda es la tolerancia de lasso_path en el camino (~1e-3 de std(y)). Con
+    terminos colineales los coeficientes de Lasso no son unicos, por eso se
+    juzgan solo las predicciones. Un error en el reescalado de alpha (n filas
+    originales vs terminos de los pseudo-datos) desplaza toda la rejilla y
+    aparece como una diferencia de orden 1.
+    """
+    from polinomial_bloques import estadisticas_polinomiales
+    from regularizacion import (ALPHAS_RIDGE, alphas_lasso, camino, pipeline_regularizado,
+                                predecir_camino)
+
+    desv_y = float(np.std(y))
+    filas_bloque = 500
+    resultados = []
+    for grado in grados:
+        alphas = ALPHAS_RIDGE if tipo == 'ridge' else alphas_lasso(X, y, grado)
+        est = estadisticas_polinomiales(X, y, grado, filas_bloque)
+        media, _, escala, coefs, intercepto = camino(est, tipo, alphas)
+        pred = predecir_camino(X, grado, media, escala, coefs, intercepto, filas_bloque)
+        for i, alpha in enumerate(alphas):
+            referencia = pipeline_regularizado(grado, tipo, alpha)
+            if tipo == 'lasso':
+                referencia.set_params(regressor__tol=1e-10, regressor__max_iter=100000)
+            referencia.fit(X, y)
+            coef = referencia.named_steps['regressor'].coef_
+            resultados.append({
+                'grado': grado,
+                'alpha': float(alpha),
+                'prediccion': _diferencia(pred[:, i], referencia.predict(X), desv_y),
+                'coeficientes': _diferencia(coefs[:, i], coef, max(np.max(np.abs(coef)), 1e-12))
+            })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validación numérica de los ajustes polinomiales')
+    parser.add_argument('--filas', type=int, default=4000, help='Filas de los datos sintéticos')
+    parser.add_argument('--grados', default='2,3', help='Grados polinomiales a validar')
+    parser.add_argument('--particiones', type=int, default=4,
+                        help='Partes en que se acumulan las estadísticas incrementales')
+    parser.add_argument('--tolerancia', type=float, default=1e-9,
+                        help='Diferencia relativa máxima de los ajustes en float64')
+    parser.add_argument('--tolerancia-float32', type=float, default=1e-5,
+                        help='Diferencia relativa máxima de la expansión en float32')
+    parser.add_argument('--tolerancia-lasso', type=float, default=1e-2,
+                        help='Diferencia relativa máxima de las predicciones del camino de Lasso')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    warnings.simplefilter('ignore')
+
+    X, y = datos_sinteticos(args.filas, args.semilla)
+    grados = [int(g) for g in args.grados.split(',') if g.strip()]
+
+    # nombre: (casos, tolerancia, metricas que se exigen)
+    exactas = ('prediccion', 'coeficientes')
+    validaciones = {
+        'incremental': (validar_incremental(X, y, grados, args.particiones), args.tolerancia, exactas),
+        'bloques': (validar_bloques(X, y, grados, False), args.tolerancia, exactas),
+        'bloques_float32': (validar_bloques(X, y, grados, True), args.tolerancia_float32, exactas),
+        'ridge': (validar_camino(X, y, grados, 'ridge'), args.tolerancia, exactas),
+        'lasso': (validar_camino(X, y, grados, 'lasso'), args.tolerancia_lasso, ('prediccion',))
+    }
+
+    results = {'filas': args.filas, 'semilla': args.semilla, 'validaciones': {}}
+    fallas = []
+    for nombre, (casos, tolerancia, metricas) in validaciones.items():
+        for caso in casos:
+            peor = max(v for k, v in caso.items() if k in metricas)
+            caso['ok'] = peor <= tolerancia
+            if not caso['ok']:
+                fallas.append(nombre)
+        results['validaciones'][nombre] = {'tolerancia': tolerancia, 'casos': casos}
+    results['ok'] = not fallas
+
+    print(json.dumps(results, indent=2))
+    if fallas:
+        print(f"[ERROR] Validaciones fuera de tolerancia: {', '.join(sorted(set(fallas)))}",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
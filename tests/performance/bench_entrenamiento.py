@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmark de entrenamiento (/api/modelos/entrenar -> backend/entrenador.py).
+Genera series sinteticas region-semana de tamano creciente (desde 32 estados
+x 6 anios hasta escala municipal), entrena con cada motor polinomial y mide
+tiempo y memoria pico de cada etapa del entrenamiento. Cada escenario corre
+en un proceso nuevo, sin cache de features y sin MySQL.
+
+Con --guardar se escribe la corrida en JSON; con --base se compara contra una
+corrida guardada y el script termina con codigo 1 si alguna etapa supera las
+tolerancias de tiempo o memoria, o si cae el R2 de CV del grado elegido.
+
+Motores:
+    pipeline  Pipeline denso de siempre (sin limite de memoria)
+    bloques   RegresionPolinomialBloques con POLINOMIAL_MEMORIA_MB
+    ridge     camino de Ridge con CV conjunta de grado y alpha
+    lasso     camino de Lasso con CV conjunta de grado y alpha
+
+Uso:
+    python tests/performance/bench_entrenamiento.py --tamanos 32x6,256x6 --guardar base.json
+    python tests/performance/bench_entrenamiento.py --tamanos 32x6,256x6 --base base.json
+    python tests/performance/bench_entrenamiento.py --tamanos 2469x6 --motores bloques,ridge --grados 2,3
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+BACKEND_DIR = REPO_ROOT / 'backend'
+
+VERSION_FORMATO = 1
+
+MOTORES = {
+    'pipeline': {'memoria_poly_mb': 1e9},
+    'bloques': {},
+    'ridge': {'regularizacion': 'ridge'},
+    'lasso': {'regularizacion': 'lasso'}
+}
+
+# 32 estados, 256 regiones y 2469 municipios (INEGI), 6 anios cada uno
+TAMANOS_DEFECTO = '32x6,256x6,2469x6'
+
+
+def parsear_tamano(texto):
+    """'RxA' -> (regiones, anios)."""
+    regiones, anios = texto.lower().split('x')
+    return int(regiones), int(anios)
+
+
+def generar_csv(ruta, n_regiones, anios, semilla=0):
+    """Escribe un CSV crudo (estado, fecha_fin_semana, casos, tasa) de n_regiones x anios.
+
+    Cada region tiene un nivel base, estacionalidad anual con pico en la
+    temporada de lluvias y ruido AR(1) multiplicativo; los casos son Poisson.
+    """
+    rng = np.random.default_rng(semilla)
+    semanas = int(round(anios * 52.18))
+    fechas = pd.date_range('2018-01-07', periods=semanas, freq='W-SUN')
+
+    nivel = rng.lognormal(3.0, 1.0, n_regiones)[:, None]
+    fase = rng.normal(0, 0.3, n_regiones)[:, None]
+    semana_anio = fechas.isocalendar().week.to_numpy(dtype=float)[None, :]
+    estacional = 1.2 * np.sin(2 * np.pi * (semana_anio - 22) / 52 + fase)
+
+    ruido = np.empty((n_regiones, semanas))
+    ruido[:, 0] = rng.normal(0, 0.3, n_regiones)
+    choques = rng.normal(0, 0.15, (n_regiones, semanas))
+    for s in range(1, semanas):
+        ruido[:, s] = 0.85 * ruido[:, s - 1] + choques[:, s]
+
+    casos = rng.poisson(nivel * np.exp(estacional + ruido)).astype(float)
+    poblacion = rng.integers(20_000, 2_000_000, n_regiones)[:, None]
+
+    # Claves tipo INEGI: estado (1-32) o municipio (estado * 1000 + municipio)
+    claves = (np.arange(1, n_regiones + 1) if n_regiones <= 32
+              else 1000 * (1 + np.arange(n_regiones) % 32) + 1 + np.arange(n_regiones) // 32)
+    pd.DataFrame({
+        'estado': np.repeat(claves, semanas),
+        'fecha_fin_semana': np.tile(fechas.strftime('%Y-%m-%d'), n_regiones),
+        'casos_confirmados': casos.ravel(),
+        'tasa_incidencia': (casos / poblacion * 100_000).round(4).ravel()
+    }).to_csv(ruta, index=False)
+    return n_regiones * semanas
+
+
+def megas_densos(registros, grado_max, n_features=11):
+    """MB aproximados del Pipeline denso (expansion + copia escalada + lstsq) sobre train."""
+    from math import comb
+    terminos = comb(n_features + grado_max, grado_max) - 1
+    return 3 * 0.8 * registros * terminos * 8 / 1e6
+
+
+# ---------------------------------------------------------------------------
+# Escenario (proceso hijo)
+# ---------------------------------------------------------------------------
+
+def correr_escenario(escenario, salida):
+    """Entrena un escenario y escribe sus mediciones por etapa en salida (JSON).
+
+    Las etapas son los intervalos entre eventos de progreso de entrenar();
+    cada intervalo toma el nombre del evento que lo abre (los eventos grado_N
+    de la busqueda se suman a busqueda_grado). La memoria es el pico de
+    tracemalloc (arreglos numpy incluidos) dentro de la etapa.
+    """
+    directorio = escenario['directorio']
+    os.environ['MODEL_BUNDLE'] = os.path.join(directorio, 'model_bundle.joblib')
+    os.environ['FEATURES_CACHE_DIR'] = os.path.join(directorio, 'features_cache')
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from entrenador import entrenar
+    # En el servidor sklearn ya esta importado: no medir la importacion en frio
+    import sklearn.linear_model, sklearn.metrics, sklearn.model_selection  # noqa: E401,F401
+    import sklearn.pipeline, sklearn.preprocessing  # noqa: E401,F401
+
+    etapas = {}
+    actual = {'nombre': 'lectura', 'inicio': None}
+
+    def cerrar_etapa(ahora):
+        _, pico = tracemalloc.get_traced_memory()
+        medicion = etapas.setdefault(actual['nombre'], {'segundos': 0.0, 'pico_mb': 0.0})
+        medicion['segundos'] += ahora - actual['inicio']
+        medicion['pico_mb'] = max(medicion['pico_mb'], pico / 1e6)
+        tracemalloc.reset_peak()
+
+    def progreso(etapa, porcentaje, mensaje=''):
+        if etapa.startswith('grado_'):
+            return
+        ahora = time.perf_counter()
+        cerrar_etapa(ahora)
+        actual.update(nombre=etapa, inicio=ahora)
+
+    data = {
+        'fuente': 'csv',
+        'archivo_csv': escenario['csv'],
+        'usar_cache': False,
+        'n_jobs': escenario['n_jobs'],
+        'grados': escenario['grados'],
+        'por_region': escenario['por_region'],
+        **MOTORES[escenario['motor']]
+    }
+
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    actual['inicio'] = inicio
+    resultado = entrenar(data, progreso=progreso)
+    fin = time.perf_counter()
+    cerrar_etapa(fin)
+    tracemalloc.stop()
+
+    # R2 de CV de la busqueda (KFold sobre train mezclado) del grado elegido
+    comparativa = resultado['comparativa']
+    elegido = comparativa['grados_evaluados'][comparativa['mejor_grado']]
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'registros': resultado['datos']['total_registros'],
+            'etapas': {k: {'segundos': round(v['segundos'], 3), 'pico_mb': round(v['pico_mb'], 1)}
+                       for k, v in etapas.items()},
+            'total_s': round(fin - inicio, 3),
+            'pico_mb': round(max(v['pico_mb'] for v in etapas.values()), 1),
+            'grado': comparativa['mejor_grado'],
+            'r2_cv': elegido.get('r2_cv')
+        }, f)
+
+
+def lanzar_escenario(escenario, verbose):
+    """Ejecuta el escenario en un proceso nuevo (memoria y modulos limpios)."""
+    salida = os.path.join(escenario['directorio'], 'resultado.json')
+    proceso = subprocess.run(
+        [sys.executable, __file__, '--escenario', json.dumps(escenario), '--salida', salida],
+        stdout=None if verbose else subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+    )
+    if proceso.returncode != 0:
+        if not verbose:
+            print(proceso.stdout[-4000:])
+        return None
+    with open(salida, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# Comparacion contra una corrida base
+# ---------------------------------------------------------------------------
+
+def comparar(actual, base, args):
+    """Lista de regresiones (texto) de actual frente a base."""
+    regresiones = []
+    for clave, medicion in actual['escenarios'].items():
+        previa = base.get('escenarios', {}).get(clave)
+        if previa is None:
+            continue
+        filas = [('total', medicion['total_s'], previa['total_s'],
+                  medicion['pico_mb'], previa['pico_mb'])]
+        for etapa, valores in medicion['etapas'].items():
+            if etapa in previa['etapas']:
+                anterior = previa['etapas'][etapa]
+                filas.append((etapa, valores['segundos'], anterior['segundos'],
+                              valores['pico_mb'], anterior['pico_mb']))
+
+        for etapa, seg, seg_base, mb, mb_base in filas:
+            if seg > seg_base * (1 + args.tolerancia_tiempo) and seg - seg_base > args.min_segundos:
+                regresiones.append(f"{clave} {etapa}: {seg:.2f}s (base {seg_base:.2f}s)")
+            if mb > mb_base * (1 + args.tolerancia_memoria) and mb - mb_base > args.min_mb:
+                regresiones.append(f"{clave} {etapa}: {mb:.0f} MB (base {mb_base:.0f} MB)")
+
+        if (medicion.get('r2_cv') is not None and previa.get('r2_cv') is not None
+                and medicion['r2_cv'] < previa['r2_cv'] - args.tolerancia_r2):
+            regresiones.append(f"{clave} R2_CV: {medicion['r2_cv']:.4f} (base {previa['r2_cv']:.4f})")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de entrenamiento por etapas')
+    parser.add_argument('--tamanos', default=TAMANOS_DEFECTO,
+                        help='Escenarios regionesxanios separados por coma (ej. 32x6,2469x6)')
+    parser.add_argument('--motores', default='pipeline,bloques,ridge,lasso',
+                        help=f"Motores polinomiales ({', '.join(MOTORES)})")
+    parser.add_argument('--grados', default='2,3,4,5', help='Grados de la busqueda polinomial')
+    parser.add_argument('--n-jobs', type=int, default=1,
+                        help='Procesos de entrenamiento (1 = memoria medida completa)')
+    parser.add_argument('--por-region', action='store_true', help='Entrenar tambien modelos por region')
+    parser.add_argument('--max-denso-mb', type=float, default=4096,
+                        help='Omitir el motor pipeline si su expansion densa supera estos MB')
+    parser.add_argument('--guardar', help='Escribir los resultados en este JSON')
+    parser.add_argument('--base', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerancia-tiempo', type=float, default=0.25,
+                        help='Aumento relativo de tiempo permitido por etapa')
+    parser.add_argument('--tolerancia-memoria', type=float, default=0.25,
+                        help='Aumento relativo de memoria pico permitido por etapa')
+    parser.add_argument('--tolerancia-r2', type=float, default=0.005,
+                        help='Caida absoluta permitida del R2_CV del grado elegido')
+    parser.add_argument('--min-segundos', type=float, default=1.0,
+                        help='Ignorar diferencias de tiempo menores (ruido)')
+    parser.add_argument('--min-mb', type=float, default=32,
+                        help='Ignorar diferencias de memoria menores')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Mostrar el log del entrenamiento')
+    parser.add_argument('--escenario', help=argparse.SUPPRESS)
+    parser.add_argument('--salida', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.escenario:
+        correr_escenario(json.loads(args.escenario), args.salida)
+        return
+
+    motores = [m.strip() for m in args.motores.split(',') if m.strip()]
+    desconocidos = [m for m in motores if m not in MOTORES]
+    if desconocidos:
+        parser.error(f"motores desconocidos: {', '.join(desconocidos)}")
+    grados = [int(g) for g in args.grados.split(',')]
+
+    resultados = {
+        'version': VERSION_FORMATO,
+        'maquina': {'sistema': platform.platform(), 'python': platform.python_version(),
+                    'cpus': os.cpu_count()},
+        'parametros': {'grados': grados, 'n_jobs': args.n_jobs, 'por_region': args.por_region,
+                       'semilla': args.semilla},
+        'escenarios': {}
+    }
+    fallidos = []
+
+    print(f"{'escenario':>16} {'registros':>10} {'etapa':>15} {'segundos':>10} {'pico MB':>9}")
+    with tempfile.TemporaryDirectory(prefix='bench_entrenamiento_') as tmp:
+        for tamano in args.tamanos.split(','):
+            n_regiones, anios = parsear_tamano(tamano)
+            csv = os.path.join(tmp, f'{n_regiones}x{anios}.csv')
+            registros = generar_csv(csv, n_regiones, anios, args.semilla)
+
+            for motor in motores:
+                clave = f'{n_regiones}x{anios}/{motor}'
+                if motor == 'pipeline' and megas_densos(registros, max(grados)) > args.max_denso_mb:
+                    print(f"[WARN] {clave}: expansion densa > {args.max_denso_mb:.0f} MB, omitido")
+                    continue
+
+                directorio = os.path.join(tmp, clave.replace('/', '_'))
+                os.makedirs(directorio)
+                medicion = lanzar_escenario({
+                    'directorio': directorio, 'csv': csv, 'motor': motor, 'grados': grados,
+                    'n_jobs': args.n_jobs, 'por_region': args.por_region
+                }, args.verbose)
+                if medicion is None:
+                    print(f"[ERROR] {clave}: el entrenamiento fallo")
+                    fallidos.append(clave)
+                    continue
+
+                resultados['escenarios'][clave] = medicion
+                for etapa, valores in medicion['etapas'].items():
+                    print(f"{clave:>16} {medicion['registros']:>10} {etapa:>15} "
+                          f"{valores['segundos']:>10.2f} {valores['pico_mb']:>9.1f}")
+                print(f"{clave:>16} {medicion['registros']:>10} {'TOTAL':>15} "
+                      f"{medicion['total_s']:>10.2f} {medicion['pico_mb']:>9.1f}  "
+                      f"(grado {medicion['grado']}, R2_CV={medicion['r2_cv']})")
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"[OK] Resultados guardados en {args.guardar}")
+
+    codigo = 1 if fallidos else 0
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args)
+        for texto in regresiones:
+            print(f"[ERROR] Regresion: {texto}")
+        if regresiones:
+            codigo = 1
+        else:
+            print(f"[OK] Sin regresiones frente a {args.base}")
+    sys.exit(codigo)
+
+
+if __name__ == '__main__':
+    main()
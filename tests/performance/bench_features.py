@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark de features de rezago (backend/features.py).
+Compara features_rezago contra la version pandas groupby + transform(lambda)
+y muestra el tiempo por registro region-semana para verificar que escala de
+forma lineal hasta millones de registros.
+
+Uso:
+    python tests/performance/bench_features.py --tamanos 10000,100000,1000000,4000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT / 'backend'))
+
+from features import COLS_REZAGO, features_rezago  # noqa: E402
+
+
+def generar_series(n_registros, n_regiones, intercalado, semilla=0):
+    """n_registros region-semanas; contiguas por region o intercaladas por semana."""
+    rng = np.random.default_rng(semilla)
+    semanas = -(-n_registros // n_regiones)
+    regiones = np.repeat(np.arange(1, n_regiones + 1), semanas)[:n_registros]
+    if intercalado:
+        # Orden (semana, region): cada region aparece una vez por semana
+        regiones = np.tile(np.arange(1, n_regiones + 1), semanas)[:n_registros]
+    return pd.DataFrame({
+        'id_region': regiones,
+        'casos_confirmados': rng.poisson(80, n_registros).astype(float),
+        'tasa_incidencia': rng.random(n_registros) * 5
+    })
+
+
+def features_pandas(df):
+    """Implementacion anterior (groupby().shift() y transform(lambda) por grupo)."""
+    salida = pd.DataFrame(index=df.index)
+    grupos = df.groupby('id_region')
+    for lag in [1, 2, 3, 4]:
+        salida[f'casos_lag_{lag}w'] = grupos['casos_confirmados'].shift(lag)
+    for lag in [1, 2]:
+        salida[f'ti_lag_{lag}w'] = grupos['tasa_incidencia'].shift(lag)
+    salida['casos_promedio_4w'] = grupos['casos_confirmados'].transform(
+        lambda x: x.rolling(4, min_periods=1).mean().shift(1))
+    salida['tendencia_4w'] = salida['casos_lag_1w'] - salida['casos_lag_4w']
+    return salida[COLS_REZAGO].to_numpy()
+
+
+def features_vectorizadas(df):
+    return features_rezago(df['casos_confirmados'].to_numpy(), df['tasa_incidencia'].to_numpy(),
+                           df['id_region'].to_numpy())
+
+
+def medir(funcion, df, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(df)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de features de rezago')
+    parser.add_argument('--tamanos', default='10000,100000,1000000,4000000',
+                        help='Registros region-semana a probar (separados por coma)')
+    parser.add_argument('--regiones', type=int, default=32, help='Numero de regiones')
+    parser.add_argument('--max-pandas', type=int, default=1000000,
+                        help='Tamano maximo para medir la version pandas')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'registros':>10} {'orden':>11} {'vectorizado s':>14} {'ns/registro':>12} "
+          f"{'pandas s':>10} {'aceleracion':>11}")
+    for n in [int(t) for t in args.tamanos.split(',')]:
+        for intercalado in (False, True):
+            df = generar_series(n, args.regiones, intercalado)
+            t_vec, vec = medir(features_vectorizadas, df, args.repeticiones)
+
+            t_pd = None
+            if n <= args.max_pandas:
+                t_pd, ref = medir(features_pandas, df, 1)
+                if not np.allclose(ref, vec, equal_nan=True, rtol=0, atol=1e-9):
+                    print(f"[ERROR] Resultados distintos a pandas con {n} registros")
+                    sys.exit(1)
+
+            print(f"{n:>10} {'intercalado' if intercalado else 'contiguo':>11} {t_vec:>14.4f} "
+                  f"{t_vec / n * 1e9:>12.1f} "
+                  f"{(f'{t_pd:.4f}' if t_pd is not None else '-'):>10} "
+                  f"{(f'{t_pd / t_vec:.1f}x' if t_pd is not None else '-'):>11}")
+
+
+if __name__ == '__main__':
+    main()